@@ -0,0 +1,156 @@
+"""partition test_email by month
+
+test_email becomes a table partitioned by RANGE (created_at) with one partition per month and a
+DEFAULT partition. The existing table is not copied: once created_at is NOT NULL and bounded by a
+validated CHECK it is attached as the partition ``test_email_legacy`` covering everything before
+the first month boundary, so the switch only holds its locks for catalog changes. The primary
+key becomes (id, created_at) because a partitioned table's keys must include the partition key.
+Future partitions are created, and expired ones detached and archived, by the maintenance job.
+
+Revision ID: 16a120db1eb9
+Revises: 3b02c9a060ad
+Create Date: 2026-10-19 18:02:11.530417
+
+"""
+
+from datetime import datetime, timezone
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import context, op
+
+# revision identifiers, used by Alembic.
+revision: str = "16a120db1eb9"
+down_revision: Union[str, None] = "3b02c9a060ad"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+LEGACY = "test_email_legacy"
+BACKFILL_BATCH_SIZE = 10000
+PREMAKE_MONTHS = 3
+
+# the indexes of test_email, recreated on the partitioned table: the renamed ones of the legacy
+# table match their definition and are attached to them instead of being built again
+# name, columns, covered (INCLUDE) columns, partial predicate
+INDEXES = [
+    (
+        "ix_test_email_live_file_id_user_id_id",
+        ["file_id", "user_id", "id"],
+        ["is_deliverable", "is_risky"],
+        "NOT soft_delete",
+    ),
+    ("ix_test_email_live_user_id_created_at_id", ["user_id", "created_at", "id"], [], "NOT soft_delete"),
+    ("ix_test_email_file_id", ["file_id"], [], None),
+    ("ix_test_email_deleted_at", ["deleted_at"], [], "soft_delete"),
+]
+
+
+def _month_start(moment: datetime, offset: int = 0) -> datetime:
+    month = moment.year * 12 + moment.month - 1 + offset
+    return datetime(month // 12, month % 12 + 1, 1)
+
+
+# first month served by a real monthly partition, everything before it stays in the legacy one
+BOUNDARY = _month_start(datetime.now(timezone.utc), 1)
+
+
+def _backfill(table: str, assignment: str, condition: str):
+    """Update in batches, each one committed, so no long lock is held on a big table."""
+    statement = (
+        f"UPDATE {table} SET {assignment} WHERE id IN "
+        f"(SELECT id FROM {table} WHERE {condition} LIMIT {BACKFILL_BATCH_SIZE})"
+    )
+    if context.is_offline_mode():
+        op.execute(f"UPDATE {table} SET {assignment} WHERE {condition}")
+        return
+    while op.get_bind().execute(sa.text(statement)).rowcount:
+        pass
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Step 1: created_at is the partition key, rows without one get the date of their file
+    with op.get_context().autocommit_block():
+        _backfill(
+            "test_email",
+            "created_at = COALESCE((SELECT created_at FROM bulk_emails_stats WHERE id = test_email.file_id), now())",
+            "created_at IS NULL",
+        )
+
+    # Step 2: the validated bound lets both SET NOT NULL and ATTACH PARTITION skip their scans. It is
+    # validated in its own transaction, once the ACCESS EXCLUSIVE lock of ADD CONSTRAINT is released
+    op.execute(
+        f"ALTER TABLE test_email ADD CONSTRAINT ck_{LEGACY}_bound "
+        f"CHECK (created_at IS NOT NULL AND created_at < '{BOUNDARY:%Y-%m-%d}') NOT VALID"
+    )
+    with op.get_context().autocommit_block():
+        op.execute(f"ALTER TABLE test_email VALIDATE CONSTRAINT ck_{LEGACY}_bound")
+
+    op.alter_column("test_email", "created_at", existing_type=sa.DateTime(), nullable=False)
+
+    with op.get_context().autocommit_block():
+        op.create_index(
+            f"{LEGACY}_pkey",
+            "test_email",
+            ["id", "created_at"],
+            unique=True,
+            if_not_exists=True,
+            postgresql_concurrently=True,
+        )
+
+    # Step 3: the old table steps aside under its new name, with a primary key the parent can use
+    op.execute(
+        f"ALTER TABLE test_email DROP CONSTRAINT test_email_pkey, "
+        f"ADD CONSTRAINT {LEGACY}_pkey PRIMARY KEY USING INDEX {LEGACY}_pkey"
+    )
+    op.rename_table("test_email", LEGACY)
+    for name, _, _, _ in INDEXES:
+        op.execute(f"ALTER INDEX {name} RENAME TO {name.replace('test_email', LEGACY, 1)}")
+
+    # Step 4: the partitioned table, same columns and defaults, ids keep coming from the same sequence
+    op.execute(f"CREATE TABLE test_email (LIKE {LEGACY} INCLUDING DEFAULTS) PARTITION BY RANGE (created_at)")
+    op.execute("ALTER SEQUENCE test_email_id_seq OWNED BY test_email.id")
+    op.create_primary_key("test_email_pkey", "test_email", ["id", "created_at"])
+    op.create_foreign_key("test_email_user_id_fkey", "test_email", "user", ["user_id"], ["user_id"])
+    op.create_foreign_key("test_email_file_id_fkey", "test_email", "bulk_emails_stats", ["file_id"], ["id"])
+
+    op.execute(
+        f"ALTER TABLE test_email ATTACH PARTITION {LEGACY} FOR VALUES FROM (MINVALUE) TO ('{BOUNDARY:%Y-%m-%d}')"
+    )
+    for name, columns, covered, where in INDEXES:
+        op.create_index(
+            name,
+            "test_email",
+            columns,
+            unique=False,
+            postgresql_include=covered,
+            postgresql_where=sa.text(where) if where else None,
+        )
+
+    # Step 5: the next months, and a DEFAULT partition so an insert never fails for lack of one
+    for offset in range(PREMAKE_MONTHS):
+        start, end = _month_start(BOUNDARY, offset), _month_start(BOUNDARY, offset + 1)
+        op.execute(
+            f"CREATE TABLE IF NOT EXISTS test_email_p{start:%Y%m} PARTITION OF test_email "
+            f"FOR VALUES FROM ('{start:%Y-%m-%d}') TO ('{end:%Y-%m-%d}')"
+        )
+    op.execute("CREATE TABLE IF NOT EXISTS test_email_default PARTITION OF test_email DEFAULT")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # rows of the monthly partitions move back into the legacy table, which becomes test_email again;
+    # partitions already detached by the maintenance job are left as they are
+    op.execute(f"ALTER TABLE test_email DETACH PARTITION {LEGACY}")
+    op.drop_constraint(f"ck_{LEGACY}_bound", LEGACY, type_="check")
+    op.execute(f"INSERT INTO {LEGACY} SELECT * FROM test_email")
+    op.execute(f"ALTER SEQUENCE test_email_id_seq OWNED BY {LEGACY}.id")
+    op.execute("DROP TABLE test_email")
+
+    op.rename_table(LEGACY, "test_email")
+    for name, _, _, _ in INDEXES:
+        op.execute(f"ALTER INDEX {name.replace('test_email', LEGACY, 1)} RENAME TO {name}")
+    op.execute(f"ALTER TABLE test_email DROP CONSTRAINT {LEGACY}_pkey, ADD CONSTRAINT test_email_pkey PRIMARY KEY (id)")
+    op.alter_column("test_email", "created_at", existing_type=sa.DateTime(), nullable=True)
@@ -0,0 +1,37 @@
+"""bulk file counters
+
+Per-file counters maintained by the bulk jobs. Existing files keep them NULL and are counted from
+their rows by EmailService, so no table rewrite or backfill is needed.
+
+Revision ID: 3b02c9a060ad
+Revises: d1a19bf926cc
+Create Date: 2026-10-19 15:41:12.528411
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "3b02c9a060ad"
+down_revision: Union[str, None] = "d1a19bf926cc"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+COUNTERS = ["processed", "deliverable_count", "undeliverable", "disposable", "catch_all"]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for counter in COUNTERS:
+        op.add_column("bulk_emails_stats", sa.Column(counter, sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for counter in reversed(COUNTERS):
+        op.drop_column("bulk_emails_stats", counter)
@@ -0,0 +1,55 @@
+"""compact result storage
+
+Domains table and the compact columns of test_email used when COMPACT_RESULT_STORAGE is on. The
+columns are nullable without default, so adding them to every partition is a catalog change only;
+existing rows stay in the plain columns and are read as before.
+
+Revision ID: 50d0924decdd
+Revises: 16a120db1eb9
+Create Date: 2026-10-19 15:56:51.407554
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "50d0924decdd"
+down_revision: Union[str, None] = "16a120db1eb9"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+COLUMNS = [
+    ("domain_id", sa.Integer()),
+    ("flags", sa.Integer()),
+    ("status_code", sa.SmallInteger()),
+    ("reason_code", sa.SmallInteger()),
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "domains",
+        sa.Column("id", sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column("name", sa.String(length=255), nullable=False),
+        sa.Column("smtp_provider", sa.String(length=255), nullable=True),
+        sa.Column("mx_record", sa.String(length=255), nullable=True),
+        sa.Column("implicit_mx_record", sa.String(length=255), nullable=True),
+        sa.Column("updated_at", sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("name"),
+    )
+    for name, type_ in COLUMNS:
+        op.add_column("test_email", sa.Column(name, type_, nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for name, _ in reversed(COLUMNS):
+        op.drop_column("test_email", name)
+    op.drop_table("domains")
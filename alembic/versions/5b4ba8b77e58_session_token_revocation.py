@@ -0,0 +1,32 @@
+"""session token revocation
+
+Session tokens issued before user.tokens_valid_after are rejected; it is set when the user changes
+their password or deletes their account.
+
+Revision ID: 5b4ba8b77e58
+Revises: fe6a75159353
+Create Date: 2026-10-19 16:02:17.749385
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "5b4ba8b77e58"
+down_revision: Union[str, None] = "fe6a75159353"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column("user", sa.Column("tokens_valid_after", sa.DateTime(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column("user", "tokens_valid_after")
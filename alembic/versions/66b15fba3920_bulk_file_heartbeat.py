@@ -0,0 +1,33 @@
+"""bulk file heartbeat
+
+bulk_emails_stats.updated_at is moved by the bulk job with every persisted chunk. A file still
+Processing whose heartbeat is old belongs to a job that died, its credit reservation can be released.
+The column is nullable without default, adding it is a catalog change only.
+
+Revision ID: 66b15fba3920
+Revises: d0161f7ca717
+Create Date: 2026-10-19 16:20:37.910203
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "66b15fba3920"
+down_revision: Union[str, None] = "d0161f7ca717"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column("bulk_emails_stats", sa.Column("updated_at", sa.DateTime(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column("bulk_emails_stats", "updated_at")
@@ -0,0 +1,205 @@
+"""baseline schema
+
+The tables as create_all built them before the migrations existed, so an empty database can be
+migrated to head. A database created that way is marked with ``alembic stamp 681ce648301e`` instead.
+
+Revision ID: 681ce648301e
+Revises:
+Create Date: 2026-10-19 16:36:13.963621
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "681ce648301e"
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "user",
+        sa.Column("user_id", sa.String(), nullable=False),
+        sa.Column("email", sa.String(length=255), nullable=True),
+        sa.Column("first_name", sa.String(length=255), nullable=True),
+        sa.Column("last_name", sa.String(length=255), nullable=True),
+        sa.Column("address", sa.String(), nullable=True),
+        sa.Column("city", sa.String(), nullable=True),
+        sa.Column("gender", sa.String(), nullable=True),
+        sa.Column("photo_url", sa.String(), nullable=True),
+        sa.Column("country", sa.String(length=255), nullable=True),
+        sa.Column("state", sa.String(length=255), nullable=True),
+        sa.Column("zip_code", sa.String(), nullable=True),
+        sa.Column("status", sa.Boolean(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+        sa.Column("updated_at", sa.DateTime(), nullable=True),
+        sa.Column("deleted_at", sa.DateTime(), nullable=True),
+        sa.Column("deleted_by", sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint("user_id"),
+    )
+    op.create_table(
+        "roles",
+        sa.Column("role_id", sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column("role_name", sa.String(length=255), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+        sa.Column("updated_at", sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint("role_id"),
+        sa.UniqueConstraint("role_name"),
+    )
+    op.create_table(
+        "user_permission_roles",
+        sa.Column("user_id", sa.String(), nullable=False),
+        sa.Column("role_id", sa.Integer(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(["role_id"], ["roles.role_id"], ondelete="CASCADE"),
+        sa.ForeignKeyConstraint(["user_id"], ["user.user_id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("user_id", "role_id"),
+    )
+    op.create_table(
+        "credits",
+        sa.Column("credit_id", sa.BigInteger(), nullable=False),
+        sa.Column("user_id", sa.String(), nullable=False),
+        sa.Column("is_paid", sa.Boolean(), nullable=True),
+        sa.Column("total_credits", sa.Integer(), nullable=True),
+        sa.Column("remaining_credits", sa.Integer(), nullable=True),
+        sa.Column("last_updated", sa.DateTime(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+        sa.Column("expires_at", sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(["user_id"], ["user.user_id"]),
+        sa.PrimaryKeyConstraint("credit_id"),
+        sa.UniqueConstraint("user_id"),
+    )
+    op.create_index(op.f("ix_credits_credit_id"), "credits", ["credit_id"], unique=False)
+    op.create_table(
+        "credit_usage",
+        sa.Column("usage_id", sa.BigInteger(), nullable=False),
+        sa.Column("user_id", sa.String(), nullable=False),
+        sa.Column("email_or_file_id", sa.BigInteger(), nullable=True),
+        sa.Column("quantity_used", sa.Integer(), nullable=True),
+        sa.Column("credits_used", sa.DECIMAL(precision=8, scale=2), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(["user_id"], ["user.user_id"]),
+        sa.PrimaryKeyConstraint("usage_id"),
+    )
+    op.create_index(op.f("ix_credit_usage_usage_id"), "credit_usage", ["usage_id"], unique=False)
+    op.create_table(
+        "credit_history",
+        sa.Column("purchase_id", sa.BigInteger(), nullable=False),
+        sa.Column("user_id", sa.String(), nullable=False),
+        sa.Column("credits_purchased", sa.DECIMAL(precision=8, scale=2), nullable=True),
+        sa.Column("amount", sa.Float(), nullable=True),
+        sa.Column("purchased_at", sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(["user_id"], ["user.user_id"]),
+        sa.PrimaryKeyConstraint("purchase_id"),
+    )
+    op.create_index(op.f("ix_credit_history_purchase_id"), "credit_history", ["purchase_id"], unique=False)
+    op.create_table(
+        "subscriptions_stripe",
+        sa.Column("subscription_id", sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column("user_id", sa.String(), nullable=True),
+        sa.Column("stripe_subscription_id", sa.String(), nullable=True),
+        sa.Column("stripe_customer_id", sa.String(), nullable=True),
+        sa.Column("subscription_plan", sa.String(), nullable=True),
+        sa.Column("status", sa.Boolean(), nullable=True),
+        sa.Column("current_period_start", sa.DateTime(), nullable=True),
+        sa.Column("current_period_end", sa.DateTime(), nullable=True),
+        sa.Column("cancel_at", sa.DateTime(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+        sa.Column("ended_at", sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(["user_id"], ["user.user_id"]),
+        sa.PrimaryKeyConstraint("subscription_id"),
+    )
+    op.create_table(
+        "invoices",
+        sa.Column("id", sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column("user_id", sa.String(), nullable=True),
+        sa.Column("total", sa.DECIMAL(precision=8, scale=2), nullable=True),
+        sa.Column("amount", sa.DECIMAL(), nullable=True),
+        sa.Column("number", sa.String(), nullable=True),
+        sa.Column("tax", sa.DECIMAL(precision=8, scale=2), nullable=True),
+        sa.Column("status", sa.Boolean(), nullable=True),
+        sa.Column("card_country", sa.String(length=255), nullable=True),
+        sa.Column("billing_state", sa.String(length=255), nullable=True),
+        sa.Column("billing_zip", sa.String(length=255), nullable=True),
+        sa.Column("billing_country", sa.String(length=255), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+        sa.Column("updated_at", sa.DateTime(), nullable=True),
+        sa.Column("deleted_at", sa.DateTime(), nullable=True),
+        sa.Column("deleted_by", sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(["user_id"], ["user.user_id"]),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_table(
+        "bulk_emails_stats",
+        sa.Column("id", sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column("user_id", sa.String(), nullable=True),
+        sa.Column("file_name", sa.String(length=255), nullable=True),
+        sa.Column("duplicate_email", sa.Integer(), nullable=True),
+        sa.Column("total_valid_emails", sa.Integer(), nullable=True),
+        sa.Column("status", sa.Text(), nullable=True),
+        sa.Column("deliverable", sa.Float(), nullable=True),
+        sa.Column("risky", sa.Integer(), nullable=True),
+        sa.Column("total", sa.Integer(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+        sa.Column("soft_delete", sa.Boolean(), nullable=True),
+        sa.ForeignKeyConstraint(["user_id"], ["user.user_id"]),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_table(
+        "test_email",
+        sa.Column("id", sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column("user_id", sa.String(), nullable=True),
+        sa.Column("file_id", sa.Integer(), nullable=True),
+        sa.Column("user_tested_email", sa.Text(), nullable=True),
+        sa.Column("full_name", sa.String(length=255), nullable=True),
+        sa.Column("gender", sa.String(), nullable=True),
+        sa.Column("status", sa.String(), nullable=True),
+        sa.Column("reason", sa.String(), nullable=True),
+        sa.Column("domain", sa.String(length=255), nullable=True),
+        sa.Column("is_free", sa.Boolean(), nullable=True),
+        sa.Column("is_risky", sa.Boolean(), nullable=True),
+        sa.Column("is_valid", sa.Boolean(), nullable=True),
+        sa.Column("is_disposable", sa.Boolean(), nullable=True),
+        sa.Column("is_deliverable", sa.Boolean(), nullable=True),
+        sa.Column("has_tag", sa.Boolean(), nullable=True),
+        sa.Column("alphabetical_characters", sa.Integer(), nullable=True),
+        sa.Column("is_mailbox_full", sa.Boolean(), nullable=True),
+        sa.Column("has_role", sa.Boolean(), nullable=True),
+        sa.Column("is_accept_all", sa.Boolean(), nullable=True),
+        sa.Column("has_numerical_characters", sa.Integer(), nullable=True),
+        sa.Column("has_unicode_symbols", sa.Integer(), nullable=True),
+        sa.Column("has_no_reply", sa.Boolean(), nullable=True),
+        sa.Column("smtp_provider", sa.String(length=255), nullable=True),
+        sa.Column("mx_record", sa.String(length=255), nullable=True),
+        sa.Column("implicit_mx_record", sa.String(length=255), nullable=True),
+        sa.Column("score", sa.Integer(), nullable=True),
+        sa.Column("soft_delete", sa.Boolean(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(["file_id"], ["bulk_emails_stats.id"]),
+        sa.ForeignKeyConstraint(["user_id"], ["user.user_id"]),
+        sa.PrimaryKeyConstraint("id"),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("test_email")
+    op.drop_table("bulk_emails_stats")
+    op.drop_table("invoices")
+    op.drop_table("subscriptions_stripe")
+    op.drop_index(op.f("ix_credit_history_purchase_id"), table_name="credit_history")
+    op.drop_table("credit_history")
+    op.drop_index(op.f("ix_credit_usage_usage_id"), table_name="credit_usage")
+    op.drop_table("credit_usage")
+    op.drop_index(op.f("ix_credits_credit_id"), table_name="credits")
+    op.drop_table("credits")
+    op.drop_table("user_permission_roles")
+    op.drop_table("roles")
+    op.drop_table("user")
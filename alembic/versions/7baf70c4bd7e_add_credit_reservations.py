@@ -0,0 +1,45 @@
+"""add credit reservations
+
+Revision ID: 7baf70c4bd7e
+Revises: 681ce648301e
+Create Date: 2026-10-19 15:24:28.485198
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "7baf70c4bd7e"
+down_revision: Union[str, None] = "681ce648301e"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "credit_reservations",
+        sa.Column("reservation_id", sa.BigInteger(), nullable=False),
+        sa.Column("user_id", sa.String(), nullable=False),
+        sa.Column("email_or_file_id", sa.BigInteger(), nullable=True),
+        sa.Column("reserved", sa.Integer(), nullable=False),
+        sa.Column("used", sa.Integer(), nullable=True),
+        sa.Column("status", sa.String(length=20), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+        sa.Column("settled_at", sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(["user_id"], ["user.user_id"]),
+        sa.PrimaryKeyConstraint("reservation_id"),
+    )
+    op.create_index(
+        op.f("ix_credit_reservations_reservation_id"), "credit_reservations", ["reservation_id"], unique=False
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f("ix_credit_reservations_reservation_id"), table_name="credit_reservations")
+    op.drop_table("credit_reservations")
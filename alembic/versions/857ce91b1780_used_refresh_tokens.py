@@ -0,0 +1,42 @@
+"""used refresh tokens
+
+Refresh tokens carry a jti, recorded here when the token is exchanged at /auth/refresh so it cannot
+be used a second time. Rows are purged by the maintenance job once the token has expired.
+
+Revision ID: 857ce91b1780
+Revises: 66b15fba3920
+Create Date: 2026-10-19 16:25:29.487072
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "857ce91b1780"
+down_revision: Union[str, None] = "66b15fba3920"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "used_refresh_tokens",
+        sa.Column("jti", sa.String(length=32), nullable=False),
+        sa.Column("user_id", sa.String(), nullable=False),
+        sa.Column("used_at", sa.DateTime(), nullable=False),
+        sa.Column("expires_at", sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(["user_id"], ["user.user_id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("jti"),
+    )
+    op.create_index(op.f("ix_used_refresh_tokens_expires_at"), "used_refresh_tokens", ["expires_at"], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f("ix_used_refresh_tokens_expires_at"), table_name="used_refresh_tokens")
+    op.drop_table("used_refresh_tokens")
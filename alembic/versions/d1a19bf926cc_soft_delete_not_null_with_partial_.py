@@ -0,0 +1,127 @@
+"""soft delete not null with partial indexes
+
+Backfills soft_delete to false, makes it NOT NULL DEFAULT false and replaces the per-user / per-file
+indexes with partial ones on live rows (``WHERE NOT soft_delete``). deleted_at records when a row was
+soft deleted so the purge job can hard delete it after the retention window.
+
+Revision ID: d1a19bf926cc
+Revises: da1e98a21ea8
+Create Date: 2026-10-19 15:29:51.645303
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import context, op
+
+# revision identifiers, used by Alembic.
+revision: str = "d1a19bf926cc"
+down_revision: Union[str, None] = "da1e98a21ea8"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+TABLES = ["test_email", "bulk_emails_stats"]
+BACKFILL_BATCH_SIZE = 10000
+
+# name, table, columns, covered (INCLUDE) columns, partial predicate
+INDEXES = [
+    (
+        "ix_test_email_live_file_id_user_id_id",
+        "test_email",
+        ["file_id", "user_id", "id"],
+        ["is_deliverable", "is_risky"],
+        "NOT soft_delete",
+    ),
+    ("ix_test_email_live_user_id_created_at_id", "test_email", ["user_id", "created_at", "id"], [], "NOT soft_delete"),
+    ("ix_test_email_file_id", "test_email", ["file_id"], [], None),
+    ("ix_test_email_deleted_at", "test_email", ["deleted_at"], [], "soft_delete"),
+    ("ix_bulk_emails_stats_live_user_id_id", "bulk_emails_stats", ["user_id", "id"], ["status"], "NOT soft_delete"),
+    ("ix_bulk_emails_stats_deleted_at", "bulk_emails_stats", ["deleted_at"], [], "soft_delete"),
+]
+
+# full indexes of the previous revision, superseded by the partial ones above
+REPLACED_INDEXES = [
+    ("ix_test_email_file_id_user_id_id", "test_email", ["file_id", "user_id", "id"], ["is_deliverable", "is_risky"]),
+    ("ix_test_email_user_id_created_at_id", "test_email", ["user_id", "created_at", "id"], []),
+    ("ix_bulk_emails_stats_user_id_id", "bulk_emails_stats", ["user_id", "id"], ["status"]),
+]
+
+
+def _backfill(table: str, assignment: str, condition: str):
+    """Update in batches, each one committed, so no long lock is held on a big table."""
+    statement = (
+        f"UPDATE {table} SET {assignment} WHERE id IN "
+        f"(SELECT id FROM {table} WHERE {condition} LIMIT {BACKFILL_BATCH_SIZE})"
+    )
+    if context.is_offline_mode():
+        op.execute(f"UPDATE {table} SET {assignment} WHERE {condition}")
+        return
+    while op.get_bind().execute(sa.text(statement)).rowcount:
+        pass
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for table in TABLES:
+        op.add_column(table, sa.Column("deleted_at", sa.DateTime(), nullable=True))
+        op.alter_column(table, "soft_delete", server_default=sa.false())
+
+    with op.get_context().autocommit_block():
+        for table in TABLES:
+            _backfill(table, "soft_delete = false", "soft_delete IS NULL")
+            _backfill(table, "deleted_at = now()", "soft_delete AND deleted_at IS NULL")
+
+    # a validated CHECK lets SET NOT NULL skip its full table scan under the exclusive lock. The
+    # ACCESS EXCLUSIVE lock of ADD CONSTRAINT must be released before the scan of VALIDATE, so the
+    # validation runs in its own transaction (it only takes SHARE UPDATE EXCLUSIVE, writes go on)
+    for table in TABLES:
+        check = f"ck_{table}_soft_delete_not_null"
+        op.execute(f"ALTER TABLE {table} ADD CONSTRAINT {check} CHECK (soft_delete IS NOT NULL) NOT VALID")
+
+    with op.get_context().autocommit_block():
+        for table in TABLES:
+            op.execute(f"ALTER TABLE {table} VALIDATE CONSTRAINT ck_{table}_soft_delete_not_null")
+
+    for table in TABLES:
+        check = f"ck_{table}_soft_delete_not_null"
+        op.alter_column(table, "soft_delete", existing_type=sa.Boolean(), nullable=False)
+        op.drop_constraint(check, table, type_="check")
+
+    with op.get_context().autocommit_block():
+        for name, table, columns, covered, where in INDEXES:
+            op.create_index(
+                name,
+                table,
+                columns,
+                unique=False,
+                if_not_exists=True,
+                postgresql_concurrently=True,
+                postgresql_include=covered,
+                postgresql_where=sa.text(where) if where else None,
+            )
+        for name, table, _, _ in REPLACED_INDEXES:
+            op.drop_index(name, table_name=table, if_exists=True, postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        for name, table, columns, covered in REPLACED_INDEXES:
+            op.create_index(
+                name,
+                table,
+                columns,
+                unique=False,
+                if_not_exists=True,
+                postgresql_concurrently=True,
+                postgresql_include=covered,
+            )
+        for name, table, _, _, _ in reversed(INDEXES):
+            op.drop_index(name, table_name=table, if_exists=True, postgresql_concurrently=True)
+
+    for table in reversed(TABLES):
+        op.alter_column(table, "soft_delete", existing_type=sa.Boolean(), nullable=True, server_default=None)
+        op.drop_column(table, "deleted_at")
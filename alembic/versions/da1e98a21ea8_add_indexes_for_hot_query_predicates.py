@@ -0,0 +1,55 @@
+"""add indexes for hot query predicates
+
+Indexes matched to the filters of EmailService and CreditService, built CONCURRENTLY so the
+tables stay writable while they are created.
+
+Revision ID: da1e98a21ea8
+Revises: 7baf70c4bd7e
+Create Date: 2026-10-19 15:27:00.663048
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "da1e98a21ea8"
+down_revision: Union[str, None] = "7baf70c4bd7e"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# name, table, columns, covered (INCLUDE) columns
+INDEXES = [
+    # per-file rows and stats: results pages, exports, counts of deliverable / risky rows
+    ("ix_test_email_file_id_user_id_id", "test_email", ["file_id", "user_id", "id"], ["is_deliverable", "is_risky"]),
+    # single emails of a user, newest first
+    ("ix_test_email_user_id_created_at_id", "test_email", ["user_id", "created_at", "id"], []),
+    ("ix_bulk_emails_stats_user_id_id", "bulk_emails_stats", ["user_id", "id"], ["status"]),
+    ("ix_credit_usage_user_id_created_at", "credit_usage", ["user_id", "created_at", "usage_id"], []),
+    ("ix_credit_history_user_id_purchased_at", "credit_history", ["user_id", "purchased_at", "purchase_id"], []),
+    ("ix_credit_reservations_status_created_at", "credit_reservations", ["status", "created_at"], []),
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.get_context().autocommit_block():
+        for name, table, columns, covered in INDEXES:
+            op.create_index(
+                name,
+                table,
+                columns,
+                unique=False,
+                if_not_exists=True,
+                postgresql_concurrently=True,
+                postgresql_include=covered,
+            )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        for name, table, _, _ in reversed(INDEXES):
+            op.drop_index(name, table_name=table, if_exists=True, postgresql_concurrently=True)
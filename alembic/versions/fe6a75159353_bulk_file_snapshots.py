@@ -0,0 +1,31 @@
+"""bulk file snapshots
+
+URI of the parquet snapshot of a completed file, written by the maintenance job (SnapshotService).
+
+Revision ID: fe6a75159353
+Revises: 50d0924decdd
+Create Date: 2026-10-19 15:59:52.420526
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "fe6a75159353"
+down_revision: Union[str, None] = "50d0924decdd"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column("bulk_emails_stats", sa.Column("archive_uri", sa.String(length=1024), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column("bulk_emails_stats", "archive_uri")
@@ -0,0 +1,21 @@
+# app\database\types.py
+# column types shared by the models
+from datetime import timezone
+
+from sqlalchemy import DateTime
+from sqlalchemy.types import TypeDecorator
+
+
+class UTCDateTime(TypeDecorator):
+    """
+    ``timestamp without time zone`` holding UTC. asyncpg refuses aware datetimes for it, so they
+    are converted to naive UTC before being bound (psycopg2 used to drop the offset silently).
+    """
+
+    impl = DateTime
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is not None and value.tzinfo is not None:
+            value = value.astimezone(timezone.utc).replace(tzinfo=None)
+        return value
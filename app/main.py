@@ -1,3 +1,4 @@
+import asyncio
 from contextlib import asynccontextmanager
 
 # import jinja2
@@ -9,7 +10,9 @@ from fastapi.templating import Jinja2Templates
 
 # from app.middlewares.auth_middleware import AuthMiddleware
 from app.database.db_config import create_database  # Import create_database function
-from app.routes import auth, credit, email, subscription_stripe, user
+from app.middlewares.rate_limit_middleware import RateLimitMiddleware
+from app.routes import auth, credit, email, health, metrics, subscription_stripe, user
+from app.services.maintenance_service import MAINTENANCE_ENABLED, run_maintenance_loop
 
 # from app.routes.email_verification import router
 # from app.utils import validator
@@ -18,7 +21,22 @@ from app.utils.mail_utils import (  # get_mx_record,; validate_email_syntax,; ve
     load_disposable_domains,
 )
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Code to execute during application startup
+    print("Application is starting up...")
+    await create_database()  # Call the function to create the database and tables
+    maintenance_task = asyncio.create_task(run_maintenance_loop()) if MAINTENANCE_ENABLED else None
+
+    yield  # Application is running here
+    # Code to execute during application shutdown
+    print("Application is shutting down...")
+    if maintenance_task:
+        maintenance_task.cancel()
+
+
+app = FastAPI(lifespan=lifespan)
 
 disposable_domains = load_disposable_domains()
 
@@ -76,16 +94,8 @@ async def index_post_htmlresponse(
 #         return JSONResponse(status_code=500, content={"error": str(e)})
 
 
-@asynccontextmanager
-async def lifespan(app: FastAPI):
-    # Code to execute during application startup
-    print("Application is starting up...")
-    create_database()  # Call the function to create the database and tables
-
-    yield  # Application is running here
-    # Code to execute during application shutdown
-    print("Application is shutting down...")
-
+# Rate limits per client and route class, added first so that CORS wraps its 429 responses too
+app.add_middleware(RateLimitMiddleware)
 
 # Add CORS middleware for cross-origin requests
 app.add_middleware(
@@ -103,6 +113,8 @@ app.include_router(user.router)
 app.include_router(subscription_stripe.router)
 app.include_router(email.router)
 app.include_router(credit.router)
+app.include_router(metrics.router)
+app.include_router(health.router)
 
 
 # Health Check Route
@@ -0,0 +1,157 @@
+# app\middlewares\rate_limit_middleware.py
+# token bucket rate limits per client and route class, so one client looping on the verification
+# endpoints cannot take the SMTP probing capacity of everyone else
+import hashlib
+import json
+import math
+import os
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from dotenv import load_dotenv
+
+from app.utils.jwt_handler import decode_jwt_token
+
+load_dotenv()
+
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() in ("1", "true", "yes")
+# buckets kept in memory per worker, the least recently used ones are dropped past this
+RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", "100000"))
+
+# route class: (requests per minute, burst)
+LIMITS: Dict[str, Tuple[float, int]] = {
+    "check": (
+        float(os.getenv("RATE_LIMIT_CHECK_PER_MINUTE", "60")),
+        int(os.getenv("RATE_LIMIT_CHECK_BURST", "20")),
+    ),
+    "bulk": (
+        float(os.getenv("RATE_LIMIT_BULK_PER_MINUTE", "6")),
+        int(os.getenv("RATE_LIMIT_BULK_BURST", "3")),
+    ),
+    "read": (
+        float(os.getenv("RATE_LIMIT_READ_PER_MINUTE", "600")),
+        int(os.getenv("RATE_LIMIT_READ_BURST", "100")),
+    ),
+}
+
+# (method, path) of the routes doing verification work, everything else is a read
+ROUTE_CLASSES = {
+    ("POST", "/"): "check",
+    ("POST", "/email/single_email"): "check",
+    ("POST", "/email/bulk_email_stats_with_emails/upload"): "bulk",
+    ("POST", "/email/copy_past_emails"): "bulk",
+}
+EXEMPT_PREFIXES = ("/docs", "/redoc", "/openapi.json", "/static", "/stripe/webhook", "/health")
+
+
+class RateLimitStats:
+    def __init__(self):
+        self.allowed: Dict[str, int] = dict.fromkeys(LIMITS, 0)
+        self.limited: Dict[str, int] = dict.fromkeys(LIMITS, 0)
+
+    def snapshot(self, active_keys: int) -> dict:
+        return {
+            "enabled": RATE_LIMIT_ENABLED,
+            "active_keys": active_keys,
+            "limits": {
+                route_class: {"per_minute": rate, "burst": burst} for route_class, (rate, burst) in LIMITS.items()
+            },
+            "allowed": dict(self.allowed),
+            "limited": dict(self.limited),
+        }
+
+
+class TokenBuckets:
+    """Buckets keyed by (route class, client); a bucket refills at its rate up to its burst."""
+
+    def __init__(self, max_keys: int = RATE_LIMIT_MAX_KEYS):
+        self.max_keys = max_keys
+        # key -> (tokens, monotonic time of the last update)
+        self._buckets: "OrderedDict[Tuple[str, str], Tuple[float, float]]" = OrderedDict()
+        self.stats = RateLimitStats()
+
+    def take(self, route_class: str, client: str) -> float:
+        """Take a token, return 0 when allowed or the seconds until the next token otherwise."""
+        per_minute, burst = LIMITS[route_class]
+        rate = per_minute / 60
+        now = time.monotonic()
+        key = (route_class, client)
+        tokens, updated = self._buckets.pop(key, (float(burst), now))
+        tokens = min(float(burst), tokens + (now - updated) * rate)
+
+        if tokens >= 1:
+            tokens -= 1
+            retry_after = 0.0
+            self.stats.allowed[route_class] += 1
+        else:
+            retry_after = (1 - tokens) / rate if rate > 0 else 60.0
+            self.stats.limited[route_class] += 1
+
+        # an evicted bucket comes back full, which only ever lets a client through earlier
+        self._buckets[key] = (tokens, now)
+        while len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+        return retry_after
+
+    def metrics(self) -> dict:
+        return self.stats.snapshot(len(self._buckets))
+
+
+buckets = TokenBuckets()
+
+
+def route_class(method: str, path: str) -> Optional[str]:
+    if method == "OPTIONS" or path.startswith(EXEMPT_PREFIXES):
+        return None
+    return ROUTE_CLASSES.get((method, path.rstrip("/") or "/"), "read")
+
+
+def client_key(scope) -> str:
+    """The user of a token this worker can check without a round trip, the client address otherwise."""
+    headers = dict(scope.get("headers") or [])
+    authorization = headers.get(b"authorization", b"").decode("latin-1")
+    if authorization.lower().startswith("bearer "):
+        token = authorization[7:].strip()
+        try:
+            return "user:" + decode_jwt_token(token)["user_Id"]
+        except Exception:
+            pass
+        # not a valid session token: one bucket per token, no user can be charged for it and
+        # get_current_user refuses it anyway
+        return "token:" + hashlib.sha256(token.encode("utf-8")).hexdigest()[:32]
+    client = scope.get("client")
+    return "ip:" + (client[0] if client else "unknown")
+
+
+class RateLimitMiddleware:
+    """ASGI middleware answering 429 with Retry-After once a client's bucket for the route class is empty."""
+
+    def __init__(self, app, limiter: TokenBuckets = buckets):
+        self.app = app
+        self.limiter = limiter
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not RATE_LIMIT_ENABLED:
+            return await self.app(scope, receive, send)
+        limited_class = route_class(scope["method"], scope["path"])
+        if limited_class is None:
+            return await self.app(scope, receive, send)
+
+        retry_after = self.limiter.take(limited_class, client_key(scope))
+        if not retry_after:
+            return await self.app(scope, receive, send)
+
+        body = json.dumps({"detail": "Too many requests, please retry later."}).encode("utf-8")
+        await send(
+            {
+                "type": "http.response.start",
+                "status": 429,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(body)).encode()),
+                    (b"retry-after", str(math.ceil(retry_after)).encode()),
+                ],
+            }
+        )
+        await send({"type": "http.response.body", "body": body})
@@ -5,15 +5,16 @@ from sqlalchemy import (
     BigInteger,
     Boolean,
     Column,
-    DateTime,
     Float,
     ForeignKey,
+    Index,
     Integer,
     String,
 )
 from sqlalchemy.orm import relationship
 
 from app.database.db_config import Base
+from app.database.types import UTCDateTime
 
 
 class Credit(Base):
@@ -24,33 +25,49 @@ class Credit(Base):
     is_paid = Column(Boolean, default=False)
     total_credits = Column(Integer)
     remaining_credits = Column(Integer)
-    last_updated = Column(DateTime, default=datetime.utcnow)
-    created_at = Column(DateTime, default=datetime.utcnow)
-    expires_at = Column(DateTime)
+    last_updated = Column(UTCDateTime, default=datetime.utcnow)
+    created_at = Column(UTCDateTime, default=datetime.utcnow)
+    expires_at = Column(UTCDateTime)
 
     user = relationship("User", back_populates="credit")
 
 
 class CreditUsage(Base):
     __tablename__ = "credit_usage"
+    __table_args__ = (Index("ix_credit_usage_user_id_created_at", "user_id", "created_at", "usage_id"),)
 
     usage_id = Column(BigInteger, primary_key=True, index=True)
     user_id = Column(String, ForeignKey("user.user_id"), nullable=False)
     email_or_file_id = Column(BigInteger)
     quantity_used = Column(Integer)
     credits_used = Column(DECIMAL(8, 2))
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(UTCDateTime, default=datetime.utcnow)
 
     user = relationship("User", back_populates="credit_usage")
 
 
 class CreditHistory(Base):
     __tablename__ = "credit_history"
+    __table_args__ = (Index("ix_credit_history_user_id_purchased_at", "user_id", "purchased_at", "purchase_id"),)
 
     purchase_id = Column(BigInteger, primary_key=True, index=True)
     user_id = Column(String, ForeignKey("user.user_id"), nullable=False)
     credits_purchased = Column(DECIMAL(8, 2))
     amount = Column(Float)
-    purchased_at = Column(DateTime, default=datetime.utcnow)
+    purchased_at = Column(UTCDateTime, default=datetime.utcnow)
 
     user = relationship("User", back_populates="credit_history")
+
+
+class CreditReservation(Base):
+    __tablename__ = "credit_reservations"
+    __table_args__ = (Index("ix_credit_reservations_status_created_at", "status", "created_at"),)
+
+    reservation_id = Column(BigInteger, primary_key=True, index=True)
+    user_id = Column(String, ForeignKey("user.user_id"), nullable=False)
+    email_or_file_id = Column(BigInteger)
+    reserved = Column(Integer, nullable=False)  # credits taken from remaining_credits when reserving
+    used = Column(Integer)  # credits finally charged, the rest goes back on settlement
+    status = Column(String(20), nullable=False, default="held")  # { held, settled, released }
+    created_at = Column(UTCDateTime, default=datetime.utcnow)
+    settled_at = Column(UTCDateTime)
@@ -1,20 +1,38 @@
 from sqlalchemy import (
     Boolean,
     Column,
-    DateTime,
     Float,
     ForeignKey,
+    Index,
     Integer,
+    SmallInteger,
     String,
     Text,
+    UniqueConstraint,
+    event,
+    false,
+    text,
 )
 from sqlalchemy.orm import relationship
+from sqlalchemy.schema import DDL
 
 from app.database.db_config import Base
+from app.database.types import UTCDateTime
 
 
 class BulkEmailStats(Base):
     __tablename__ = "bulk_emails_stats"
+    __table_args__ = (
+        # live files only, soft deleted rows are reached through the deleted_at index by the purge job
+        Index(
+            "ix_bulk_emails_stats_live_user_id_id",
+            "user_id",
+            "id",
+            postgresql_include=["status"],
+            postgresql_where=text("NOT soft_delete"),
+        ),
+        Index("ix_bulk_emails_stats_deleted_at", "deleted_at", postgresql_where=text("soft_delete")),
+    )
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     user_id = Column(String, ForeignKey("user.user_id"))
@@ -23,18 +41,63 @@ class BulkEmailStats(Base):
         Integer
     )  # how much duplicates email in a file that is associated with table test_email and field file_id
     total_valid_emails = Column(Integer)  # how much total valid e-mail
-    status = Column(Text)  # e-mail status is { completed, Cancel, Processing }
+    status = Column(Text)  # e-mail status is { Completed, Cancel, Failed, Processing }
     deliverable = Column(Float)  # is e-mail deliverable
     risky = Column(Integer)  # how much total risky e-mail in file that is associalted with file_id number
     total = Column(Integer)  # total e-mail in files that is associated with file_id number
-    created_at = Column(DateTime)
-    soft_delete = Column(Boolean)
+    # counters kept up to date by the bulk job as chunks are persisted, NULL on files created before them
+    processed = Column(Integer, default=0)
+    deliverable_count = Column(Integer, default=0)
+    undeliverable = Column(Integer, default=0)
+    disposable = Column(Integer, default=0)
+    catch_all = Column(Integer, default=0)
+    # parquet snapshot of a completed file (SnapshotService), its rows are read from there once set
+    archive_uri = Column(String(1024))
+    created_at = Column(UTCDateTime)
+    updated_at = Column(UTCDateTime)  # heartbeat of the bulk job, moved by every persisted chunk
+    soft_delete = Column(Boolean, nullable=False, default=False, server_default=false())
+    deleted_at = Column(UTCDateTime)
 
     user = relationship("User", backref="bulk_emails_stats")
 
 
+class Domain(Base):
+    """Domain level facts of the results, referenced by ``TestEmail.domain_id`` in compact storage."""
+
+    __tablename__ = "domains"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    name = Column(String(255), nullable=False, unique=True)
+    smtp_provider = Column(String(255))
+    mx_record = Column(String(255))
+    implicit_mx_record = Column(String(255))
+    updated_at = Column(UTCDateTime)
+
+
 class TestEmail(Base):
     __tablename__ = "test_email"
+    __table_args__ = (
+        Index(
+            "ix_test_email_live_file_id_user_id_id",
+            "file_id",
+            "user_id",
+            "id",
+            postgresql_include=["is_deliverable", "is_risky"],
+            postgresql_where=text("NOT soft_delete"),
+        ),
+        Index(
+            "ix_test_email_live_user_id_created_at_id",
+            "user_id",
+            "created_at",
+            "id",
+            postgresql_where=text("NOT soft_delete"),
+        ),
+        # every row: foreign key checks and the purge of a deleted file
+        Index("ix_test_email_file_id", "file_id"),
+        Index("ix_test_email_deleted_at", "deleted_at", postgresql_where=text("soft_delete")),
+        # one partition per month, created ahead and detached after retention by the maintenance job
+        {"postgresql_partition_by": "RANGE (created_at)"},
+    )
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     user_id = Column(String, ForeignKey("user.user_id"))
@@ -62,9 +125,48 @@ class TestEmail(Base):
     mx_record = Column(String(255))
     implicit_mx_record = Column(String(255))
     score = Column(Integer)
-    soft_delete = Column(Boolean)
-    created_at = Column(DateTime)
-    soft_delete = Column(Boolean)
+    created_at = Column(UTCDateTime, primary_key=True)  # partition key, so part of the primary key
+    soft_delete = Column(Boolean, nullable=False, default=False, server_default=false())
+    deleted_at = Column(UTCDateTime)
+    # compact storage (COMPACT_RESULT_STORAGE), see app/utils/result_codec.py: the booleans packed in
+    # ``flags``, status / reason as codes and the domain facts in ``domains``; NULL on plain rows
+    domain_id = Column(Integer)
+    flags = Column(Integer)
+    status_code = Column(SmallInteger)
+    reason_code = Column(SmallInteger)
 
     user = relationship("User", backref="test_emails")
     bulk_email_stats = relationship("BulkEmailStats", backref="test_emails")
+    # no foreign key constraint: adding one scans every partition under lock, and domains are never deleted
+    domain_info = relationship("Domain", primaryjoin="foreign(TestEmail.domain_id) == Domain.id", lazy="joined")
+
+
+# rows of months without a partition yet land here instead of failing the insert
+event.listen(
+    TestEmail.__table__,
+    "after_create",
+    DDL("CREATE TABLE IF NOT EXISTS test_email_default PARTITION OF test_email DEFAULT").execute_if(
+        dialect="postgresql"
+    ),
+)
+
+
+class IdempotencyKey(Base):
+    """An ``Idempotency-Key`` sent with a verification POST and the response it got, see IdempotencyService."""
+
+    __tablename__ = "idempotency_keys"
+    __table_args__ = (
+        UniqueConstraint("user_id", "key", name="uq_idempotency_keys_user_id_key"),
+        Index("ix_idempotency_keys_created_at", "created_at"),
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    user_id = Column(String, ForeignKey("user.user_id", ondelete="CASCADE"), nullable=False)
+    key = Column(String(255), nullable=False)
+    fingerprint = Column(String(64), nullable=False)  # sha256 of the request the key was first used with
+    status = Column(String(20), nullable=False)  # in_progress, completed
+    resource_id = Column(Integer)  # file of a bulk request, known while it still runs
+    response_status = Column(Integer)
+    response_body = Column(Text)
+    created_at = Column(UTCDateTime, nullable=False)
+    updated_at = Column(UTCDateTime, nullable=False)
@@ -1,7 +1,8 @@
-from sqlalchemy import DECIMAL, Boolean, Column, DateTime, ForeignKey, Integer, String
+from sqlalchemy import DECIMAL, Boolean, Column, ForeignKey, Integer, String
 from sqlalchemy.orm import relationship
 
 from app.database.db_config import Base
+from app.database.types import UTCDateTime
 
 
 class SubscriptionsStripe(Base):
@@ -13,11 +14,11 @@ class SubscriptionsStripe(Base):
     stripe_customer_id = Column(String)
     subscription_plan = Column(String)
     status = Column(Boolean)
-    current_period_start = Column(DateTime)
-    current_period_end = Column(DateTime)
-    cancel_at = Column(DateTime)
-    created_at = Column(DateTime)
-    ended_at = Column(DateTime)
+    current_period_start = Column(UTCDateTime)
+    current_period_end = Column(UTCDateTime)
+    cancel_at = Column(UTCDateTime)
+    created_at = Column(UTCDateTime)
+    ended_at = Column(UTCDateTime)
 
     user = relationship("User", backref="subscriptions_stripe")
 
@@ -36,9 +37,9 @@ class Invoices(Base):
     billing_state = Column(String(255))
     billing_zip = Column(String(255))
     billing_country = Column(String(255))
-    created_at = Column(DateTime)
-    updated_at = Column(DateTime)
-    deleted_at = Column(DateTime)
-    deleted_by = Column(DateTime)
+    created_at = Column(UTCDateTime)
+    updated_at = Column(UTCDateTime)
+    deleted_at = Column(UTCDateTime)
+    deleted_by = Column(UTCDateTime)
 
     user = relationship("User", backref="invoices")
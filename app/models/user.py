@@ -1,8 +1,9 @@
 # app/models/user.py
-from sqlalchemy import Boolean, Column, DateTime, ForeignKey, Integer, String
+from sqlalchemy import Boolean, Column, ForeignKey, Integer, String
 from sqlalchemy.orm import relationship
 
 from app.database.db_config import Base
+from app.database.types import UTCDateTime
 
 
 class User(Base):
@@ -20,10 +21,12 @@ class User(Base):
     state = Column(String(255))
     zip_code = Column(String)
     status = Column(Boolean)
-    created_at = Column(DateTime)
-    updated_at = Column(DateTime)
-    deleted_at = Column(DateTime)
-    deleted_by = Column(DateTime)
+    created_at = Column(UTCDateTime)
+    updated_at = Column(UTCDateTime)
+    deleted_at = Column(UTCDateTime)
+    deleted_by = Column(UTCDateTime)
+    # session tokens issued before this are revoked (password change, account deletion)
+    tokens_valid_after = Column(UTCDateTime)
 
     permissions = relationship("UserPermissionRoles", backref="user", lazy=True)
     credit = relationship("Credit", back_populates="user", uselist=False)
@@ -31,13 +34,24 @@ class User(Base):
     credit_history = relationship("CreditHistory", back_populates="user")
 
 
+class UsedRefreshToken(Base):
+    """Refresh tokens already exchanged at /auth/refresh, each one is good for a single use."""
+
+    __tablename__ = "used_refresh_tokens"
+
+    jti = Column(String(32), primary_key=True)
+    user_id = Column(String, ForeignKey("user.user_id", ondelete="CASCADE"), nullable=False)
+    used_at = Column(UTCDateTime, nullable=False)
+    expires_at = Column(UTCDateTime, nullable=False, index=True)  # the token is refused anyway past this
+
+
 class Role(Base):
     __tablename__ = "roles"
 
     role_id = Column(Integer, primary_key=True, autoincrement=True)
     role_name = Column(String(255), unique=True, nullable=False)
-    created_at = Column(DateTime)
-    updated_at = Column(DateTime)
+    created_at = Column(UTCDateTime)
+    updated_at = Column(UTCDateTime)
 
     users = relationship("UserPermissionRoles", backref="role", lazy=True)
 
@@ -47,4 +61,4 @@ class UserPermissionRoles(Base):
 
     user_id = Column(String, ForeignKey("user.user_id", ondelete="CASCADE"), primary_key=True)
     role_id = Column(Integer, ForeignKey("roles.role_id", ondelete="CASCADE"), primary_key=True)
-    created_at = Column(DateTime)
+    created_at = Column(UTCDateTime)
@@ -1,5 +1,5 @@
 from fastapi import APIRouter, Body, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.database.db_config import get_db
 
@@ -11,7 +11,7 @@ from app.schemas.auth import (
     UserRegisterRequest,
 )
 from app.services.auth_service import AuthService
-from app.utils.jwt_handler import create_jwt_token, get_current_user
+from app.utils.jwt_handler import get_current_user
 
 router = APIRouter(prefix="/auth", tags=["Authentication"])
 
@@ -23,11 +23,11 @@ async def get_logged_in_user(user: UserID = Depends(get_current_user)):
 
 
 @router.post("/register", status_code=status.HTTP_201_CREATED)
-def register_user(user_data: UserRegisterRequest, db: Session = Depends(get_db)):
+async def register_user(user_data: UserRegisterRequest, db: AsyncSession = Depends(get_db)):
 
     service = AuthService(db)
     try:
-        service.register_user(user_data)
+        await service.register_user(user_data)
         return {
             "message": "User registered successfully. Please verify your email.",
             "status_code": status.HTTP_201_CREATED,
@@ -38,27 +38,39 @@ def register_user(user_data: UserRegisterRequest, db: Session = Depends(get_db))
 
 
 @router.post("/login")
-def login_user(
+async def login_user(
     id_token: str = Body(..., embed=True),  # expects {"id_token": "..."}
     db=Depends(get_db),
 ):
     auth_service = AuthService(db)
-    user = auth_service.login_user(id_token)
-
-    token = create_jwt_token({"user_Id": user.user_id})
+    user = await auth_service.login_user(id_token)
 
+    # Firebase is only involved here, the session tokens are verified locally on every other request
     return {
         "message": "Login successful",
         "status_code": status.HTTP_200_OK,
-        "access_token": token,
+        **auth_service.issue_session(user),
+    }
+
+
+@router.post("/refresh")
+async def refresh_session(
+    refresh_token: str = Body(..., embed=True),  # expects {"refresh_token": "..."}
+    db: AsyncSession = Depends(get_db),
+):
+    auth_service = AuthService(db)
+    return {
+        "message": "Session refreshed",
+        "status_code": status.HTTP_200_OK,
+        **await auth_service.refresh_session(refresh_token),
     }
 
 
 @router.post("/forgot-password")
-def forgot_password(email: str, db: Session = Depends(get_db)):
+async def forgot_password(email: str, db: AsyncSession = Depends(get_db)):
     auth_service = AuthService(db)
     try:
-        auth_service.send_password_reset_email(email)
+        await auth_service.send_password_reset_email(email)
         return {
             "message": "Password reset email sent successfully.",
             "status_code": status.HTTP_200_OK,
@@ -73,22 +85,22 @@ def forgot_password(email: str, db: Session = Depends(get_db)):
 
 @router.post("/change-password")
 async def change_password(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     payload: ChangePasswordRequest = Body(...),
     current_user=Depends(get_current_user),
 ):
     auth_service = AuthService(db)
-    result = auth_service.change_password(current_user.user_Id, payload.new_password)
+    result = await auth_service.change_password(current_user.user_Id, payload.new_password)
     return {
-        "message": result["message"],
+        **result,
         "status_code": status.HTTP_200_OK,
     }
 
 
 @router.delete("/delete", status_code=status.HTTP_200_OK)
-def delete_user_account(
+async def delete_user_account(
     user: UserID = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
     service = AuthService(db)
-    return service.delete_firebase_user(uid=user.user_Id, email=user.email)
+    return await service.delete_firebase_user(uid=user.user_Id, email=user.email)
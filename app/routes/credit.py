@@ -1,9 +1,12 @@
 # from app.middlewares.auth_middleware import get_current_user
 
-from fastapi import APIRouter, Depends, status
-from sqlalchemy.orm import Session
+from datetime import datetime
+from typing import Optional
 
-from app.database.db_config import get_db
+from fastapi import APIRouter, Depends, Query, status
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database.db_config import get_db, get_read_db
 from app.schemas.auth import UserID
 from app.schemas.credit import (
     CreditBalanceResponseWrapper,
@@ -13,33 +16,56 @@ from app.schemas.credit import (
 )
 from app.services.credit_service import CreditService
 from app.utils.jwt_handler import get_current_user
+from app.utils.pagination import PageParams
 
 router = APIRouter(prefix="/credits", tags=["Credits"])
 
 
 @router.get("/balance", summary="Get current credit balance", response_model=CreditBalanceResponseWrapper)
-def get_credit_balance(user: UserID = Depends(get_current_user), db: Session = Depends(get_db)):
+async def get_credit_balance(user: UserID = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
     service = CreditService(db)
-    credit_data = service.fetch_credit_balance(user.user_Id)
+    credit_data = await service.fetch_credit_balance(user.user_Id)
     return CreditBalanceResponseWrapper(
         message="Credit balance read successfully", status=status.HTTP_200_OK, data=credit_data
     )
 
 
 @router.get("/usage", summary="Get all credit usage for user", response_model=CreditUsageResponseWrapper)
-def get_credit_usage(user: UserID = Depends(get_current_user), db: Session = Depends(get_db)):
+async def get_credit_usage(
+    page: PageParams = Depends(),
+    created_from: Optional[datetime] = Query(None),
+    created_to: Optional[datetime] = Query(None),
+    user: UserID = Depends(get_current_user),
+    db: AsyncSession = Depends(get_read_db),
+):
     service = CreditService(db)
-    usage_data = service.fetch_credit_usage(user.user_Id)
+    usage_data, next_cursor = await service.fetch_credit_usage(
+        user.user_Id, page.cursor, page.limit, page.descending, created_from, created_to
+    )
     usage_data_dict = [CreditUsageResponse.model_validate(item) for item in usage_data]
     return CreditUsageResponseWrapper(
-        message="Credit usage found successfully", status=status.HTTP_200_OK, data=usage_data_dict
+        message="Credit usage found successfully",
+        status=status.HTTP_200_OK,
+        data=usage_data_dict,
+        next_cursor=next_cursor,
     )
 
 
 @router.get("/history", summary="Get credit purchase history", response_model=CreditHistoryResponseWrapper)
-def get_credit_history(user: UserID = Depends(get_current_user), db: Session = Depends(get_db)):
+async def get_credit_history(
+    page: PageParams = Depends(),
+    purchased_from: Optional[datetime] = Query(None),
+    purchased_to: Optional[datetime] = Query(None),
+    user: UserID = Depends(get_current_user),
+    db: AsyncSession = Depends(get_read_db),
+):
     service = CreditService(db)
-    history_data = service.fetch_credit_history(user.user_Id)
+    history_data, next_cursor = await service.fetch_credit_history(
+        user.user_Id, page.cursor, page.limit, page.descending, purchased_from, purchased_to
+    )
     return CreditHistoryResponseWrapper(
-        message="Credit purchase history found successfully", status=status.HTTP_200_OK, data=history_data
+        message="Credit purchase history found successfully",
+        status=status.HTTP_200_OK,
+        data=history_data,
+        next_cursor=next_cursor,
     )
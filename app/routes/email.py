@@ -1,10 +1,22 @@
 # app\routes\email.py
-from fastapi import APIRouter, Depends, File, HTTPException, Query, UploadFile, status
+from datetime import datetime
+from typing import Optional
+
+from fastapi import (
+    APIRouter,
+    Depends,
+    File,
+    Header,
+    HTTPException,
+    Query,
+    UploadFile,
+    status,
+)
 from fastapi.encoders import jsonable_encoder
-from fastapi.responses import JSONResponse
-from sqlalchemy.orm import Session
+from fastapi.responses import JSONResponse, StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.database.db_config import get_db
+from app.database.db_config import ReadSessionLocal, get_db, get_read_db
 from app.schemas.auth import UserID
 from app.schemas.email import (
     AllTestEmailsByFileResponseWrapper,
@@ -14,6 +26,7 @@ from app.schemas.email import (
     FileStatsResponse,
     FileStatsResponseWrapper,
     TestEmailBase,
+    TestEmailPageWrapper,
     TestEmailResponse,
     TestEmailResponseWrapper,
     TestEmailWrapper,
@@ -21,29 +34,53 @@ from app.schemas.email import (
 )
 from app.schemas.user import UserInfo
 from app.services.email_service import EmailService
+from app.services.idempotency_service import IdempotencyService, request_fingerprint
+from app.utils.export import (
+    content_disposition,
+    iter_csv,
+    iter_parquet,
+    parquet_available,
+)
 from app.utils.jwt_handler import get_current_user
+from app.utils.pagination import (
+    DEFAULT_FILES_PAGE_SIZE,
+    DEFAULT_PAGE_SIZE,
+    MAX_FILES_PAGE_SIZE,
+    MAX_PAGE_SIZE,
+    PageParams,
+)
 
 router = APIRouter(prefix="/email", tags=["Email Validation Functions"])
 
 
 @router.post("/single_email", response_model=TestEmailWrapper)
 async def create_single_email(
-    test_email: TestEmailBase, db: Session = Depends(get_db), user: UserID = Depends(get_current_user)
+    test_email: TestEmailBase,
+    db: AsyncSession = Depends(get_db),
+    user: UserID = Depends(get_current_user),
+    idempotency_key: Optional[str] = Header(None, max_length=255),
 ):
     service = EmailService(db)
-    email = await service.create_email(user.user_Id, test_email)
 
-    return TestEmailWrapper(
-        message="Email tested successfully.",
-        status=status.HTTP_201_CREATED,
-        data=TestEmailBase.model_validate(email),
-    )
+    async def run(on_registered):
+        email = await service.create_email(user.user_Id, test_email)
+        return status.HTTP_200_OK, jsonable_encoder(
+            TestEmailWrapper(
+                message="Email tested successfully.",
+                status=status.HTTP_201_CREATED,
+                data=TestEmailBase.model_validate(email),
+            )
+        )
+
+    # a retry with the same Idempotency-Key gets the first response back, verified and charged once
+    fingerprint = request_fingerprint("single_email", test_email.model_dump_json())
+    return await IdempotencyService(db).handle(user.user_Id, idempotency_key, fingerprint, run)
 
 
 @router.get("/single_email/{test_email_id}", response_model=TestEmailResponseWrapper)
-def get_single_test_email(test_email_id: int, db: Session = Depends(get_db)):
+async def get_single_test_email(test_email_id: int, db: AsyncSession = Depends(get_read_db)):
     service = EmailService(db)
-    test_email = service.get_test_email(test_email_id)
+    test_email = await service.get_test_email(test_email_id)
 
     return TestEmailResponseWrapper(
         message="email found successfully.",
@@ -53,16 +90,34 @@ def get_single_test_email(test_email_id: int, db: Session = Depends(get_db)):
 
 
 @router.get("/all_single_emails", response_model=AllTestEmaislByUserId)
-def get_all_single_emails_by_user_id(db: Session = Depends(get_db), user: UserID = Depends(get_current_user)):
+async def get_all_single_emails_by_user_id(
+    page: PageParams = Depends(),
+    deliverable: Optional[bool] = Query(None),
+    risky: Optional[bool] = Query(None),
+    created_from: Optional[datetime] = Query(None),
+    created_to: Optional[datetime] = Query(None),
+    db: AsyncSession = Depends(get_read_db),
+    user: UserID = Depends(get_current_user),
+):
     """
-    Get all test emails for the current user.
+    Get the test emails of the current user, one page at a time (newest first by default).
     """
     service = EmailService(db)
-    test_emails = service.get_all_emails(user.user_Id)  # type: ignore
+    test_emails, next_cursor = await service.get_all_emails(
+        user.user_Id,  # type: ignore
+        page.cursor,
+        page.limit,
+        page.descending,
+        deliverable=deliverable,
+        risky=risky,
+        created_from=created_from,
+        created_to=created_to,
+    )
     return {
         "message": "All test emails read successfully.",
         "status": status.HTTP_200_OK,
-        "data": jsonable_encoder(test_emails),
+        "data": [TestEmailResponse.model_validate(email) for email in test_emails],
+        "next_cursor": next_cursor,
     }
 
 
@@ -72,31 +127,39 @@ def get_all_single_emails_by_user_id(db: Session = Depends(get_db), user: UserID
 )
 async def upload_bulk_email_file(
     file: UploadFile = File(...),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     user: UserInfo = Depends(get_current_user),
+    idempotency_key: Optional[str] = Header(None, max_length=255),
 ):
     if file.filename.endswith(".csv"):
-        try:
-            contents = await file.read()
-            file_content = contents.decode("utf-8")
+        contents = await file.read()
 
-            service = EmailService(db)
+        async def run(on_registered):
+            try:
+                file_content = contents.decode("utf-8")
 
-            # ✅ Use `user.id` instead of `user.user_id`
-            result = await service.validate_emails_from_csv(user.user_Id, file_content, file.filename)
+                service = EmailService(db)
 
-            return JSONResponse(
-                status_code=status.HTTP_201_CREATED,
-                content=jsonable_encoder(
+                # ✅ Use `user.id` instead of `user.user_id`
+                result = await service.validate_emails_from_csv(
+                    user.user_Id, file_content, file.filename, on_registered=on_registered
+                )
+
+                return status.HTTP_201_CREATED, jsonable_encoder(
                     {
                         "message": "Bulk emails created successfully from file",
                         "Status_Code": status.HTTP_201_CREATED,
                         "data": result,
                     }
-                ),
-            )
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=str(e))
+                )
+            except HTTPException:
+                # keep the status and headers of 403 (credits), 503 + Retry-After (admission)...
+                raise
+            except Exception as e:
+                raise HTTPException(status_code=500, detail=str(e))
+
+        fingerprint = request_fingerprint("upload", file.filename, contents)
+        return await IdempotencyService(db).handle(user.user_Id, idempotency_key, fingerprint, run)
     else:
         raise HTTPException(status_code=400, detail="File type not supported. Please upload a CSV file.")
 
@@ -110,32 +173,78 @@ async def upload_bulk_email_file(
 )
 async def copy_past_emails(
     payload: BulkEmailStatsCreateWithEmails,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     user: UserInfo = Depends(get_current_user),
+    idempotency_key: Optional[str] = Header(None, max_length=255),
 ):
     service = EmailService(db)
-    result = await service.copy_past_emails(user_id=user.user_Id, emails=payload.test_emails)
 
-    return JSONResponse(
-        status_code=status.HTTP_201_CREATED,
-        content=jsonable_encoder(
+    async def run(on_registered):
+        result = await service.copy_past_emails(
+            user_id=user.user_Id, emails=payload.test_emails, on_registered=on_registered
+        )
+        return status.HTTP_201_CREATED, jsonable_encoder(
             {
                 "message": "Emails validated successfully",
                 "Status_Code": status.HTTP_201_CREATED,
                 "data": result,
             }
-        ),
-    )
+        )
+
+    fingerprint = request_fingerprint("copy_past_emails", payload.model_dump_json())
+    return await IdempotencyService(db).handle(user.user_Id, idempotency_key, fingerprint, run)
+
+
+@router.get("/bulk_emails_file/{file_id}/results", response_model=TestEmailPageWrapper)
+async def get_bulk_file_results(
+    file_id: int,
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page"),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    db: AsyncSession = Depends(get_read_db),
+    user: UserID = Depends(get_current_user),
+):
+    service = EmailService(db)
+    emails, next_cursor = await service.get_file_results_page(file_id, user.user_Id, cursor, limit)  # type: ignore
+
+    return {
+        "message": "Emails fetched successfully.",
+        "status": status.HTTP_200_OK,
+        "data": [TestEmailResponse.model_validate(email) for email in emails],
+        "next_cursor": next_cursor,
+    }
+
+
+async def _stream_file_results(file_id: int, user_id: str):
+    # the stream outlives the request dependencies, so it reads through its own session
+    async with ReadSessionLocal() as db:
+        async for email in EmailService(db).iter_file_results(file_id, user_id):
+            yield TestEmailResponse.model_validate(email).model_dump_json() + "\n"
+
+
+@router.get("/bulk_emails_file/{file_id}/results.ndjson", summary="Stream all rows of a file as NDJSON")
+async def stream_bulk_file_results(
+    file_id: int,
+    db: AsyncSession = Depends(get_read_db),
+    user: UserID = Depends(get_current_user),
+):
+    await EmailService(db).get_bulk_file(file_id, user.user_Id)  # type: ignore
+
+    return StreamingResponse(_stream_file_results(file_id, user.user_Id), media_type="application/x-ndjson")
 
 
 @router.get("/allbulk_emails_group_by_files", response_model=AllTestEmailsByFileResponseWrapper)
-def get_all_bulk_emails_grouped_by_files(
-    db: Session = Depends(get_db),
+async def get_all_bulk_emails_grouped_by_files(
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page"),
+    limit: int = Query(DEFAULT_FILES_PAGE_SIZE, ge=1, le=MAX_FILES_PAGE_SIZE, description="files per page"),
+    rows_per_file: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    db: AsyncSession = Depends(get_read_db),
     user: UserID = Depends(get_current_user),
 ):
 
     service = EmailService(db)
-    grouped_emails = service.get_all_emails_grouped_by_files(user.user_Id)  # type: ignore
+    grouped_emails, next_cursor = await service.get_all_emails_grouped_by_files(
+        user.user_Id, cursor, limit, rows_per_file  # type: ignore
+    )
 
     return {
         "message": "Emails fetched successfully",
@@ -145,20 +254,22 @@ def get_all_bulk_emails_grouped_by_files(
                 "file_id": group["file_id"],
                 "file_name": group["file_name"],
                 "emails": [TestEmailResponse.model_validate(email) for email in group["emails"]],
+                "rows_cursor": group["rows_cursor"],
             }
             for group in grouped_emails
         ],
+        "next_cursor": next_cursor,
     }
 
 
 @router.get("/bulk_emails_file_stats/{file_id}", response_model=FileStatsResponseWrapper)
-def get_file_stats_by_file_id(
+async def get_file_stats_by_file_id(
     file_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
     user: UserID = Depends(get_current_user),
 ):
     service = EmailService(db)
-    stats = service.get_file_stats(file_id, user.user_Id)  # type: ignore
+    stats = await service.get_file_stats(file_id, user.user_Id)  # type: ignore
 
     if not stats:
         raise HTTPException(status_code=404, detail="File not found or no emails present")
@@ -172,13 +283,13 @@ def get_file_stats_by_file_id(
 
 @router.put("/filename_update")
 async def update_filename(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     file_id: int = Query(...),
     new_filename: str = Query(...),
     user: UserInfo = Depends(get_current_user),
 ):
     service = EmailService(db)
-    updated_filename = service.update_file_name_by_id(file_id, new_filename, user.user_Id)  # type: ignore
+    updated_filename = await service.update_file_name_by_id(file_id, new_filename, user.user_Id)  # type: ignore
 
     return JSONResponse(
         status_code=status.HTTP_202_ACCEPTED,
@@ -193,12 +304,12 @@ async def update_filename(
 @router.delete("/single_tested_email", response_model=TestEmailWrapper)
 async def delete_single_email(
     test_email_id: int = Query(...),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     user: UserInfo = Depends(get_current_user),
 ):
     """Soft deletes test email by ID"""
     service = EmailService(db)
-    deleted_email = service.soft_delete_email_by_id(test_email_id, user.user_Id)  # type: ignore
+    deleted_email = await service.soft_delete_email_by_id(test_email_id, user.user_Id)  # type: ignore
 
     return JSONResponse(
         status_code=status.HTTP_200_OK,
@@ -213,12 +324,12 @@ async def delete_single_email(
 @router.delete("/bulk_emails_file_by_file_id")
 async def delete_bulk_emails_file(
     file_id: int = Query(...),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     user: UserInfo = Depends(get_current_user),
 ):
     """Soft delete bulk email stats by ID"""
     service = EmailService(db)
-    deleted_file = service.soft_delete_bulk_emails_file_by_id(file_id, user.user_Id)  # type: ignore
+    deleted_file = await service.soft_delete_bulk_emails_file_by_id(file_id, user.user_Id)  # type: ignore
 
     return {
         "message": "Bulk emails file have been deleted successfully.",
@@ -227,30 +338,94 @@ async def delete_bulk_emails_file(
     }
 
 
+@router.post("/bulk_emails_file/{file_id}/cancel", summary="Cancel a running bulk email validation")
+async def cancel_bulk_emails_file(
+    file_id: int,
+    db: AsyncSession = Depends(get_db),
+    user: UserInfo = Depends(get_current_user),
+):
+    """Stops the job, keeps the rows verified so far and charges credits only for them"""
+    service = EmailService(db)
+    cancelled_file = await service.cancel_bulk_job(file_id, user.user_Id)  # type: ignore
+
+    return {
+        "message": "Bulk emails file cancelled successfully.",
+        "Status_Code": status.HTTP_200_OK,
+        "data": BulkEmailStatsRead.model_validate(cancelled_file),
+    }
+
+
+async def _stream_export_rows(file_id: int, user_id: str, filters: dict):
+    async with ReadSessionLocal() as db:
+        async for row in EmailService(db).iter_export_rows(file_id, user_id, **filters):
+            yield row
+
+
+@router.get("/export/{file_id}", summary="Download the results of a file as CSV or Parquet")
+async def export_bulk_file(
+    file_id: int,
+    file_format: str = Query("csv", alias="format", pattern="^(csv|parquet)$"),
+    risky: Optional[bool] = Query(None),
+    deliverable: Optional[bool] = Query(None),
+    min_score: Optional[int] = Query(None),
+    max_score: Optional[int] = Query(None),
+    db: AsyncSession = Depends(get_read_db),
+    user: UserID = Depends(get_current_user),
+):
+    """Streams the file straight from the database, memory use does not depend on the file size"""
+    bulk_file = await EmailService(db).get_bulk_file(file_id, user.user_Id)  # type: ignore
+    file_name = (bulk_file.file_name or f"file-{file_id}").rsplit(".", 1)[0]
+
+    filters = {"risky": risky, "deliverable": deliverable, "min_score": min_score, "max_score": max_score}
+    rows = _stream_export_rows(file_id, user.user_Id, filters)
+
+    if file_format == "parquet":
+        if not parquet_available():
+            raise HTTPException(status_code=501, detail="Parquet export is not available on this server.")
+        return StreamingResponse(
+            iter_parquet(rows),
+            media_type="application/vnd.apache.parquet",
+            headers={"Content-Disposition": content_disposition(file_name, "parquet")},
+        )
+
+    return StreamingResponse(
+        iter_csv(rows),
+        media_type="text/csv",
+        headers={"Content-Disposition": content_disposition(file_name, "csv")},
+    )
+
+
 @router.get("/emails_for_csv/{file_id}", response_model=dowloadFileWrapper)
-def get_emails_for_csv(
+async def get_emails_for_csv(
     file_id: int,
     include_risky: bool = Query(True),
-    db: Session = Depends(get_db),
+    page: PageParams = Depends(),
+    db: AsyncSession = Depends(get_read_db),
     user: UserID = Depends(get_current_user),
 ):
     service = EmailService(db)
-    emails = service.get_emails_for_csv(file_id, user.user_Id, include_risky)  # type: ignore
+    emails, next_cursor = await service.get_emails_for_csv(
+        file_id, user.user_Id, include_risky, page.cursor, page.limit, page.descending  # type: ignore
+    )
     return {
         "message": "Emails fetched successfully.",
         "status": status.HTTP_200_OK,
-        "data": [TestEmailResponse.model_validate(jsonable_encoder(email)) for email in emails],
+        "data": [TestEmailResponse.model_validate(email) for email in emails],
+        "next_cursor": next_cursor,
     }
 
 
 @router.get("/all_files_with_delieved_emails_and_status", response_model=FileStatsResponse)
-def get_user_files(user: UserInfo = Depends(get_current_user), db: Session = Depends(get_db)):
+async def get_user_files(
+    page: PageParams = Depends(), user: UserInfo = Depends(get_current_user), db: AsyncSession = Depends(get_read_db)
+):
     """
     Get all uploaded files with their delivered email stats and status.
 
     Args:
 
         current_user (User): The currently authenticated user.
+        page (PageParams): cursor / limit / order of the page of files.
 
     Returns:
 
@@ -258,5 +433,12 @@ def get_user_files(user: UserInfo = Depends(get_current_user), db: Session = Dep
     """
 
     service = EmailService(db)
-    files_data = service.get_all_files_with_delieved_emails_and_status(user.user_Id)
-    return {"message": "Files fetched successfully.", "status": status.HTTP_200_OK, "data": files_data}
+    files_data, next_cursor = await service.get_all_files_with_delieved_emails_and_status(
+        user.user_Id, page.cursor, page.limit, page.descending
+    )
+    return {
+        "message": "Files fetched successfully.",
+        "status": status.HTTP_200_OK,
+        "data": files_data,
+        "next_cursor": next_cursor,
+    }
@@ -0,0 +1,29 @@
+# app\routes\health.py
+# liveness and readiness probes for the load balancer: a saturated worker stays live but stops
+# being ready, so new checks are routed to the other workers until its queue drains
+from fastapi import APIRouter, status
+from fastapi.responses import JSONResponse
+
+from app.utils.admission import admission
+from app.utils.scheduler import INTERACTIVE, verification_scheduler
+
+router = APIRouter(prefix="/health", tags=["Health Check"])
+
+
+@router.get("/live", summary="The process is up and serving requests")
+def liveness():
+    return {"status": "ok"}
+
+
+@router.get("/ready", summary="Ready to take new verification work")
+def readiness():
+    # only the interactive lane decides: bulk jobs stay on the worker that accepted them anyway
+    ready = not admission.saturated(INTERACTIVE)
+    return JSONResponse(
+        status_code=status.HTTP_200_OK if ready else status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={
+            "status": "ok" if ready else "saturated",
+            "scheduler": verification_scheduler.stats(),
+            "admission": admission.stats(),
+        },
+    )
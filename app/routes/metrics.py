@@ -0,0 +1,25 @@
+# app\routes\metrics.py
+from fastapi import APIRouter, status
+
+from app.database.db_config import pool_metrics
+from app.middlewares.rate_limit_middleware import buckets
+
+router = APIRouter(prefix="/metrics", tags=["Metrics"])
+
+
+@router.get("/db-pool", summary="Connection pool usage and checkout wait times")
+def get_db_pool_metrics():
+    return {
+        "message": "Database pool metrics fetched successfully.",
+        "status": status.HTTP_200_OK,
+        "data": pool_metrics(),
+    }
+
+
+@router.get("/rate-limits", summary="Rate limits, and requests allowed and refused per route class")
+def get_rate_limit_metrics():
+    return {
+        "message": "Rate limit metrics fetched successfully.",
+        "status": status.HTTP_200_OK,
+        "data": buckets.metrics(),
+    }
@@ -1,6 +1,6 @@
 from fastapi import APIRouter, Depends, HTTPException, Request, status
 from fastapi.responses import JSONResponse
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.database.db_config import get_db
 from app.schemas.subcription_stripe import CheckoutSessionRequest, UserInfo
@@ -14,7 +14,7 @@ router = APIRouter(prefix="/stripe", tags=["Stripe"])
 async def create_session(
     data: CheckoutSessionRequest,
     user: UserInfo = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
     service = PaymentService(db)
     checkout_url = service.create_checkout_session(
@@ -28,13 +28,13 @@ async def create_session(
 
 
 @router.post("/webhook")
-async def stripe_webhook(request: Request, db: Session = Depends(get_db)):
+async def stripe_webhook(request: Request, db: AsyncSession = Depends(get_db)):
     try:
         payload = await request.body()
         sig_header = request.headers.get("stripe-signature")
 
         payment_service = PaymentService(db)
-        result = payment_service.handle_webhook(payload, sig_header)
+        result = await payment_service.handle_webhook(payload, sig_header)
 
         return JSONResponse(
             status_code=result["status_code"],
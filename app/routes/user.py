@@ -1,5 +1,5 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.database.db_config import get_db
 from app.schemas.auth import UserID
@@ -15,8 +15,8 @@ router = APIRouter(prefix="/user", tags=["User "])
 
 
 @router.get("/profile", response_model=UserProfileReadWrapper, summary="Get user profile")
-def get_user_profile(user: UserID = Depends(get_current_user), db: Session = Depends(get_db)):
-    profile = fetch_user_profile(user.user_Id, db)
+async def get_user_profile(user: UserID = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+    profile = await fetch_user_profile(user.user_Id, db)
     if not profile:
         raise HTTPException(status_code=404, detail="User not found")
 
@@ -26,12 +26,12 @@ def get_user_profile(user: UserID = Depends(get_current_user), db: Session = Dep
 
 
 @router.put("/update", response_model=UserProfileUpdateWrapper, summary="Update current user profile")
-def update_user_profile_route(
+async def update_user_profile_route(
     user_data: UserProfileUpdate,
     user: UserID = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
-    updated_user = update_user_profile(user.user_Id, user_data, db)
+    updated_user = await update_user_profile(user.user_Id, user_data, db)
     if not updated_user:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
 
@@ -35,6 +35,7 @@ class CreditUsageResponseWrapper(BaseModel):
     message: str
     status: int
     data: List[CreditUsageResponse]
+    next_cursor: Optional[str] = None
 
 
 class CreditHistoryResponse(BaseModel):
@@ -50,3 +51,4 @@ class CreditHistoryResponseWrapper(BaseModel):
     message: str
     status: int
     data: List[CreditHistoryResponse]
+    next_cursor: Optional[str] = None
@@ -2,7 +2,9 @@
 from datetime import datetime
 from typing import List, Optional
 
-from pydantic import BaseModel, ConfigDict, Field
+from pydantic import BaseModel, ConfigDict, Field, model_validator
+
+from app.utils.result_codec import decode_result
 
 
 # Base models (for shared fields)
@@ -21,7 +23,17 @@ class BulkEmailStatsBase(BaseModel):
     created_at: datetime
 
 
-class TestEmailBase(BaseModel):
+class CompactResultModel(BaseModel):
+    @model_validator(mode="before")
+    @classmethod
+    def decode_compact_row(cls, data):
+        # rows stored compact (COMPACT_RESULT_STORAGE) come back in the plain shape
+        if not isinstance(data, dict) and getattr(data, "flags", None) is not None:
+            return decode_result(data)
+        return data
+
+
+class TestEmailBase(CompactResultModel):
     user_tested_email: Optional[str] = None
     full_name: Optional[str] = None
     gender: Optional[str] = None
@@ -55,7 +67,7 @@ class TestEmailWrapper(BaseModel):
     data: TestEmailBase
 
 
-class TestEmailResponse(BaseModel):
+class TestEmailResponse(CompactResultModel):
     id: int
     user_tested_email: Optional[str] = None
     full_name: Optional[str] = None
@@ -94,18 +106,21 @@ class dowloadFileWrapper(BaseModel):
     message: str
     status: int
     data: List[TestEmailResponse]
+    next_cursor: Optional[str] = None
 
 
 class AllTestEmaislByUserId(BaseModel):
     message: str
     status: int
     data: List[TestEmailResponse]
+    next_cursor: Optional[str] = None
 
 
 class AllTestEmailsByFileResponse(BaseModel):
     file_id: int
     file_name: str
     emails: List[TestEmailResponse]
+    rows_cursor: Optional[str] = None  # cursor of the file's next rows on /email/bulk_emails_file/{file_id}/results
 
     model_config = ConfigDict(from_attributes=True)
 
@@ -114,6 +129,7 @@ class AllTestEmailsByFileResponseWrapper(BaseModel):
     message: str
     status: int
     data: List[AllTestEmailsByFileResponse]
+    next_cursor: Optional[str] = None
 
 
 class FileStatsResponse(BaseModel):
@@ -188,11 +204,25 @@ class BulkEmailStatsCreateWithEmails(BaseModel):
         }
 
 
-class BulkEmailStatsResponseWithEmails(BaseModel):
+class BulkEmailStatsSummary(BaseModel):
     user_id: str
     file_id: int
     file_name: str
-    test_emails: List[TestEmailBase]
+    status: Optional[str] = None  # Completed, Cancel when the job was stopped before the end, Failed
+    total: int
+    processed: int
+    duplicate_email: int
+    total_valid_emails: int
+    risky: int
+    deliverable: float
+    cursor: str  # cursor of the first page of /email/bulk_emails_file/{file_id}/results
+
+
+class TestEmailPageWrapper(BaseModel):
+    message: str
+    status: int
+    data: List[TestEmailResponse]
+    next_cursor: Optional[str] = None  # None on the last page
 
 
 class FileStats(BaseModel):
@@ -200,10 +230,11 @@ class FileStats(BaseModel):
     file_name: str
     total_emails: int
     deliverable: int
-    status: Optional[int] = None
+    status: Optional[str] = None
 
 
 class FileStatsResponse(BaseModel):
     message: str
     status: Optional[int] = None
     data: List[FileStats]
+    next_cursor: Optional[str] = None
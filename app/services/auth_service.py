@@ -1,26 +1,41 @@
 # app/services/auth_service.py
+import time
 from datetime import datetime, timedelta, timezone
 
 from fastapi import HTTPException
+from fastapi.concurrency import run_in_threadpool
 from firebase_admin import auth as firebase_auth
 from firebase_admin._auth_utils import UserNotFoundError  # Import this
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.models.credits import Credit
-from app.models.user import User
+from app.models.user import UsedRefreshToken, User
 from app.schemas.auth import UserRegisterRequest
 from app.utils.email_service import send_email_with_link
 from app.utils.firebase import verify_firebase_token
+from app.utils.jwt_handler import (
+    ACCESS_TOKEN_MINUTES,
+    create_jwt_token,
+    decode_jwt_token,
+    revocations,
+    revoked_at,
+)
 
 
 class AuthService:
-    def __init__(self, db: Session):
+    def __init__(self, db: AsyncSession):
         self.db = db
 
-    def register_user(self, user_data: UserRegisterRequest):
+    # Firebase Admin calls are blocking HTTP requests, they run in the threadpool so the event loop
+    # keeps serving other requests meanwhile
+
+    async def register_user(self, user_data: UserRegisterRequest):
         try:
             # Step 1: Create user in Firebase
-            firebase_user = firebase_auth.create_user(
+            firebase_user = await run_in_threadpool(
+                firebase_auth.create_user,
                 email=user_data.email,
                 password=user_data.password,
                 display_name=f"{user_data.first_name} {user_data.last_name}",
@@ -28,8 +43,8 @@ class AuthService:
             )
 
             # Generate email verification link and send email
-            link = firebase_auth.generate_email_verification_link(user_data.email)
-            send_email_with_link(user_data.email, link)
+            link = await run_in_threadpool(firebase_auth.generate_email_verification_link, user_data.email)
+            await run_in_threadpool(send_email_with_link, user_data.email, link)
 
             # Save user to local DB
             new_user = User(
@@ -72,22 +87,22 @@ class AuthService:
 
             self.db.add(credit_entry)
             self.db.add(new_user)
-            self.db.commit()
+            await self.db.commit()
 
             return True  # or return any data you want
 
         except Exception as e:
-            self.db.rollback()
+            await self.db.rollback()
             print(e)
             raise e  # just re-raise the exception
 
-    def login_user(self, id_token: str) -> User:
+    async def login_user(self, id_token: str) -> User:
         try:
-            user_info = verify_firebase_token(id_token)
+            user_info = await run_in_threadpool(verify_firebase_token, id_token)
             uid = user_info["uid"]
 
             # Fetch Firebase user details
-            firebase_user = firebase_auth.get_user(uid)
+            firebase_user = await run_in_threadpool(firebase_auth.get_user, uid)
             if not firebase_user.email_verified:
                 raise HTTPException(
                     status_code=403,
@@ -95,7 +110,7 @@ class AuthService:
                 )
 
             # Fetch user from local DB
-            user = self.db.query(User).filter(User.user_id == uid).first()
+            user = await self.db.scalar(select(User).where(User.user_id == uid))
             if not user:
                 raise HTTPException(status_code=404, detail="User not found. Please register first.")
 
@@ -104,13 +119,13 @@ class AuthService:
         except Exception as e:
             raise HTTPException(status_code=401, detail=f"Login failed: {str(e)}")
 
-    def send_password_reset_email(self, email: str):
+    async def send_password_reset_email(self, email: str):
         try:
             # Optional: check if user exists
-            firebase_auth.get_user_by_email(email)
+            await run_in_threadpool(firebase_auth.get_user_by_email, email)
 
-            reset_link = firebase_auth.generate_password_reset_link(email)
-            send_email_with_link(email, reset_link)
+            reset_link = await run_in_threadpool(firebase_auth.generate_password_reset_link, email)
+            await run_in_threadpool(send_email_with_link, email, reset_link)
 
             return True  # or any data you want to return
 
@@ -119,9 +134,85 @@ class AuthService:
         except Exception as e:
             raise HTTPException(status_code=400, detail=f"Failed to send password reset email: {str(e)}")
 
-    def change_password(self, uid: str, new_password: str):
+    async def change_password(self, uid: str, new_password: str):
         try:
-            firebase_auth.update_user(uid, password=new_password)
-            return {"message": "Password updated successfully."}
+            await run_in_threadpool(firebase_auth.update_user, uid, password=new_password)
         except Exception as e:
             raise HTTPException(status_code=400, detail=f"Failed to change password: {str(e)}")
+
+        # sessions opened with the old password end here, the caller gets a fresh one
+        user = await self.revoke_sessions(uid)
+        return {"message": "Password updated successfully.", **self.issue_session(user)}
+
+    async def delete_firebase_user(self, uid: str, email: str):
+        try:
+            await run_in_threadpool(firebase_auth.delete_user, uid)
+        except UserNotFoundError:
+            pass  # already gone from Firebase, the local account is still closed below
+        except Exception as e:
+            raise HTTPException(status_code=400, detail=f"Failed to delete user {email}: {str(e)}")
+
+        user = await self.revoke_sessions(uid)
+        if user:
+            user.status = False
+            user.deleted_at = datetime.now(timezone.utc)
+            await self.db.commit()
+        return {"message": "User account deleted successfully."}
+
+    # <---------------------------------- session tokens --------------
+
+    def issue_session(self, user: User) -> dict:
+        """Access and refresh token pair, the only credentials needed after login."""
+        claims = {
+            "user_Id": user.user_id,
+            "email": user.email,
+            "first_name": user.first_name,
+            "last_name": user.last_name,
+            "photoURL": user.photo_url,
+        }
+        return {
+            "access_token": create_jwt_token(claims),
+            "refresh_token": create_jwt_token({"user_Id": user.user_id}, token_type="refresh"),
+            "token_type": "bearer",
+            "expires_in": ACCESS_TOKEN_MINUTES * 60,
+        }
+
+    async def refresh_session(self, refresh_token: str) -> dict:
+        try:
+            payload = decode_jwt_token(refresh_token, token_type="refresh")
+        except Exception as e:
+            raise HTTPException(status_code=401, detail=f"Invalid refresh token: {str(e)}")
+
+        # the one place a session meets the database: deleted users and revoked tokens stop here
+        user = await self.db.scalar(select(User).where(User.user_id == payload["user_Id"]))
+        if not user or user.deleted_at or payload["iat"] < revoked_at(user.tokens_valid_after):
+            raise HTTPException(status_code=401, detail="Refresh token revoked.")
+
+        # rotation: the token is spent here and replaced by the one issued below, the primary key
+        # lets only one of two concurrent uses of the same token through
+        if not payload.get("jti"):
+            raise HTTPException(status_code=401, detail="Refresh token revoked.")
+        self.db.add(
+            UsedRefreshToken(
+                jti=payload["jti"],
+                user_id=user.user_id,
+                used_at=datetime.now(timezone.utc),
+                expires_at=datetime.fromtimestamp(payload["exp"], timezone.utc),
+            )
+        )
+        try:
+            await self.db.commit()
+        except IntegrityError:
+            await self.db.rollback()
+            raise HTTPException(status_code=401, detail="Refresh token already used.")
+        return self.issue_session(user)
+
+    async def revoke_sessions(self, uid: str) -> User:
+        """Revoke every token of the user issued until now."""
+        now = time.time()
+        user = await self.db.scalar(select(User).where(User.user_id == uid))
+        if user:
+            user.tokens_valid_after = datetime.fromtimestamp(now, timezone.utc)
+            await self.db.commit()
+        revocations.revoke(uid, now)
+        return user
@@ -1,17 +1,200 @@
-from sqlalchemy.orm import Session
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional
 
-from app.models.credits import Credit, CreditHistory, CreditUsage
+from fastapi import HTTPException
+from sqlalchemy import func, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.credits import Credit, CreditHistory, CreditReservation, CreditUsage
+from app.models.email import BulkEmailStats
+from app.utils.bulk_jobs import HEARTBEAT_TIMEOUT_SECONDS, STATUS_PROCESSING
+from app.utils.pagination import keyset_page
+
+RESERVATION_HELD = "held"
+RESERVATION_SETTLED = "settled"
+RESERVATION_RELEASED = "released"
 
 
 class CreditService:
-    def __init__(self, db: Session):
+    def __init__(self, db: AsyncSession):
         self.db = db
 
-    def fetch_credit_balance(self, user_id: str):
-        return self.db.query(Credit).filter(Credit.user_id == user_id).first()
+    async def fetch_credit_balance(self, user_id: str):
+        return await self.db.scalar(select(Credit).where(Credit.user_id == user_id))
+
+    async def fetch_credit_usage(
+        self,
+        user_id: str,
+        cursor: Optional[str],
+        limit: int,
+        descending: bool = True,
+        created_from: Optional[datetime] = None,
+        created_to: Optional[datetime] = None,
+    ):
+        query = select(CreditUsage).where(CreditUsage.user_id == user_id)
+        if created_from is not None:
+            query = query.where(CreditUsage.created_at >= created_from)
+        if created_to is not None:
+            query = query.where(CreditUsage.created_at < created_to)
+        return await keyset_page(
+            self.db, query, [CreditUsage.created_at, CreditUsage.usage_id], cursor, limit, descending
+        )
+
+    async def fetch_credit_history(
+        self,
+        user_id: str,
+        cursor: Optional[str],
+        limit: int,
+        descending: bool = True,
+        purchased_from: Optional[datetime] = None,
+        purchased_to: Optional[datetime] = None,
+    ):
+        query = select(CreditHistory).where(CreditHistory.user_id == user_id)
+        if purchased_from is not None:
+            query = query.where(CreditHistory.purchased_at >= purchased_from)
+        if purchased_to is not None:
+            query = query.where(CreditHistory.purchased_at < purchased_to)
+        return await keyset_page(
+            self.db, query, [CreditHistory.purchased_at, CreditHistory.purchase_id], cursor, limit, descending
+        )
+
+    # <---------------------------------- reservations --------------
+    # Credits are taken with one conditional UPDATE, so concurrent requests of the same account can
+    # never overspend and no row lock is held while the verification runs. A job then settles its
+    # reservation with what it really used and the rest goes back to the balance.
+
+    async def _adjust_balance(self, user_id: str, delta: int, minimum: Optional[int] = None) -> Optional[int]:
+        stmt = update(Credit).where(Credit.user_id == user_id)
+        if minimum is not None:
+            stmt = stmt.where(Credit.remaining_credits >= minimum)
+        stmt = stmt.values(
+            remaining_credits=Credit.remaining_credits + delta,
+            total_credits=Credit.total_credits + delta,
+            last_updated=datetime.utcnow(),
+        ).returning(Credit.remaining_credits)
+        return (await self.db.execute(stmt.execution_options(synchronize_session=False))).scalar_one_or_none()
+
+    async def reserve_credits(self, user_id: str, quantity: int, email_or_file_id: Optional[int] = None) -> int:
+        """Hold ``quantity`` credits and return the reservation id; 403 when the balance is too low."""
+        remaining = await self._adjust_balance(user_id, -quantity, minimum=quantity)
+        if remaining is None:
+            await self.db.rollback()
+            raise HTTPException(status_code=403, detail="Insufficient credits")
+
+        reservation = CreditReservation(
+            user_id=user_id,
+            email_or_file_id=email_or_file_id,
+            reserved=quantity,
+            status=RESERVATION_HELD,
+            created_at=datetime.now(timezone.utc),
+        )
+        self.db.add(reservation)
+        await self.db.flush()
+        reservation_id = reservation.reservation_id
+        await self.db.commit()
+        return reservation_id
+
+    async def attach_reservation(self, reservation_id: int, email_or_file_id: int):
+        """Link a held reservation to the file it pays for, in the caller's transaction."""
+        await self.db.execute(
+            update(CreditReservation)
+            .where(CreditReservation.reservation_id == reservation_id)
+            .values(email_or_file_id=email_or_file_id)
+            .execution_options(synchronize_session=False)
+        )
+
+    async def _close_reservation(
+        self,
+        reservation_id: int,
+        used: int,
+        status: str,
+        email_or_file_id: Optional[int],
+        from_status: str = RESERVATION_HELD,
+    ):
+        now = datetime.now(timezone.utc)
+        # only one caller can move a reservation out of ``from_status``, a second settle is a no-op
+        stmt = (
+            update(CreditReservation)
+            .where(CreditReservation.reservation_id == reservation_id, CreditReservation.status == from_status)
+            .values(status=status, used=used, settled_at=now)
+            .returning(CreditReservation.user_id, CreditReservation.reserved, CreditReservation.email_or_file_id)
+        )
+        closed = (await self.db.execute(stmt.execution_options(synchronize_session=False))).first()
+        if closed is None:
+            await self.db.rollback()
+            return None
+
+        user_id, reserved, reserved_for = closed
+        used = min(used, reserved)
+        # a held reservation still has all its credits taken, a released one gave them all back
+        refund = reserved - used if from_status == RESERVATION_HELD else -used
+        if refund:
+            await self._adjust_balance(user_id, refund)
+        return user_id, used, email_or_file_id or reserved_for, now
+
+    async def settle_reservation(
+        self,
+        reservation_id: int,
+        used: int,
+        email_or_file_id: Optional[int] = None,
+        quantity_used: Optional[int] = None,
+    ):
+        """Charge ``used`` credits of the reservation, record the usage and refund the rest."""
+        closed = await self._close_reservation(reservation_id, used, RESERVATION_SETTLED, email_or_file_id)
+        if closed is None and used:
+            # released meanwhile by release_stale_reservations (job taken for dead): still charge the work done
+            closed = await self._close_reservation(
+                reservation_id, used, RESERVATION_SETTLED, email_or_file_id, from_status=RESERVATION_RELEASED
+            )
+        if closed is None:
+            return
+        user_id, used, email_or_file_id, now = closed
+        if used:
+            self.db.add(
+                CreditUsage(
+                    user_id=user_id,
+                    email_or_file_id=email_or_file_id,
+                    quantity_used=used if quantity_used is None else quantity_used,
+                    credits_used=used,
+                    created_at=now,
+                )
+            )
+        await self.db.commit()
+
+    async def release_reservation(self, reservation_id: int):
+        """Give every credit of the reservation back, nothing is charged."""
+        if await self._close_reservation(reservation_id, 0, RESERVATION_RELEASED, None) is not None:
+            await self.db.commit()
+
+    async def release_stale_reservations(self, older_than: timedelta = timedelta(hours=6)) -> List[int]:
+        """Release reservations whose job died without settling (worker crash, restart...).
 
-    def fetch_credit_usage(self, user_id: str):
-        return self.db.query(CreditUsage).filter(CreditUsage.user_id == user_id).all()
+        The reservation of a bulk file still Processing is kept as long as its job moves the file's
+        heartbeat: a long file is still running, not dead.
+        """
+        now = datetime.now(timezone.utc)
+        cutoff = now - older_than
+        heartbeat_cutoff = now - timedelta(seconds=HEARTBEAT_TIMEOUT_SECONDS)
+        stale_ids = list(
+            await self.db.scalars(
+                select(CreditReservation.reservation_id)
+                .outerjoin(BulkEmailStats, BulkEmailStats.id == CreditReservation.email_or_file_id)
+                .where(
+                    CreditReservation.status == RESERVATION_HELD,
+                    CreditReservation.created_at < cutoff,
+                    or_(
+                        BulkEmailStats.id.is_(None),
+                        BulkEmailStats.status != STATUS_PROCESSING,
+                        func.coalesce(BulkEmailStats.updated_at, BulkEmailStats.created_at) < heartbeat_cutoff,
+                    ),
+                )
+            )
+        )
+        await self.db.commit()
+        for reservation_id in stale_ids:
+            await self.release_reservation(reservation_id)
+        return stale_ids
 
-    def fetch_credit_history(self, user_id: str):
-        return self.db.query(CreditHistory).filter(CreditHistory.user_id == user_id).all()
+    async def add_credits(self, user_id: str, quantity: int) -> Optional[int]:
+        """Atomically top up a balance, returns the new remaining credits (None if no credit row)."""
+        return await self._adjust_balance(user_id, quantity)
@@ -1,181 +1,205 @@
+import asyncio
 import csv
 import logging
-import re
 from datetime import datetime, timezone
 from io import StringIO
-from typing import List
+from types import SimpleNamespace
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
 
 from fastapi import HTTPException, status
 from fastapi.encoders import jsonable_encoder
-from sqlalchemy import or_
+from sqlalchemy import and_, func, select, update
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.exc import IntegrityError
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
 
-from app.models.credits import Credit, CreditUsage
-from app.models.email import BulkEmailStats, TestEmail
+from app.models.credits import Credit
+from app.models.email import BulkEmailStats, Domain, TestEmail
 from app.models.user import User
-from app.schemas.email import (
-    BulkEmailStatsResponseWithEmails,
-    CreditUsageBase,
-    TestEmailBase,
+from app.schemas.email import BulkEmailStatsSummary, TestEmailBase
+from app.services.credit_service import CreditService
+from app.utils.admission import admission
+from app.utils.bulk_jobs import (
+    BULK_CHUNK_SIZE,
+    CHARGE_UNIQUE_ONLY,
+    STATUS_CANCEL,
+    STATUS_COMPLETED,
+    STATUS_FAILED,
+    STATUS_PROCESSING,
+    bulk_jobs,
 )
+from app.utils.export import EXPORT_FIELDS, EXPORT_SELECT
 from app.utils.mail_utils import (
-    evaluate_email_score_and_risk,
-    get_mx_record,
-    get_smtp_provider,
+    analyze_email,
     load_disposable_domains,
-    perform_email_checks,
-    validate_email_syntax,
 )
+from app.utils.pagination import encode_cursor, keyset_page
+from app.utils.result_codec import (
+    COMPACT_RESULT_STORAGE,
+    DOMAIN_FIELDS,
+    decode_result,
+    encode_result,
+    result_flag,
+    with_domains,
+)
+from app.utils.scheduler import BULK, INTERACTIVE, verification_scheduler, weight_for
+from app.utils.singleflight import AsyncSingleFlight
+from app.utils.snapshots import iter_snapshot_rows, snapshot_page
 
 logger = logging.getLogger(__name__)
 
+# not produced by the checks, a single check keeps what the request sent for them
+SINGLE_CHECK_REQUEST_FIELDS = {"gender", "is_free", "has_tag", "is_mailbox_full"}
+
+verification_flights = AsyncSingleFlight()
+
+
+def verify_address(
+    email: str,
+    sender_email: str,
+    disposable_domains,
+    *,
+    user_id: str,
+    lane: str,
+    weight: float,
+    on_start: Optional[Callable[[], None]] = None,
+):
+    """
+    Queue the checks of an address, sharing the probe already in flight for it in the same lane.
+    ``on_start`` is called when the probe gets a worker, only by the caller that queued it.
+    """
+    # the lane is part of the key so a single check never ends up waiting behind the bulk lane
+    return verification_flights.do(
+        (email.strip().lower(), sender_email, lane),
+        lambda: verification_scheduler.submit(
+            analyze_email,
+            email,
+            sender_email,
+            disposable_domains,
+            user_id=user_id,
+            lane=lane,
+            weight=weight,
+            on_start=on_start,
+        ),
+    )
+
+
+def _live(model):
+    """Rows that are not soft deleted, written exactly like the ``WHERE NOT soft_delete`` partial indexes."""
+    return ~model.soft_delete
+
+
+def _in_file_partitions(file_id: int):
+    """
+    A file's rows are written with the file's ``created_at``: bounding it lets Postgres prune the
+    monthly partitions of test_email older than the file at execution time.
+    """
+    return (
+        TestEmail.created_at >= select(BulkEmailStats.created_at).where(BulkEmailStats.id == file_id).scalar_subquery()
+    )
+
 
 class EmailService:
-    def __init__(self, db: Session):
+    def __init__(self, db: AsyncSession):
         self.db = db
 
-    async def create_email(self, user_id: str, test_email: TestEmailBase, sender_email: str = "test@example.com"):
-        # Step 1: Validate User
-        user = self.db.query(User).filter(User.user_id == user_id).first()
+    # Verifications run in three phases so that no pooled connection sits idle in a transaction
+    # while DNS / SMTP / WHOIS probes are running:
+    #   1. short transaction: validate the user and reserve credits
+    #   2. no database: network verification, the session is released before it starts
+    #   3. short transaction: persist the results and settle the reservation
+
+    async def _validate_and_reserve(self, user_id: str, quantity: int, low_balance_detail: str) -> Tuple[float, int]:
+        user = await self.db.scalar(select(User).where(User.user_id == user_id))
         if not user:
             raise HTTPException(status_code=400, detail="User ID not found")
 
-        # Step 2: Check and Deduct Credits
-        credit = self.db.query(Credit).filter(Credit.user_id == user_id).first()
+        credit = await self.db.scalar(select(Credit).where(Credit.user_id == user_id))
         if not credit or credit.remaining_credits < 1:
-            raise HTTPException(status_code=403, detail="Insufficient credits to test email")
+            raise HTTPException(status_code=403, detail=low_balance_detail)
+        if credit.remaining_credits < quantity:
+            raise HTTPException(status_code=403, detail="Insufficient credits")
+        weight = weight_for(credit)
 
-        credit.remaining_credits -= 1
-        credit.total_credits -= 1
-        credit.last_updated = datetime.utcnow()
-        self.db.add(credit)
+        reservation_id = await CreditService(self.db).reserve_credits(user_id, quantity)
+        return weight, reservation_id
 
-        # Step 3: Email Validations
+    async def _release_session(self):
+        # ends the transaction and gives the connection back to the pool, the session stays usable
+        await self.db.close()
+
+    async def _domain_ids(self, results: List[dict]) -> Dict[str, int]:
+        """Ids of the results' domains, inserted or refreshed with their latest facts in one statement."""
+        facts = {result["domain"]: {field: result.get(field) for field in DOMAIN_FIELDS} for result in results}
+        now = datetime.now(timezone.utc)
+        # sorted, so concurrent jobs lock the domains they share in the same order
+        stmt = insert(Domain).values([{"name": name, "updated_at": now, **facts[name]} for name in sorted(facts)])
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[Domain.name],
+            set_={field: stmt.excluded[field] for field in [*DOMAIN_FIELDS, "updated_at"]},
+        )
+        return dict((await self.db.execute(stmt.returning(Domain.name, Domain.id))).all())
+
+    async def create_email(self, user_id: str, test_email: TestEmailBase, sender_email: str = "test@example.com"):
         target_email = test_email.user_tested_email
         if not target_email:
             raise HTTPException(status_code=400, detail="No email provided to validate.")
 
-        disposable_domains = load_disposable_domains()
-        is_syntax_valid = validate_email_syntax(target_email)
-
-        # Step 4: Safely Handle MX Record
-        mx_record_result = get_mx_record(target_email)
-        mx_record = mx_record_result[0] if mx_record_result else None or "max record not found  "
-        implicit_mx = mx_record_result[1] if mx_record_result and len(mx_record_result) > 1 else None
-
-        # Step 5: Run consolidated email checks
-        smtp_deliverable, smtp_reason, is_valid, validation_reason = perform_email_checks(
-            target_email=target_email, sender_email=sender_email, disposable_domains=disposable_domains
-        )
+        # Phase 1: Shed the check right away when the queue cannot serve it in time, then
+        # validate the user and reserve credits. The check counts in the queue until it is queued
+        with admission.admit(INTERACTIVE):
+            weight, reservation_id = await self._validate_and_reserve(user_id, 1, "Insufficient credits to test email")
+            await self._release_session()
 
-        email_domain = target_email.split("@", 1)[-1].lower()
-        is_disposable = int(email_domain in disposable_domains)
-
-        # Extract domain part (e.g., "gmail" from "test@gmail.com")
-        domain_name = target_email.split("@", 1)[-1].lower()
-        match = re.search(r"@([a-zA-Z0-9.-]+)", target_email)
-        domain_name = match.group(1) if match else None
-        # Extract domain and name from email
-
-        local_part = re.sub(
-            r"[^a-zA-Z._-]", "", target_email.split("@", 1)[0]
-        )  # Remove numbers/symbols except separators
-        cleaned_name = re.sub(r"[\\._-]+", " ", local_part).strip()  # Replace _, ., - with space
-        full_name = " ".join(part.capitalize() for part in cleaned_name.split())
-
-        # Step 5.1: Analyze email string
-        email_str = target_email or ""
-        alphabetical_count = sum(c.isalpha() for c in email_str)
-        numerical_count = sum(c.isdigit() for c in email_str)
-        unicode_symbol_count = len(email_str) - alphabetical_count - numerical_count
-        email_str = target_email.lower()
-        has_role = any(role in email_str for role in ["admin", "info", "support", "sales", "contact"])
-        is_accept_all = "accept" in email_str or "all" in email_str
-        has_no_reply = "no-reply" in email_str or "noreply" in email_str
-
-        # Extract domain for smtp_provider detection
+        # Phase 2: Email Validations, queued in the interactive lane
         try:
-            _, domain = target_email.split("@", 1)
-        except ValueError:
-            domain = ""
-
-        smtp_provider = get_smtp_provider(domain)
-
-        # Refined score & risk evaluation
-        score, is_risky, tags = evaluate_email_score_and_risk(
-            is_syntax_valid=is_syntax_valid,
-            smtp_deliverable=smtp_deliverable,
-            is_disposable=bool(is_disposable),
-            has_role=has_role,
-            is_accept_all=is_accept_all,
-            has_no_reply=has_no_reply,
-            domain=email_domain,
-            mx_record=mx_record,
-            smtp_provider=smtp_provider,
-        )
+            analysis = await verify_address(
+                target_email,
+                sender_email,
+                load_disposable_domains(),
+                user_id=user_id,
+                lane=INTERACTIVE,
+                weight=weight,
+            )
+        except Exception:
+            await CreditService(self.db).release_reservation(reservation_id)
+            raise
 
-        # Step 6: Prepare data dictionary with overrides
+        # Phase 3: Create DB record and Record credit usage
         email_data = test_email.model_dump()
+        email_data.update({key: value for key, value in analysis.items() if key not in SINGLE_CHECK_REQUEST_FIELDS})
+        email_data["user_tested_email"] = target_email  # a shared probe may have seen another spelling
         email_data.update(
             {
-                # "status": "valid" if is_valid else "invalid",
-                # "is_deliverable": is_deliverable,
-                # "implicit_mx_record": implicit_mx,
-                # "mx_record": mx_record,
                 "user_id": user_id,
-                "full_name": full_name or "N/A",
-                "domain": domain_name,
                 "created_at": datetime.now(timezone.utc),
-                "is_risky": is_risky,
                 "soft_delete": False,
-                "is_valid": is_syntax_valid and smtp_deliverable,
-                "status": "Deliverable" if is_syntax_valid and smtp_deliverable else "invalid_email",
-                "is_deliverable": smtp_deliverable,
-                "reason": validation_reason or smtp_reason,
-                "is_disposable": is_disposable,
-                "alphabetical_characters": alphabetical_count,
-                "has_numerical_characters": numerical_count,
-                "has_unicode_symbols": unicode_symbol_count,
-                "smtp_provider": smtp_provider,
-                "mx_record": mx_record or "",
-                "implicit_mx_record": implicit_mx,
-                "score": score,
-                "has_role": has_role,
-                "is_accept_all": is_accept_all,
-                "has_no_reply": has_no_reply,
+                "status": "Deliverable" if analysis["is_valid"] else "invalid_email",
             }
         )
+        if COMPACT_RESULT_STORAGE:
+            email_data = encode_result(email_data, (await self._domain_ids([email_data]))[email_data["domain"]])
 
-        # Step 7: Create DB record
         db_test_email = TestEmail(**email_data)
         self.db.add(db_test_email)
-        self.db.commit()
-        self.db.refresh(db_test_email)
-
-        # Step 8: Record credit usage
-        credit_used = CreditUsageBase(
-            user_id=user_id,
-            email_or_file_id=db_test_email.id,
-            quantity_used=1,
-            credits_used=1,
-            created_at=datetime.now(timezone.utc),
-        )
-        db_credit_used = CreditUsage(**credit_used.model_dump())
-        self.db.add(db_credit_used)
-
         try:
-            self.db.commit()
-            self.db.refresh(db_test_email)
-            return db_test_email
+            await self.db.flush()
+            test_email_id = db_test_email.id
+            await self.db.commit()
         except IntegrityError:
-            self.db.rollback()
+            await self.db.rollback()
+            await CreditService(self.db).release_reservation(reservation_id)
             logger.exception("Database error during create_email.")
             raise HTTPException(
                 status_code=500,
                 detail="Database error occurred while testing email",
             )
 
+        await CreditService(self.db).settle_reservation(reservation_id, 1, email_or_file_id=test_email_id)
+        await self.db.refresh(db_test_email)
+        return db_test_email
+
     # <---------------------------------- Validate email check form csv . txt files--------------
     async def validate_emails_from_csv(
         self,
@@ -183,18 +207,10 @@ class EmailService:
         file_content: str,
         file_name: str = "test_email.csv",
         sender_email: str = "test@example.com",
-    ) -> BulkEmailStatsResponseWithEmails:
-        user = self.db.query(User).filter(User.user_id == user_id).first()
-        if not user:
-            raise HTTPException(status_code=400, detail="User ID not found")
-
-        credit = self.db.query(Credit).filter(Credit.user_id == user_id).first()
-        if not credit or credit.remaining_credits < 1:
-            raise HTTPException(status_code=403, detail="Insufficient credits to validate emails")
-
+        on_registered: Optional[Callable[[int], Awaitable]] = None,
+    ) -> BulkEmailStatsSummary:
         csv_file = StringIO(file_content)
         csv_reader = csv.reader(csv_file)
-        disposable_domains = load_disposable_domains()
 
         emails = []
         for row in csv_reader:
@@ -204,179 +220,7 @@ class EmailService:
             if email:
                 emails.append(email)
 
-        if not emails:
-            raise HTTPException(status_code=400, detail="No valid emails found")
-
-        total_emails = len(emails)
-        unique_emails = set(emails)
-        duplicate_count = total_emails - len(unique_emails)
-
-        if credit.remaining_credits < len(emails):
-            raise HTTPException(status_code=403, detail="Insufficient credits")
-
-        now = datetime.now(timezone.utc)
-
-        total_valid = 0
-        risky_count = 0
-        deliverable_count = 0
-
-        test_email_objs = []
-
-        for email in emails:
-            is_syntax_valid = validate_email_syntax(email)
-            mx_record_result = get_mx_record(email)
-            mx_record = mx_record_result[0] if mx_record_result else None
-            implicit_mx = mx_record_result[1] if mx_record_result and len(mx_record_result) > 1 else None
-
-            smtp_deliverable, smtp_reason, is_valid, validation_reason = perform_email_checks(
-                target_email=email, sender_email=sender_email, disposable_domains=disposable_domains
-            )
-
-            domain = email.split("@", 1)[1].lower()
-            is_disposable = int(domain in disposable_domains)
-
-            match = re.search(r"@([a-zA-Z0-9.-]+)", email)
-            domain_name = match.group(1).lower() if match else "unknown domain"
-
-            local_part = re.sub(r"[^a-zA-Z._-]", "", email.split("@", 1)[0])
-            cleaned_name = re.sub(r"[\\._-]+", " ", local_part).strip()
-            full_name = " ".join(part.capitalize() for part in cleaned_name.split()) or "N/A"
-
-            alphabetical_count = sum(c.isalpha() for c in email)
-            numerical_count = sum(c.isdigit() for c in email)
-            unicode_symbol_count = len(email) - alphabetical_count - numerical_count
-
-            has_role = any(role in email for role in ["admin", "info", "support", "sales", "contact"])
-            is_accept_all = "accept" in email or "all" in email
-            has_no_reply = "no-reply" in email or "noreply" in email
-
-            smtp_provider = get_smtp_provider(domain)
-
-            score, is_risky, tags = evaluate_email_score_and_risk(
-                is_syntax_valid=is_syntax_valid,
-                smtp_deliverable=smtp_deliverable,
-                is_disposable=bool(is_disposable),
-                has_role=has_role,
-                is_accept_all=is_accept_all,
-                has_no_reply=has_no_reply,
-                domain=domain,
-                mx_record=mx_record,
-                smtp_provider=smtp_provider,
-            )
-
-            is_email_valid = is_syntax_valid and smtp_deliverable
-            status = "valid" if is_email_valid else "invalid"
-
-            if is_email_valid:
-                total_valid += 1
-                deliverable_count += 1
-            if is_risky:
-                risky_count += 1
-
-            test_email_obj = TestEmail(
-                user_id=user_id,
-                file_id=None,
-                user_tested_email=email,
-                full_name=full_name,
-                gender="Unknown",
-                status=status,
-                reason=validation_reason or smtp_reason,
-                domain=domain_name,
-                is_free=False,
-                is_risky=is_risky,
-                is_valid=is_email_valid,
-                is_disposable=is_disposable,
-                is_deliverable=smtp_deliverable,
-                has_tag=False,
-                alphabetical_characters=alphabetical_count,
-                is_mailbox_full=False,
-                has_role=has_role,
-                is_accept_all=is_accept_all,
-                has_numerical_characters=numerical_count,
-                has_unicode_symbols=unicode_symbol_count,
-                has_no_reply=has_no_reply,
-                smtp_provider=smtp_provider,
-                mx_record=mx_record or "",
-                implicit_mx_record=implicit_mx,
-                score=score,
-                soft_delete=False,
-                created_at=now,
-            )
-            test_email_objs.append(test_email_obj)
-
-        deliverable_percent = (deliverable_count / total_emails) * 100 if total_emails else 0
-
-        bulk_stat = BulkEmailStats(
-            user_id=user_id,
-            file_name=file_name,
-            duplicate_email=duplicate_count,
-            total_valid_emails=total_valid,
-            deliverable=deliverable_percent,
-            risky=risky_count,
-            total=total_emails,
-            created_at=now,
-            soft_delete=False,
-        )
-        self.db.add(bulk_stat)
-        self.db.flush()
-
-        for test_email in test_email_objs:
-            test_email.file_id = bulk_stat.id
-            self.db.add(test_email)
-
-        credit.remaining_credits -= total_emails
-        credit.total_credits -= total_emails
-        credit.last_updated = now
-        self.db.add(credit)
-
-        credit_used = CreditUsage(
-            user_id=user_id,
-            email_or_file_id=bulk_stat.id,
-            quantity_used=total_emails,
-            credits_used=total_emails,
-            created_at=now,
-        )
-        self.db.add(credit_used)
-
-        try:
-            self.db.commit()
-            return BulkEmailStatsResponseWithEmails(
-                user_id=user_id,
-                file_id=bulk_stat.id,
-                file_name=file_name,
-                #
-                test_emails=[
-                    TestEmailBase(
-                        user_tested_email=e.user_tested_email,
-                        full_name=e.full_name,
-                        gender=e.gender,
-                        status=e.status,
-                        reason=e.reason,
-                        domain=e.domain,
-                        is_free=e.is_free,
-                        is_risky=e.is_risky,
-                        is_valid=e.is_valid,
-                        is_disposable=e.is_disposable,
-                        is_deliverable=e.is_deliverable,
-                        has_tag=e.has_tag,
-                        alphabetical_characters=e.alphabetical_characters,
-                        is_mailbox_full=e.is_mailbox_full,
-                        has_role=e.has_role,
-                        is_accept_all=e.is_accept_all,
-                        has_numerical_characters=e.has_numerical_characters,
-                        has_unicode_symbols=e.has_unicode_symbols,
-                        has_no_reply=e.has_no_reply,
-                        smtp_provider=e.smtp_provider,
-                        mx_record=e.mx_record,
-                        implicit_mx_record=e.implicit_mx_record,
-                        score=e.score,
-                    )
-                    for e in test_email_objs
-                ],
-            )
-        except IntegrityError:
-            self.db.rollback()
-            raise HTTPException(status_code=400, detail="Failed to save email records")
+        return await self._run_bulk_job(user_id, emails, file_name, sender_email, on_registered)
 
     # Update the service method
 
@@ -385,261 +229,475 @@ class EmailService:
         user_id: str,
         emails: List[str],
         sender_email: str = "test@example.com",
-    ) -> BulkEmailStatsResponseWithEmails:
-        user = self.db.query(User).filter(User.user_id == user_id).first()
-        if not user:
-            raise HTTPException(status_code=400, detail="User ID not found")
-
-        credit = self.db.query(Credit).filter(Credit.user_id == user_id).first()
-        if not credit or credit.remaining_credits < 1:
-            raise HTTPException(status_code=403, detail="Insufficient credits to validate emails")
-
-        disposable_domains = load_disposable_domains()
-
+        on_registered: Optional[Callable[[int], Awaitable]] = None,
+    ) -> BulkEmailStatsSummary:
         # Clean and filter emails
         cleaned_emails = [email.strip().lower() for email in emails if email.strip()]
 
-        if not cleaned_emails:
+        return await self._run_bulk_job(user_id, cleaned_emails, "Copy_Past", sender_email, on_registered)
+
+    async def _run_bulk_job(
+        self,
+        user_id: str,
+        emails: List[str],
+        file_name: str,
+        sender_email: str,
+        on_registered: Optional[Callable[[int], Awaitable]] = None,
+    ) -> BulkEmailStatsSummary:
+        if not emails:
             raise HTTPException(status_code=400, detail="No valid emails found")
 
-        total_emails = len(cleaned_emails)
-        unique_emails = set(cleaned_emails)
+        total_emails = len(emails)
+        unique_emails = set(emails)
         duplicate_count = total_emails - len(unique_emails)
 
-        if credit.remaining_credits < len(cleaned_emails):
-            raise HTTPException(status_code=403, detail="Insufficient credits")
-
-        now = datetime.now(timezone.utc)
-
-        total_valid = 0
-        risky_count = 0
-        deliverable_count = 0
-
-        test_email_objs = []
-
-        for email in cleaned_emails:
-            is_syntax_valid = validate_email_syntax(email)
-            mx_record_result = get_mx_record(email)
-            mx_record = mx_record_result[0] if mx_record_result else None
-            implicit_mx = mx_record_result[1] if mx_record_result and len(mx_record_result) > 1 else None
-
-            smtp_deliverable, smtp_reason, is_valid, validation_reason = perform_email_checks(
-                target_email=email, sender_email=sender_email, disposable_domains=disposable_domains
+        # Step 0: Refuse the job when the bulk backlog is full, otherwise hold the credits the whole
+        # file may need, the unused part is refunded at the end. The admitted rows count in the
+        # backlog until the job is registered with them
+        with admission.admit(BULK, len(unique_emails)):
+            credits_needed = len(unique_emails) if CHARGE_UNIQUE_ONLY else total_emails
+            weight, reservation_id = await self._validate_and_reserve(
+                user_id, credits_needed, "Insufficient credits to validate emails"
             )
 
-            domain = email.split("@", 1)[1].lower()
-            is_disposable = int(domain in disposable_domains)
-
-            match = re.search(r"@([a-zA-Z0-9.-]+)", email)
-            domain_name = match.group(1) if match else "unknown"
-
-            local_part = re.sub(r"[^a-zA-Z._-]", "", email.split("@")[0])
-            cleaned_name = re.sub(r"[\\._-]+", " ", local_part).strip()
-            full_name = " ".join(part.capitalize() for part in cleaned_name.split()) or "N/A"
-
-            alphabetical_count = sum(c.isalpha() for c in email)
-            numerical_count = sum(c.isdigit() for c in email)
-            unicode_symbol_count = len(email) - alphabetical_count - numerical_count
-
-            has_role = any(role in email for role in ["admin", "info", "support", "sales", "contact"])
-            is_accept_all = "accept" in email or "all" in email
-            has_no_reply = "no-reply" in email or "noreply" in email
-
-            smtp_provider = get_smtp_provider(domain)
-
-            score, is_risky, tags = evaluate_email_score_and_risk(
-                is_syntax_valid=is_syntax_valid,
-                smtp_deliverable=smtp_deliverable,
-                is_disposable=bool(is_disposable),
-                has_role=has_role,
-                is_accept_all=is_accept_all,
-                has_no_reply=has_no_reply,
-                domain=domain,
-                mx_record=mx_record,
-                smtp_provider=smtp_provider,
-            )
-
-            is_email_valid = is_syntax_valid and smtp_deliverable
-            status = smtp_deliverable if is_email_valid else "invalid"
-
-            if is_email_valid:
-                total_valid += 1
-                deliverable_count += 1
-            if is_risky:
-                risky_count += 1
+            now = datetime.now(timezone.utc)
 
-            test_email_obj = TestEmail(
+            # Step 1: Register the file up front so the job can be followed and cancelled while it runs
+            bulk_stat = BulkEmailStats(
                 user_id=user_id,
-                file_id=None,
-                user_tested_email=email,
-                full_name=full_name,
-                gender="Unknown",
-                status=smtp_deliverable and "Deliverable",
-                reason=validation_reason or smtp_reason,
-                domain=domain_name,
-                is_free=False,
-                is_risky=is_risky,
-                is_valid=is_email_valid,
-                is_disposable=is_disposable,
-                is_deliverable=smtp_deliverable,
-                has_tag=False,
-                alphabetical_characters=alphabetical_count,
-                is_mailbox_full=False,
-                has_role=has_role,
-                is_accept_all=is_accept_all,
-                has_numerical_characters=numerical_count,
-                has_unicode_symbols=unicode_symbol_count,
-                has_no_reply=has_no_reply,
-                smtp_provider=smtp_provider,
-                mx_record=mx_record or "",
-                implicit_mx_record=implicit_mx,
-                score=score,
-                soft_delete=False,
+                file_name=file_name,
+                duplicate_email=duplicate_count,
+                total_valid_emails=0,
+                deliverable=0,
+                status=STATUS_PROCESSING,
+                risky=0,
+                total=total_emails,
+                processed=0,
+                deliverable_count=0,
+                undeliverable=0,
+                disposable=0,
+                catch_all=0,
                 created_at=now,
+                updated_at=now,
+                soft_delete=False,
+            )
+            self.db.add(bulk_stat)
+            await self.db.flush()
+            file_id = bulk_stat.id
+            # the stale reservation sweep finds the file, and its heartbeat, through the reservation
+            await CreditService(self.db).attach_reservation(reservation_id, file_id)
+            await self.db.commit()
+            if on_registered:
+                await on_registered(file_id)  # e.g. an Idempotency-Key retry can follow the file from now on
+            await self._release_session()
+            job = bulk_jobs.start(file_id, user_id, remaining=len(unique_emails))
+
+        # Step 2: Verify chunk by chunk, persisting every chunk, until done or cancelled.
+        # The probes of a chunk run in parallel in the bulk lane of the scheduler; every address
+        # is probed once, duplicate rows get a copy of the first result.
+        disposable_domains = load_disposable_domains()
+        verified: Dict[str, dict] = {}
+        tally = {"processed": 0, "valid": 0, "risky": 0, "charged": 0}
+
+        def probe(email: str):
+            started = asyncio.Event()  # a cancel drops the probe unless it already runs
+            return job.run(
+                verify_address(
+                    email,
+                    sender_email,
+                    disposable_domains,
+                    user_id=user_id,
+                    lane=BULK,
+                    weight=weight,
+                    on_start=started.set,
+                ),
+                started,
             )
-            test_email_objs.append(test_email_obj)
-
-        deliverable_percent = (deliverable_count / total_emails) * 100 if total_emails else 0
 
-        bulk_stat = BulkEmailStats(
+        try:
+            for start in range(0, total_emails, BULK_CHUNK_SIZE):
+                if job.cancelled:
+                    break
+                chunk_emails = emails[start : start + BULK_CHUNK_SIZE]
+                to_probe = [email for email in dict.fromkeys(chunk_emails) if email not in verified]
+                results = await asyncio.gather(*(probe(email) for email in to_probe))
+                verified.update((email, result) for email, result in zip(to_probe, results) if result is not None)
+                job.remaining -= len(to_probe)
+                chunk = [verified[email] for email in chunk_emails if email in verified]
+
+                await self._persist_bulk_chunk(user_id, file_id, chunk, now)
+                tally["processed"] += len(chunk)
+                tally["valid"] += sum(1 for result in chunk if result["is_valid"])
+                tally["risky"] += sum(1 for result in chunk if result["is_risky"])
+                tally["charged"] = len(verified) if CHARGE_UNIQUE_ONLY else tally["processed"]
+
+                if job.cancelled or await self._bulk_cancel_requested(file_id):
+                    job.cancel()
+                    break
+                await self._release_session()
+
+            # Step 3: Close the file and charge only the rows that were verified
+            final_status = await self._finish_bulk_job(
+                file_id, reservation_id, tally, STATUS_CANCEL if job.cancelled else STATUS_COMPLETED
+            )
+        except BaseException:
+            # a crash, or the request cancelled (e.g. shutdown): the file does not stay Processing,
+            # the rows persisted so far are charged
+            logger.exception("Bulk job %s failed after %s rows.", file_id, tally["processed"])
+            await asyncio.shield(self._fail_bulk_job(file_id, reservation_id, tally))
+            raise
+        finally:
+            bulk_jobs.finish(job)
+
+        # Rows are not echoed back, they are read page by page from the results endpoints
+        return BulkEmailStatsSummary(
             user_id=user_id,
-            file_name="Copy_Past",  # Using a default filename
-            duplicate_email=duplicate_count,
-            total_valid_emails=total_valid,
-            deliverable=deliverable_percent,
-            status=status,
-            risky=risky_count,
+            file_id=file_id,
+            file_name=file_name,
+            status=final_status,
             total=total_emails,
-            created_at=now,
-            soft_delete=False,
+            processed=tally["processed"],
+            duplicate_email=duplicate_count,
+            total_valid_emails=tally["valid"],
+            risky=tally["risky"],
+            deliverable=(tally["valid"] / tally["processed"]) * 100 if tally["processed"] else 0,
+            cursor=encode_cursor(0),
         )
-        self.db.add(bulk_stat)
-        self.db.flush()
 
-        for test_email in test_email_objs:
-            test_email.file_id = bulk_stat.id
-            self.db.add(test_email)
-
-        credit.remaining_credits -= total_emails
-        credit.total_credits -= total_emails
-        credit.last_updated = now
-        self.db.add(credit)
-
-        credit_used = CreditUsage(
-            user_id=user_id,
-            email_or_file_id=bulk_stat.id,
-            quantity_used=total_emails,
-            credits_used=total_emails,
-            created_at=now,
+    async def _persist_bulk_chunk(self, user_id: str, file_id: int, chunk: List[dict], created_at: datetime):
+        if not chunk:
+            return
+        if COMPACT_RESULT_STORAGE:
+            domain_ids = await self._domain_ids(chunk)
+            rows = [encode_result(result, domain_ids[result["domain"]]) for result in chunk]
+        else:
+            rows = chunk
+        for row in rows:
+            self.db.add(TestEmail(**row, user_id=user_id, file_id=file_id, soft_delete=False, created_at=created_at))
+
+        # counters move in the same transaction as the rows, relative to their stored value
+        processed = len(chunk)
+        valid = sum(1 for result in chunk if result["is_valid"])
+        deliverable = sum(1 for result in chunk if result["is_deliverable"])
+        await self.db.execute(
+            update(BulkEmailStats)
+            .where(BulkEmailStats.id == file_id)
+            .values(
+                processed=BulkEmailStats.processed + processed,
+                total_valid_emails=BulkEmailStats.total_valid_emails + valid,
+                deliverable=(BulkEmailStats.total_valid_emails + valid)
+                * 100.0
+                / (BulkEmailStats.processed + processed),
+                deliverable_count=BulkEmailStats.deliverable_count + deliverable,
+                undeliverable=BulkEmailStats.undeliverable + processed - deliverable,
+                risky=BulkEmailStats.risky + sum(1 for result in chunk if result["is_risky"]),
+                disposable=BulkEmailStats.disposable + sum(1 for result in chunk if result["is_disposable"]),
+                catch_all=BulkEmailStats.catch_all + sum(1 for result in chunk if result["is_accept_all"]),
+                updated_at=datetime.now(timezone.utc),
+            )
+            .execution_options(synchronize_session=False)
         )
-        self.db.add(credit_used)
-
         try:
-            self.db.commit()
-            return BulkEmailStatsResponseWithEmails(
-                user_id=user_id,
-                file_id=bulk_stat.id,
-                file_name="Copy_Past",
-                test_emails=[
-                    TestEmailBase(
-                        user_tested_email=e.user_tested_email,
-                        full_name=e.full_name,
-                        gender=e.gender,
-                        status=e.status,
-                        reason=e.reason,
-                        domain=e.domain,
-                        is_free=e.is_free,
-                        is_risky=e.is_risky,
-                        is_valid=e.is_valid,
-                        is_disposable=e.is_disposable,
-                        is_deliverable=e.is_deliverable,
-                        has_tag=e.has_tag,
-                        alphabetical_characters=e.alphabetical_characters,
-                        is_mailbox_full=e.is_mailbox_full,
-                        has_role=e.has_role,
-                        is_accept_all=e.is_accept_all,
-                        has_numerical_characters=e.has_numerical_characters,
-                        has_unicode_symbols=e.has_unicode_symbols,
-                        has_no_reply=e.has_no_reply,
-                        smtp_provider=e.smtp_provider,
-                        mx_record=e.mx_record,
-                        implicit_mx_record=e.implicit_mx_record,
-                        score=e.score,
-                    )
-                    for e in test_email_objs
-                ],
-            )
+            await self.db.commit()
         except IntegrityError:
-            self.db.rollback()
+            await self.db.rollback()
             raise HTTPException(status_code=400, detail="Failed to save email records")
 
-    def get_test_email(self, test_email_id: int):
-        test_email = (
-            self.db.query(TestEmail)
-            .filter(
-                TestEmail.id == test_email_id, or_(TestEmail.soft_delete.is_(False), TestEmail.soft_delete.is_(None))
-            )
-            .first()
+    async def _bulk_cancel_requested(self, file_id: int) -> bool:
+        # a cancel coming through another worker process only shows up in the database
+        status_value = await self.db.scalar(select(BulkEmailStats.status).where(BulkEmailStats.id == file_id))
+        await self.db.commit()
+        return status_value == STATUS_CANCEL
+
+    async def _finish_bulk_job(self, file_id: int, reservation_id: int, tally: dict, final_status: str) -> str:
+        """Close the file with ``final_status`` unless a cancel got there first, returns the stored status."""
+        processed_count = tally["processed"]
+
+        # the counters were kept up to date chunk by chunk, only the status is left. The status only
+        # ever leaves Processing once: a cancel racing with the end of the job is not overwritten
+        await self.db.execute(
+            update(BulkEmailStats)
+            .where(BulkEmailStats.id == file_id, BulkEmailStats.status == STATUS_PROCESSING)
+            .values(status=final_status, updated_at=datetime.now(timezone.utc))
+            .execution_options(synchronize_session=False)
+        )
+        stored_status = await self.db.scalar(select(BulkEmailStats.status).where(BulkEmailStats.id == file_id))
+        await self.db.commit()
+
+        # Only the rows that were verified are charged, the rest of the reservation is refunded
+        await CreditService(self.db).settle_reservation(
+            reservation_id, tally["charged"], email_or_file_id=file_id, quantity_used=processed_count
         )
+        return stored_status
+
+    async def _fail_bulk_job(self, file_id: int, reservation_id: int, tally: dict):
+        await self.db.rollback()
+        await self._finish_bulk_job(file_id, reservation_id, tally, STATUS_FAILED)
+
+    @staticmethod
+    async def _stop_local_job(file_id: int):
+        """Stop the job of a file if it runs in this process, others stop at their next chunk."""
+        job = bulk_jobs.get(file_id)
+        if job:
+            job.cancel()
+            await job.wait_finished()
+
+    async def cancel_bulk_job(self, file_id: int, user_id: str) -> BulkEmailStats:
+        bulk_file = await self.get_bulk_file(file_id, user_id)
+
+        # Flag it in the database too, a job running in another worker process stops at its next chunk.
+        # Conditional, so a job finishing at the same moment keeps its Completed status
+        cancelled = await self.db.execute(
+            update(BulkEmailStats)
+            .where(BulkEmailStats.id == file_id, BulkEmailStats.status == STATUS_PROCESSING)
+            .values(status=STATUS_CANCEL)
+            .execution_options(synchronize_session=False)
+        )
+        await self.db.commit()
+        if not cancelled.rowcount:
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Bulk emails file is not processing.")
+
+        await self._stop_local_job(file_id)
+
+        await self.db.refresh(bulk_file)
+        return bulk_file
+
+    async def get_test_email(self, test_email_id: int):
+        test_email = await self.db.scalar(select(TestEmail).where(TestEmail.id == test_email_id, _live(TestEmail)))
         if not test_email:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Test email not found")
 
         return test_email
 
-    def get_all_emails(self, user_id: str) -> List[TestEmail]:
-        return (
-            self.db.query(TestEmail)
-            .filter(TestEmail.user_id == user_id)
-            .filter(or_(TestEmail.soft_delete.is_(None), TestEmail.soft_delete.is_(False)))
-            .all()
+    async def get_all_emails(
+        self,
+        user_id: str,
+        cursor: Optional[str],
+        limit: int,
+        descending: bool = True,
+        deliverable: Optional[bool] = None,
+        risky: Optional[bool] = None,
+        created_from: Optional[datetime] = None,
+        created_to: Optional[datetime] = None,
+    ) -> Tuple[List[TestEmail], Optional[str]]:
+        """One keyset page of the user's emails on (created_at, id), filtered in SQL."""
+        query = select(TestEmail).where(TestEmail.user_id == user_id, _live(TestEmail))
+        if deliverable is not None:
+            query = query.where(result_flag("is_deliverable").is_(deliverable))
+        if risky is not None:
+            query = query.where(result_flag("is_risky").is_(risky))
+        if created_from is not None:
+            query = query.where(TestEmail.created_at >= created_from)
+        if created_to is not None:
+            query = query.where(TestEmail.created_at < created_to)
+
+        return await keyset_page(self.db, query, [TestEmail.created_at, TestEmail.id], cursor, limit, descending)
+
+    async def get_bulk_file(self, file_id: int, user_id: str) -> BulkEmailStats:
+        bulk_file = await self.db.scalar(
+            select(BulkEmailStats).where(
+                BulkEmailStats.id == file_id,
+                BulkEmailStats.user_id == user_id,
+                _live(BulkEmailStats),
+            )
+        )
+        if not bulk_file:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Bulk emails file not found.")
+        return bulk_file
+
+    def _file_results_query(self, file_id: int, user_id: str):
+        return select(TestEmail).where(
+            TestEmail.file_id == file_id,
+            TestEmail.user_id == user_id,
+            _live(TestEmail),
+            _in_file_partitions(file_id),
         )
 
-    def get_all_emails_grouped_by_files(self, user_id: str):
-        # Get all bulk files belonging to the user (excluding soft deleted ones)
-        bulk_files = (
-            self.db.query(BulkEmailStats)
-            .filter(
-                BulkEmailStats.user_id == user_id,
-                or_(BulkEmailStats.soft_delete.is_(False), BulkEmailStats.soft_delete.is_(None)),
+    async def _snapshot_uri(self, file_id: int, user_id: str) -> Optional[str]:
+        # files with a snapshot (see SnapshotService) are read from it, their live rows may be pruned
+        return await self.db.scalar(
+            select(BulkEmailStats.archive_uri).where(
+                BulkEmailStats.id == file_id, BulkEmailStats.user_id == user_id, _live(BulkEmailStats)
             )
-            .all()
         )
 
-        results = []
+    async def get_file_results_page(self, file_id: int, user_id: str, cursor: Optional[str], limit: int):
+        """One keyset page of a file's rows and the cursor of the next page (None on the last one)."""
+        bulk_file = await self.get_bulk_file(file_id, user_id)
+        if bulk_file.archive_uri:
+            return await snapshot_page(bulk_file.archive_uri, cursor, limit)
+        return await keyset_page(self.db, self._file_results_query(file_id, user_id), [TestEmail.id], cursor, limit)
+
+    async def iter_file_results(self, file_id: int, user_id: str, batch_size: int = 500):
+        """All rows of a file through a server-side cursor, ``batch_size`` rows in memory at a time."""
+        snapshot = await self._snapshot_uri(file_id, user_id)
+        if snapshot:
+            async for row in iter_snapshot_rows(snapshot):
+                yield SimpleNamespace(**dict(zip(EXPORT_FIELDS, row)))
+            return
+
+        query = self._file_results_query(file_id, user_id).order_by(TestEmail.id)
+        async for email in await self.db.stream_scalars(query.execution_options(yield_per=batch_size)):
+            yield email
+
+    async def iter_export_rows(
+        self,
+        file_id: int,
+        user_id: str,
+        risky: Optional[bool] = None,
+        deliverable: Optional[bool] = None,
+        min_score: Optional[int] = None,
+        max_score: Optional[int] = None,
+        batch_size: int = 1000,
+    ):
+        """Export columns of a file's rows, filtered in SQL and read through a server-side cursor."""
+        snapshot = await self._snapshot_uri(file_id, user_id)
+        if snapshot:
+            filters = {"risky": risky, "deliverable": deliverable, "min_score": min_score, "max_score": max_score}
+            async for row in iter_snapshot_rows(snapshot, **filters):
+                yield row
+            return
+
+        query = with_domains(select(*EXPORT_SELECT)).where(
+            TestEmail.file_id == file_id,
+            TestEmail.user_id == user_id,
+            _live(TestEmail),
+            _in_file_partitions(file_id),
+        )
+        if risky is not None:
+            query = query.where(result_flag("is_risky").is_(risky))
+        if deliverable is not None:
+            query = query.where(result_flag("is_deliverable").is_(deliverable))
+        if min_score is not None:
+            query = query.where(TestEmail.score >= min_score)
+        if max_score is not None:
+            query = query.where(TestEmail.score <= max_score)
+
+        async for row in await self.db.stream(query.order_by(TestEmail.id).execution_options(yield_per=batch_size)):
+            yield row
+
+    async def get_all_emails_grouped_by_files(
+        self, user_id: str, cursor: Optional[str], limit: int, rows_per_file: int
+    ) -> Tuple[List[dict], Optional[str]]:
+        """
+        One keyset page of the user's live files with the first ``rows_per_file`` rows of each.
+
+        Two queries whatever the page size: the files, then their rows ranked per file with
+        ``row_number()``. ``rows_cursor`` continues a file on /email/bulk_emails_file/{file_id}/results.
+        """
+        files, next_cursor = await keyset_page(
+            self.db, self._live_files_query(user_id), [BulkEmailStats.id], cursor, limit
+        )
 
-        for bulk_file in bulk_files:
-            test_emails = [email for email in bulk_file.test_emails if not email.soft_delete]
+        live_files = [file for file in files if not file.archive_uri]
+        ranked = (
+            select(
+                TestEmail,
+                func.row_number().over(partition_by=TestEmail.file_id, order_by=TestEmail.id).label("row_number"),
+            )
+            .where(
+                TestEmail.file_id.in_([file.id for file in live_files]),
+                TestEmail.user_id == user_id,
+                _live(TestEmail),
+                # only the partitions from the oldest file of the page on
+                TestEmail.created_at >= min((file.created_at for file in live_files), default=datetime.min),
+            )
+            .subquery()
+        )
+        ranked_email = aliased(TestEmail, ranked)
+        emails_by_file: Dict[int, List[TestEmail]] = {file.id: [] for file in files}
+        if live_files:
+            # one extra row per file tells whether it continues past this page
+            for email in await self.db.scalars(
+                select(ranked_email)
+                .where(ranked.c.row_number <= rows_per_file + 1)
+                .order_by(ranked_email.file_id, ranked_email.id)
+            ):
+                emails_by_file[email.file_id].append(email)
+        for file in files:
+            if file.archive_uri:
+                emails_by_file[file.id] = (await snapshot_page(file.archive_uri, None, rows_per_file + 1))[0]
 
-            results.append({"file_id": bulk_file.id, "file_name": bulk_file.file_name, "emails": test_emails})
+        results = []
+        for file in files:
+            emails = emails_by_file[file.id]
+            rows_cursor = encode_cursor(emails[rows_per_file - 1].id) if len(emails) > rows_per_file else None
+            results.append(
+                {
+                    "file_id": file.id,
+                    "file_name": file.file_name,
+                    "emails": emails[:rows_per_file],
+                    "rows_cursor": rows_cursor,
+                }
+            )
 
-        return results
+        return results, next_cursor
 
-    def get_file_stats(self, file_id: int, user_id: str):
-        total_emails = (
-            self.db.query(TestEmail).filter(TestEmail.file_id == file_id, TestEmail.user_id == user_id).count()
+    def _file_aggregates(self, user_id: str):
+        """Per-file row counts of a user's live files, one GROUP BY with FILTER clauses."""
+        return (
+            select(
+                BulkEmailStats.id,
+                BulkEmailStats.file_name,
+                BulkEmailStats.status,
+                BulkEmailStats.duplicate_email,
+                func.count(TestEmail.id).label("total"),
+                func.count(TestEmail.id).filter(result_flag("is_deliverable").is_(True)).label("deliverable"),
+                func.count(TestEmail.id).filter(result_flag("is_risky").is_(True)).label("risky"),
+            )
+            .outerjoin(
+                TestEmail,
+                and_(TestEmail.file_id == BulkEmailStats.id, TestEmail.user_id == user_id, _live(TestEmail)),
+            )
+            .where(BulkEmailStats.user_id == user_id, _live(BulkEmailStats))
+            .group_by(BulkEmailStats.id)
         )
 
-        if total_emails == 0:
-            return None
-        duplicate_count = (
-            self.db.query(BulkEmailStats.duplicate_email)
-            .filter(BulkEmailStats.id == file_id, BulkEmailStats.user_id == user_id)
-            .scalar()
-        )
+    def _live_files_query(self, user_id: str):
+        return select(BulkEmailStats).where(BulkEmailStats.user_id == user_id, _live(BulkEmailStats))
 
-        deliverable_count = (
-            self.db.query(TestEmail)
-            .filter(TestEmail.file_id == file_id, TestEmail.user_id == user_id, TestEmail.is_deliverable.is_(True))
-            .count()
-        )
+    async def _file_counts(self, user_id: str, files: List[BulkEmailStats]) -> List[dict]:
+        """Counts of the files, read from the counters the bulk jobs keep on the file row."""
+        # files created before the counters existed have them NULL, their rows are aggregated instead
+        legacy_ids = [file.id for file in files if file.processed is None]
+        aggregates = {}
+        if legacy_ids:
+            legacy = await self.db.execute(self._file_aggregates(user_id).where(BulkEmailStats.id.in_(legacy_ids)))
+            aggregates = {row.id: row for row in legacy}
 
-        risky_count = (
-            self.db.query(TestEmail)
-            .filter(TestEmail.file_id == file_id, TestEmail.user_id == user_id, TestEmail.is_risky.is_(True))
-            .count()
-        )
+        counts = []
+        for file in files:
+            if file.processed is None:
+                row = aggregates[file.id]
+                total, deliverable, risky = row.total, row.deliverable, row.risky
+            else:
+                total, deliverable, risky = file.processed, file.deliverable_count, file.risky
+            counts.append(
+                {
+                    "id": file.id,
+                    "file_name": file.file_name,
+                    "status": file.status,
+                    "total": total,
+                    "duplicates": file.duplicate_email or 0,
+                    "deliverable": deliverable,
+                    "undeliverable": total - deliverable,
+                    "risky": risky,
+                }
+            )
+        return counts
+
+    async def get_file_stats(self, file_id: int, user_id: str):
+        files = (await self.db.scalars(self._live_files_query(user_id).where(BulkEmailStats.id == file_id))).all()
+        counts = await self._file_counts(user_id, files)
 
-        undeliverable_count = total_emails - deliverable_count
+        if not counts or counts[0]["total"] == 0:
+            return None
+        stats = counts[0]
+        total_emails = stats["total"]
+        duplicate_count = stats["duplicates"]
+        deliverable_count = stats["deliverable"]
+        undeliverable_count = stats["undeliverable"]
+        risky_count = stats["risky"]
 
         return {
             "total": total_emails,
@@ -653,59 +711,51 @@ class EmailService:
             "risky_percentage": round((risky_count / total_emails) * 100, 2),
         }
 
-    def update_file_name_by_id(self, file_id: int, new_filename: str, user_id: str) -> str:
-        db_filename = (
-            self.db.query(BulkEmailStats)
-            .filter(
+    async def update_file_name_by_id(self, file_id: int, new_filename: str, user_id: str) -> str:
+        db_filename = await self.db.scalar(
+            select(BulkEmailStats).where(
                 BulkEmailStats.id == file_id,
                 BulkEmailStats.user_id == user_id,
-                or_(BulkEmailStats.soft_delete.is_(None), BulkEmailStats.soft_delete.is_(False)),
+                _live(BulkEmailStats),
             )
-            .first()
         )
 
         if not db_filename:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="File not found.")
 
         db_filename.file_name = new_filename
-        self.db.commit()
-        self.db.refresh(db_filename)
+        await self.db.commit()
+        await self.db.refresh(db_filename)
 
         return db_filename.file_name
 
-    def soft_delete_email_by_id(self, test_email_id: int, user_id: str) -> dict:
-        db_test_email = (
-            self.db.query(TestEmail)
-            .filter(
+    async def soft_delete_email_by_id(self, test_email_id: int, user_id: str) -> dict:
+        db_test_email = await self.db.scalar(
+            select(TestEmail).where(
                 TestEmail.id == test_email_id,
                 TestEmail.user_id == user_id,
                 TestEmail.file_id.is_(None),
-                or_(TestEmail.soft_delete.is_(False), TestEmail.soft_delete.is_(None)),
+                _live(TestEmail),
             )
-            .first()
         )
 
         if not db_test_email:
             raise HTTPException(status_code=404, detail="Test email not found.")
 
         db_test_email.soft_delete = True
-        self.db.commit()
-        self.db.refresh(db_test_email)
+        db_test_email.deleted_at = datetime.now(timezone.utc)
+        await self.db.commit()
+        await self.db.refresh(db_test_email)
 
-        return jsonable_encoder(db_test_email)
+        return jsonable_encoder(decode_result(db_test_email))
 
-    def soft_delete_bulk_emails_file_by_id(self, file_id: int, user_id: str):
-        bulk_emails = (
-            self.db.query(BulkEmailStats)
-            .filter(
+    async def soft_delete_bulk_emails_file_by_id(self, file_id: int, user_id: str):
+        bulk_emails = await self.db.scalar(
+            select(BulkEmailStats).where(
                 BulkEmailStats.id == file_id,
                 BulkEmailStats.user_id == user_id,
-                or_(
-                    BulkEmailStats.soft_delete.is_(False),
-                    BulkEmailStats.soft_delete.is_(None),
-                ),
+                _live(BulkEmailStats),
             )
-            .first()
         )
 
         if not bulk_emails:
@@ -714,46 +764,54 @@ class EmailService:
                 detail="Bulk emails file not found.",
             )
 
+        # a file deleted while it is verified is cancelled: it is not verified nor charged any further.
+        # Conditional like cancel_bulk_job, a job finishing at the same moment keeps its status
+        await self.db.execute(
+            update(BulkEmailStats)
+            .where(BulkEmailStats.id == file_id, BulkEmailStats.status == STATUS_PROCESSING)
+            .values(status=STATUS_CANCEL)
+            .execution_options(synchronize_session=False)
+        )
         bulk_emails.soft_delete = True
-        self.db.commit()
-        self.db.refresh(bulk_emails)
+        bulk_emails.deleted_at = datetime.now(timezone.utc)
+        await self.db.commit()
+        await self._stop_local_job(file_id)
+
+        await self.db.refresh(bulk_emails)
         return bulk_emails
 
-    def get_emails_for_csv(self, file_id: int, user_id: str, include_risky: bool):
-        query = self.db.query(TestEmail).filter(
-            TestEmail.file_id == file_id, TestEmail.user_id == user_id, TestEmail.soft_delete.is_(False)
+    async def get_emails_for_csv(
+        self, file_id: int, user_id: str, include_risky: bool, cursor: Optional[str], limit: int, descending: bool
+    ):
+        snapshot = await self._snapshot_uri(file_id, user_id)
+        if snapshot:
+            return await snapshot_page(snapshot, cursor, limit, descending, risky=include_risky)
+
+        query = select(TestEmail).where(
+            TestEmail.file_id == file_id, TestEmail.user_id == user_id, _live(TestEmail), _in_file_partitions(file_id)
         )
 
         if include_risky is False:
-            query = query.filter(TestEmail.is_risky.is_(False))
+            query = query.where(result_flag("is_risky").is_(False))
         elif include_risky is True:
-            query = query.filter(TestEmail.is_risky.is_(True))
-
-        return query.all()
-
-    def get_all_files_with_delieved_emails_and_status(self, user_id: str):
-        files = self.db.query(BulkEmailStats).filter(BulkEmailStats.user_id == user_id).all()
-        result = []
-
-        for file in files:
-            total_emails = (
-                self.db.query(TestEmail).filter(TestEmail.file_id == file.id, TestEmail.user_id == user_id).count()
-            )
-
-            deliverable_count = (
-                self.db.query(TestEmail)
-                .filter(TestEmail.file_id == file.id, TestEmail.user_id == user_id, TestEmail.is_deliverable.is_(True))
-                .count()
-            )
+            query = query.where(result_flag("is_risky").is_(True))
 
-            result.append(
-                {
-                    "id": file.id,
-                    "file_name": file.file_name,
-                    "deliverable": deliverable_count,
-                    "total_emails": total_emails,
-                    "status": file.status,
-                }
-            )
+        return await keyset_page(self.db, query, [TestEmail.id], cursor, limit, descending)
 
-        return result
+    async def get_all_files_with_delieved_emails_and_status(
+        self, user_id: str, cursor: Optional[str], limit: int, descending: bool
+    ):
+        files, next_cursor = await keyset_page(
+            self.db, self._live_files_query(user_id), [BulkEmailStats.id], cursor, limit, descending
+        )
+        files_data = [
+            {
+                "id": file["id"],
+                "file_name": file["file_name"],
+                "deliverable": file["deliverable"],
+                "total_emails": file["total"],
+                "status": file["status"],
+            }
+            for file in await self._file_counts(user_id, files)
+        ]
+        return files_data, next_cursor
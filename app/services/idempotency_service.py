@@ -0,0 +1,203 @@
+# app\services\idempotency_service.py
+# Idempotency-Key support for the verification POST endpoints: the first request with a key does the
+# work and its response is stored, a retry with the same key gets that response back (or waits for the
+# request still running) instead of verifying and charging a second time
+import asyncio
+import hashlib
+import json
+import os
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable, Optional, Tuple
+
+from dotenv import load_dotenv
+from fastapi import HTTPException, status
+from fastapi.responses import JSONResponse
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.email import BulkEmailStats, IdempotencyKey
+from app.utils.bulk_jobs import HEARTBEAT_TIMEOUT_SECONDS, STATUS_PROCESSING
+
+load_dotenv()
+
+IDEMPOTENCY_RETENTION_HOURS = int(os.getenv("IDEMPOTENCY_RETENTION_HOURS", "24"))
+# how long a retry waits for the original request to finish before being told it still runs
+IDEMPOTENCY_WAIT_SECONDS = float(os.getenv("IDEMPOTENCY_WAIT_SECONDS", "10"))
+# a request still in progress after this is taken for dead (its worker stopped) and may run again,
+# unless it created a bulk file whose job still moves its heartbeat
+IDEMPOTENCY_LOCK_SECONDS = int(os.getenv("IDEMPOTENCY_LOCK_SECONDS", "3600"))
+POLL_SECONDS = 0.5
+
+IN_PROGRESS = "in_progress"
+COMPLETED = "completed"
+
+# runs the request, gets a callback to record the file a bulk request creates, returns (status, content)
+Handler = Callable[[Optional[Callable[[int], Awaitable]]], Awaitable[Tuple[int, dict]]]
+
+
+def request_fingerprint(*parts) -> str:
+    sha256 = hashlib.sha256()
+    for part in parts:
+        sha256.update(part if isinstance(part, bytes) else str(part).encode("utf-8"))
+        sha256.update(b"\0")
+    return sha256.hexdigest()
+
+
+class IdempotencyService:
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def _get(self, user_id: str, key: str) -> Optional[IdempotencyKey]:
+        record = await self.db.scalar(
+            select(IdempotencyKey)
+            .where(IdempotencyKey.user_id == user_id, IdempotencyKey.key == key)
+            .execution_options(populate_existing=True)
+        )
+        await self.db.commit()  # no transaction left open while a retry waits
+        return record
+
+    async def _claim(self, user_id: str, key: str, fingerprint: str) -> Tuple[Optional[IdempotencyKey], bool]:
+        """The record of the key and whether this request owns it (runs the work)."""
+        now = datetime.now(timezone.utc)
+        record = await self._get(user_id, key)
+        if record is None:
+            record = IdempotencyKey(
+                user_id=user_id, key=key, fingerprint=fingerprint, status=IN_PROGRESS, created_at=now, updated_at=now
+            )
+            self.db.add(record)
+            try:
+                await self.db.commit()
+                return record, True
+            except IntegrityError:
+                # another request with the same key got in first
+                await self.db.rollback()
+                return await self._get(user_id, key), False
+
+        stale = (now - timedelta(seconds=IDEMPOTENCY_LOCK_SECONDS)).replace(tzinfo=None)  # stored as naive UTC
+        if (
+            record.status == IN_PROGRESS
+            and record.fingerprint == fingerprint
+            and record.updated_at < stale
+            and await self._job_dead(record.resource_id)
+        ):
+            taken = await self.db.execute(
+                update(IdempotencyKey)
+                .where(IdempotencyKey.id == record.id, IdempotencyKey.updated_at == record.updated_at)
+                .values(updated_at=now, resource_id=None)
+                .execution_options(synchronize_session=False)
+            )
+            await self.db.commit()
+            if taken.rowcount:
+                record.updated_at, record.resource_id = now, None
+                return record, True
+        return record, False
+
+    async def _job_dead(self, file_id: Optional[int]) -> bool:
+        """Whether the work of a key can run again: no file yet, or a file still Processing without heartbeat.
+
+        A finished (or deleted) file was verified and charged already, a retry follows it instead.
+        """
+        if file_id is None:
+            return True
+        heartbeat_cutoff = datetime.now(timezone.utc) - timedelta(seconds=HEARTBEAT_TIMEOUT_SECONDS)
+        dead = await self.db.scalar(
+            select(BulkEmailStats.id).where(
+                BulkEmailStats.id == file_id,
+                BulkEmailStats.status == STATUS_PROCESSING,
+                func.coalesce(BulkEmailStats.updated_at, BulkEmailStats.created_at) < heartbeat_cutoff,
+            )
+        )
+        await self.db.commit()
+        return dead is not None
+
+    async def _set(self, record: IdempotencyKey, **values):
+        values["updated_at"] = datetime.now(timezone.utc)
+        await self.db.execute(
+            update(IdempotencyKey)
+            .where(IdempotencyKey.id == record.id)
+            .values(**values)
+            .execution_options(synchronize_session=False)
+        )
+        await self.db.commit()
+
+    async def _release(self, record: IdempotencyKey):
+        # the request failed: forget the key so a retry runs it again
+        await self.db.rollback()
+        await self.db.execute(delete(IdempotencyKey).where(IdempotencyKey.id == record.id))
+        await self.db.commit()
+
+    async def _execute(self, record: IdempotencyKey, handler: Handler) -> JSONResponse:
+        async def attach_resource(resource_id: int):
+            record.resource_id = resource_id
+            await self._set(record, resource_id=resource_id)
+
+        try:
+            status_code, content = await handler(attach_resource)
+        except Exception as e:
+            if record.resource_id is None:
+                # errors before any work are not replayed: nothing was charged, so the client may simply retry
+                await asyncio.shield(self._release(record))
+                raise
+            # the file exists and the rows verified before the failure were charged: the failure is the
+            # result of the key, a retry must not verify and charge the file again
+            await self.db.rollback()
+            status_code = getattr(e, "status_code", status.HTTP_500_INTERNAL_SERVER_ERROR)
+            content = {
+                "message": "The request failed, the rows verified before the failure are kept in the file.",
+                "status": status_code,
+                "data": {"file_id": record.resource_id},
+            }
+        except BaseException:
+            # cancelled: a key without file is released, one with a file stays locked while its job runs
+            if record.resource_id is None:
+                await asyncio.shield(self._release(record))
+            raise
+        await self._set(record, status=COMPLETED, response_status=status_code, response_body=json.dumps(content))
+        return JSONResponse(status_code=status_code, content=content)
+
+    async def handle(self, user_id: str, key: Optional[str], fingerprint: str, handler: Handler) -> JSONResponse:
+        """Run ``handler`` once per (user, key); without a key it just runs."""
+        if not key:
+            status_code, content = await handler(None)
+            return JSONResponse(status_code=status_code, content=content)
+
+        deadline = time.monotonic() + IDEMPOTENCY_WAIT_SECONDS
+        while True:
+            record, owner = await self._claim(user_id, key, fingerprint)
+            if owner:
+                return await self._execute(record, handler)
+            if record is None:  # released by a failed request between two reads, try to take it
+                continue
+
+            if record.fingerprint != fingerprint:
+                raise HTTPException(
+                    status_code=422,
+                    detail="This Idempotency-Key was already used with a different request.",
+                )
+            if record.status == COMPLETED:
+                return JSONResponse(
+                    status_code=record.response_status,
+                    content=json.loads(record.response_body),
+                    headers={"Idempotent-Replayed": "true"},
+                )
+            if time.monotonic() >= deadline:
+                break
+            await asyncio.sleep(POLL_SECONDS)
+
+        # still running: a bulk request points to its file, which can be followed while it is verified
+        if record.resource_id is not None:
+            return JSONResponse(
+                status_code=status.HTTP_202_ACCEPTED,
+                content={
+                    "message": "The request with this Idempotency-Key is still being processed.",
+                    "status": status.HTTP_202_ACCEPTED,
+                    "data": {"file_id": record.resource_id},
+                },
+            )
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="The request with this Idempotency-Key is still being processed.",
+            headers={"Retry-After": str(max(1, int(IDEMPOTENCY_WAIT_SECONDS)))},
+        )
@@ -0,0 +1,335 @@
+# app\services\maintenance_service.py
+# background housekeeping: hard delete (optionally archive) soft deleted rows once the retention window
+# is over, give back credits of reservations whose job died without settling, roll the monthly
+# partitions of test_email and drop idempotency keys past their retention
+import asyncio
+import gzip
+import json
+import logging
+import os
+import re
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+
+from dotenv import load_dotenv
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import delete, select, text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database.db_config import SessionLocal, engine
+from app.models.email import BulkEmailStats, IdempotencyKey, TestEmail
+from app.models.user import UsedRefreshToken
+from app.services.credit_service import CreditService
+from app.services.idempotency_service import IDEMPOTENCY_RETENTION_HOURS
+from app.services.snapshot_service import SnapshotService
+from app.utils.snapshots import delete_snapshot, snapshots_enabled
+
+load_dotenv()
+
+MAINTENANCE_ENABLED = os.getenv("MAINTENANCE_ENABLED", "true").lower() == "true"
+MAINTENANCE_INTERVAL_SECONDS = int(os.getenv("MAINTENANCE_INTERVAL_SECONDS", "3600"))
+SOFT_DELETE_RETENTION_DAYS = int(os.getenv("SOFT_DELETE_RETENTION_DAYS", "30"))
+PURGE_BATCH_SIZE = int(os.getenv("PURGE_BATCH_SIZE", "5000"))
+# when set, purged rows are appended to <dir>/<table>-<yyyymmdd>.jsonl.gz before being deleted
+SOFT_DELETE_ARCHIVE_DIR = os.getenv("SOFT_DELETE_ARCHIVE_DIR", "")
+# test_email partitions: months created ahead of time, and months kept attached (0 keeps every month)
+PARTITION_PREMAKE_MONTHS = int(os.getenv("PARTITION_PREMAKE_MONTHS", "3"))
+PARTITION_RETENTION_MONTHS = int(os.getenv("PARTITION_RETENTION_MONTHS", "0"))
+# detached partitions are written to <dir>/<partition>.csv.gz and dropped, kept detached when not set
+PARTITION_ARCHIVE_DIR = os.getenv("PARTITION_ARCHIVE_DIR", "")
+PARTITION_LOCK_TIMEOUT = os.getenv("PARTITION_LOCK_TIMEOUT", "5s")
+# advisory lock key shared by every worker, only one of them runs a maintenance pass at a time
+MAINTENANCE_LOCK_KEY = 7204913581
+
+logger = logging.getLogger(__name__)
+
+
+class MaintenanceService:
+    def __init__(
+        self, db: AsyncSession, batch_size: int = PURGE_BATCH_SIZE, archive_dir: str = SOFT_DELETE_ARCHIVE_DIR
+    ):
+        self.db = db
+        self.batch_size = batch_size
+        self.archive_dir = archive_dir
+
+    def _archive(self, model, rows: List):
+        os.makedirs(self.archive_dir, exist_ok=True)
+        path = os.path.join(self.archive_dir, f"{model.__tablename__}-{datetime.now(timezone.utc):%Y%m%d}.jsonl.gz")
+        columns = [column.name for column in model.__table__.columns]
+        with gzip.open(path, "at", encoding="utf-8") as f:
+            for row in rows:
+                f.write(json.dumps(jsonable_encoder({column: getattr(row, column) for column in columns})) + "\n")
+
+    async def _delete_batch(self, model, *criteria) -> int:
+        # one short transaction per batch: no long row locks and no huge WAL burst on big files
+        if self.archive_dir:
+            rows = (
+                await self.db.scalars(select(model).where(*criteria).order_by(model.id).limit(self.batch_size))
+            ).all()
+            ids = [row.id for row in rows]
+            if rows:
+                await asyncio.to_thread(self._archive, model, rows)
+        else:
+            ids = list(
+                await self.db.scalars(select(model.id).where(*criteria).order_by(model.id).limit(self.batch_size))
+            )
+
+        if ids:
+            await self.db.execute(delete(model).where(model.id.in_(ids)).execution_options(synchronize_session=False))
+        await self.db.commit()
+        return len(ids)
+
+    async def purge_soft_deleted(
+        self, retention: timedelta = timedelta(days=SOFT_DELETE_RETENTION_DAYS)
+    ) -> Dict[str, int]:
+        """Hard delete rows soft deleted before the retention window, in batches."""
+        cutoff = datetime.now(timezone.utc) - retention
+        purged = {"test_email": 0, "bulk_emails_stats": 0}
+
+        # Step 1: emails deleted one by one (served by the ``WHERE soft_delete`` deleted_at index)
+        while count := await self._delete_batch(TestEmail, TestEmail.soft_delete, TestEmail.deleted_at < cutoff):
+            purged["test_email"] += count
+
+        # Step 2: deleted files, their rows go first because of the foreign key
+        files = (
+            await self.db.execute(
+                select(BulkEmailStats.id, BulkEmailStats.archive_uri)
+                .where(BulkEmailStats.soft_delete, BulkEmailStats.deleted_at < cutoff)
+                .order_by(BulkEmailStats.id)
+                .limit(self.batch_size)
+            )
+        ).all()
+        await self.db.commit()
+        for file_id, archive_uri in files:
+            while count := await self._delete_batch(TestEmail, TestEmail.file_id == file_id):
+                purged["test_email"] += count
+            if archive_uri:
+                await delete_snapshot(archive_uri)
+            purged["bulk_emails_stats"] += await self._delete_batch(BulkEmailStats, BulkEmailStats.id == file_id)
+
+        return purged
+
+    async def purge_idempotency_keys(self, retention: timedelta = timedelta(hours=IDEMPOTENCY_RETENTION_HOURS)) -> int:
+        """Delete stored Idempotency-Key responses older than the retention, never archived."""
+        cutoff = datetime.now(timezone.utc) - retention
+        purged = 0
+        while ids := list(
+            await self.db.scalars(
+                select(IdempotencyKey.id)
+                .where(IdempotencyKey.created_at < cutoff)
+                .order_by(IdempotencyKey.id)
+                .limit(self.batch_size)
+            )
+        ):
+            await self.db.execute(delete(IdempotencyKey).where(IdempotencyKey.id.in_(ids)))
+            await self.db.commit()
+            purged += len(ids)
+        await self.db.commit()
+        return purged
+
+    async def purge_used_refresh_tokens(self) -> int:
+        """Forget the used refresh tokens that expired, they are refused on their expiry anyway."""
+        now = datetime.now(timezone.utc)
+        purged = 0
+        while jtis := list(
+            await self.db.scalars(
+                select(UsedRefreshToken.jti).where(UsedRefreshToken.expires_at < now).limit(self.batch_size)
+            )
+        ):
+            await self.db.execute(delete(UsedRefreshToken).where(UsedRefreshToken.jti.in_(jtis)))
+            await self.db.commit()
+            purged += len(jtis)
+        await self.db.commit()
+        return purged
+
+
+def _month_start(moment: datetime, offset: int = 0) -> datetime:
+    month = moment.year * 12 + moment.month - 1 + offset
+    return datetime(month // 12, month % 12 + 1, 1)
+
+
+class PartitionService:
+    """Monthly RANGE (created_at) partitions of test_email, see the 16a120db1eb9 migration."""
+
+    PARENT = "test_email"
+    DEFAULT = "test_email_default"
+    # partitions made by this service, and the pre-partitioning table attached below the first month
+    MANAGED = re.compile(r"^test_email_(p\d{6}|legacy)$")
+    UPPER_BOUND = re.compile(r"TO \('([^']+)'\)")
+    LOWER_BOUND = re.compile(r"FROM \('([^']+)'\)")
+
+    def __init__(
+        self,
+        db: AsyncSession,
+        premake_months: int = PARTITION_PREMAKE_MONTHS,
+        retention_months: int = PARTITION_RETENTION_MONTHS,
+        archive_dir: str = PARTITION_ARCHIVE_DIR,
+    ):
+        self.db = db
+        self.premake_months = premake_months
+        self.retention_months = retention_months
+        self.archive_dir = archive_dir
+
+    async def _partitions(self) -> Dict[str, Tuple[Optional[datetime], Optional[datetime]]]:
+        """Attached partitions and their [lower, upper) bounds, None for MINVALUE / DEFAULT."""
+        rows = await self.db.execute(
+            text(
+                "SELECT c.relname, pg_get_expr(c.relpartbound, c.oid) FROM pg_inherits i "
+                "JOIN pg_class c ON c.oid = i.inhrelid WHERE i.inhparent = CAST(:parent AS regclass)"
+            ),
+            {"parent": self.PARENT},
+        )
+        partitions = {}
+        for name, bound in rows:
+            lower, upper = self.LOWER_BOUND.search(bound), self.UPPER_BOUND.search(bound)
+            partitions[name] = (
+                datetime.fromisoformat(lower.group(1)) if lower else None,
+                datetime.fromisoformat(upper.group(1)) if upper else None,
+            )
+        return partitions
+
+    async def create_future_partitions(self) -> List[str]:
+        """Partitions for this month and the next ones, so inserts never fall into the DEFAULT one."""
+        partitions = await self._partitions()
+        ranges = [(lower or datetime.min, upper) for lower, upper in partitions.values() if upper]
+        now = datetime.now(timezone.utc)
+        created = []
+        for offset in range(self.premake_months + 1):
+            start, end = _month_start(now, offset), _month_start(now, offset + 1)
+            if any(lower < end and start < upper for lower, upper in ranges):
+                continue
+            name = f"{self.PARENT}_p{start:%Y%m}"
+            bounds = f"FOR VALUES FROM ('{start:%Y-%m-%d}') TO ('{end:%Y-%m-%d}')"
+            in_default = f"FROM {self.DEFAULT} WHERE created_at >= '{start:%Y-%m-%d}' AND created_at < '{end:%Y-%m-%d}'"
+
+            try:
+                await self.db.execute(text(f"SET LOCAL lock_timeout = '{PARTITION_LOCK_TIMEOUT}'"))
+                if self.DEFAULT in partitions and await self.db.scalar(text(f"SELECT EXISTS (SELECT 1 {in_default})")):
+                    # rows of that month already landed in DEFAULT: they move into the new table before it
+                    # is attached, otherwise the attach fails on the DEFAULT partition's constraint
+                    await self.db.execute(
+                        text(f"CREATE TABLE IF NOT EXISTS {name} (LIKE {self.PARENT} INCLUDING DEFAULTS)")
+                    )
+                    await self.db.execute(
+                        text(f"WITH moved AS (DELETE {in_default} RETURNING *) INSERT INTO {name} SELECT * FROM moved")
+                    )
+                    await self.db.execute(text(f"ALTER TABLE {self.PARENT} ATTACH PARTITION {name} {bounds}"))
+                else:
+                    await self.db.execute(
+                        text(f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF {self.PARENT} {bounds}")
+                    )
+                await self.db.commit()
+            except DBAPIError:
+                # lock timeout or a partition made meanwhile: the month is retried on the next pass
+                await self.db.rollback()
+                logger.warning("Could not create partition %s.", name, exc_info=True)
+                continue
+            created.append(name)
+        return created
+
+    async def detach_expired_partitions(self) -> List[str]:
+        """Detach partitions whose whole range is older than the retention: a catalog change, no row is touched."""
+        if self.retention_months <= 0:
+            return []
+        cutoff = _month_start(datetime.now(timezone.utc), -self.retention_months)
+        detached = []
+        for name, (_, upper) in (await self._partitions()).items():
+            if not self.MANAGED.match(name) or upper is None or upper > cutoff:
+                continue
+            # DETACH ... CONCURRENTLY is not allowed next to a DEFAULT partition; a short lock_timeout
+            # keeps the plain DETACH from queueing requests behind a long running query instead
+            try:
+                await self.db.execute(text(f"SET LOCAL lock_timeout = '{PARTITION_LOCK_TIMEOUT}'"))
+                await self.db.execute(text(f"ALTER TABLE {self.PARENT} DETACH PARTITION {name}"))
+                await self.db.commit()
+            except DBAPIError:
+                await self.db.rollback()
+                logger.warning("Could not detach partition %s.", name, exc_info=True)
+                continue
+            detached.append(name)
+        return detached
+
+    async def _copy_to_archive(self, name: str):
+        path = os.path.join(self.archive_dir, f"{name}.csv.gz")
+        raw = await (await self.db.connection()).get_raw_connection()
+        f = await asyncio.to_thread(gzip.open, path, "wb")
+        try:
+
+            async def write(chunk: bytes):
+                await asyncio.to_thread(f.write, chunk)
+
+            # COPY streams the table without building rows in Python
+            await raw.driver_connection.copy_from_table(name, output=write, format="csv", header=True)
+        finally:
+            await asyncio.to_thread(f.close)
+
+    async def archive_detached_partitions(self) -> List[str]:
+        """Write every detached partition to a compressed file, then drop it."""
+        if not self.archive_dir:
+            return []
+        tables = await self.db.scalars(
+            text(
+                "SELECT c.relname FROM pg_class c WHERE c.relkind = 'r' AND c.relnamespace = "
+                "CAST(current_schema() AS regnamespace) AND NOT c.relispartition"
+            )
+        )
+        names = [name for name in tables if self.MANAGED.match(name)]
+        await self.db.commit()
+
+        await asyncio.to_thread(os.makedirs, self.archive_dir, exist_ok=True)
+        archived = []
+        for name in names:
+            await self._copy_to_archive(name)
+            await self.db.execute(text(f"DROP TABLE {name}"))
+            await self.db.commit()
+            archived.append(name)
+        return archived
+
+    async def maintain(self) -> Dict[str, List[str]]:
+        if self.db.bind.dialect.name != "postgresql":
+            return {}
+        return {
+            "created": await self.create_future_partitions(),
+            "detached": await self.detach_expired_partitions(),
+            "archived": await self.archive_detached_partitions(),
+        }
+
+
+@asynccontextmanager
+async def maintenance_lock(bind=engine):
+    """Yield True when this worker got the maintenance lock, False when another worker holds it."""
+    if bind.dialect.name != "postgresql":
+        yield True
+        return
+    # transaction level lock, held by a connection of its own while the pass commits batch by batch on
+    # the session's: it is released with the transaction, and works behind a transaction mode pooler
+    async with bind.begin() as conn:
+        yield await conn.scalar(text("SELECT pg_try_advisory_xact_lock(:key)"), {"key": MAINTENANCE_LOCK_KEY})
+
+
+async def run_maintenance() -> dict:
+    async with maintenance_lock() as locked:
+        if not locked:
+            return {"skipped": "another worker is running maintenance"}
+        async with SessionLocal() as db:
+            report = await MaintenanceService(db).purge_soft_deleted()
+            report["released_reservations"] = len(await CreditService(db).release_stale_reservations())
+            report["idempotency_keys"] = await MaintenanceService(db).purge_idempotency_keys()
+            report["used_refresh_tokens"] = await MaintenanceService(db).purge_used_refresh_tokens()
+            report["partitions"] = await PartitionService(db).maintain()
+            if snapshots_enabled():
+                report["snapshots"] = await SnapshotService(db).snapshot_completed_files()
+            return report
+
+
+async def run_maintenance_loop(interval: int = MAINTENANCE_INTERVAL_SECONDS):
+    """Started by the app lifespan on every worker, the advisory lock lets one of them run each pass."""
+    while True:
+        try:
+            report = await run_maintenance()
+            logger.info("Maintenance run: %s", report)
+        except Exception:
+            logger.exception("Maintenance run failed.")
+        await asyncio.sleep(interval)
@@ -0,0 +1,106 @@
+# app\services\snapshot_service.py
+# completed bulk files never change again: they are written once to a columnar snapshot (see
+# app/utils/snapshots.py) and their exports, pages and stats are served from it instead of test_email
+import logging
+from typing import List, Optional
+
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.email import BulkEmailStats, TestEmail
+from app.services.email_service import EmailService
+from app.utils.bulk_jobs import STATUS_COMPLETED
+from app.utils.snapshots import (
+    SNAPSHOT_FILES_PER_RUN,
+    SNAPSHOT_PRUNE_ROWS,
+    delete_snapshot,
+    snapshot_uri,
+    verify_snapshot,
+    write_snapshot,
+)
+
+PRUNE_BATCH_SIZE = 5000
+
+logger = logging.getLogger(__name__)
+
+
+class SnapshotService:
+    def __init__(self, db: AsyncSession, prune_rows: bool = SNAPSHOT_PRUNE_ROWS):
+        self.db = db
+        self.prune_rows = prune_rows
+
+    async def snapshot_file(self, bulk_file: BulkEmailStats) -> Optional[dict]:
+        """Write the file's rows to its snapshot, check it and switch the file's reads over to it."""
+        uri = snapshot_uri(bulk_file.user_id, bulk_file.id)
+        manifest = await write_snapshot(uri, EmailService(self.db).iter_export_rows(bulk_file.id, bulk_file.user_id))
+        await self.db.commit()
+        if not await verify_snapshot(uri):
+            logger.error("Snapshot %s does not match its manifest, file %s stays live.", uri, bulk_file.id)
+            await delete_snapshot(uri)
+            return None
+
+        # counters of files older than them are filled from the snapshot, the stats never need the rows again
+        counts = manifest["counts"]
+        values = {
+            "processed": manifest["rows"],
+            "undeliverable": manifest["rows"] - counts["deliverable_count"],
+            **counts,
+        }
+        await self.db.execute(
+            update(BulkEmailStats)
+            .where(BulkEmailStats.id == bulk_file.id)
+            .values(
+                archive_uri=uri,
+                **{column: func.coalesce(getattr(BulkEmailStats, column), value) for column, value in values.items()},
+            )
+            .execution_options(synchronize_session=False)
+        )
+        await self.db.commit()
+
+        if self.prune_rows:
+            await self.prune_file_rows(bulk_file.id)
+        return manifest
+
+    async def prune_file_rows(self, file_id: int) -> int:
+        """Delete the live rows of a snapshotted file, in short batches."""
+        pruned = 0
+        while True:
+            ids = list(
+                await self.db.scalars(select(TestEmail.id).where(TestEmail.file_id == file_id).limit(PRUNE_BATCH_SIZE))
+            )
+            if ids:
+                await self.db.execute(
+                    delete(TestEmail)
+                    .where(TestEmail.file_id == file_id, TestEmail.id.in_(ids))
+                    .execution_options(synchronize_session=False)
+                )
+            await self.db.commit()
+            if not ids:
+                return pruned
+            pruned += len(ids)
+
+    async def snapshot_completed_files(self, limit: int = SNAPSHOT_FILES_PER_RUN) -> List[int]:
+        """Snapshot up to ``limit`` completed files that have none yet, oldest first."""
+        files = (
+            await self.db.scalars(
+                select(BulkEmailStats)
+                .where(
+                    BulkEmailStats.status == STATUS_COMPLETED,
+                    BulkEmailStats.archive_uri.is_(None),
+                    ~BulkEmailStats.soft_delete,
+                )
+                .order_by(BulkEmailStats.id)
+                .limit(limit)
+            )
+        ).all()
+        await self.db.commit()
+
+        snapshotted = []
+        for bulk_file in files:
+            try:
+                if await self.snapshot_file(bulk_file):
+                    snapshotted.append(bulk_file.id)
+            except Exception:
+                await self.db.rollback()
+                logger.exception("Snapshot of file %s failed.", bulk_file.id)
+        return snapshotted
@@ -4,11 +4,13 @@ from datetime import datetime, timedelta, timezone
 import stripe
 from dotenv import load_dotenv
 from fastapi import HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.models.credits import Credit, CreditHistory
 from app.models.subscriptions_stripe import Invoices
 from app.models.user import User
+from app.services.credit_service import CreditService
 
 load_dotenv()
 
@@ -24,7 +26,7 @@ YOUR_DOMAIN = "http://127.0.0.1:8002"
 
 
 class PaymentService:
-    def __init__(self, db: Session):
+    def __init__(self, db: AsyncSession):
         self.db = db
 
     def create_checkout_session(self, email: str, card_title: str, card_price: int, user_id: str, credits: int):
@@ -58,7 +60,7 @@ class PaymentService:
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Stripe error: {str(e)}")
 
-    def handle_webhook(self, payload: bytes, sig_header: str):
+    async def handle_webhook(self, payload: bytes, sig_header: str):
         try:
             event = stripe.Webhook.construct_event(payload, sig_header, endpoint_secret)
         except stripe.error.SignatureVerificationError:
@@ -69,10 +71,10 @@ class PaymentService:
             data_object = event["data"]["object"]
 
             if event_type in ["checkout.session.completed", "charge.updated"]:
-                self._handle_successful_checkout(data_object)
+                await self._handle_successful_checkout(data_object)
 
             elif event_type == "invoice.payment_failed":
-                self._handle_payment_failed(data_object)
+                await self._handle_payment_failed(data_object)
 
             return {
                 "message": "Stripe webhook processed successfully",
@@ -83,21 +85,20 @@ class PaymentService:
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Stripe error: {str(e)}")
 
-    def _handle_successful_checkout(self, data_object):
+    async def _handle_successful_checkout(self, data_object):
         user_id = data_object.get("metadata", {}).get("user_id")
         credits = int(data_object.get("metadata", {}).get("credits", 0))
         # email = data_object.get("customer_email")
         amount_total = data_object.get("amount_total")
 
-        existing_credit = self.db.query(Credit).filter_by(user_id=user_id).first()
+        existing_credit = await self.db.scalar(select(Credit).filter_by(user_id=user_id))
         if not existing_credit:
             raise Exception("Credit record not found for user")
 
         number = uuid.uuid4().hex[:12]
 
         existing_credit.is_paid = True
-        existing_credit.total_credits += credits
-        existing_credit.remaining_credits += credits
+        await CreditService(self.db).add_credits(user_id, credits)
         existing_credit.last_updated = datetime.now(timezone.utc)
         existing_credit.expires_at = datetime.now(timezone.utc) + timedelta(days=730)
 
@@ -118,11 +119,11 @@ class PaymentService:
 
         self.db.add(new_credit_history)
         self.db.add(new_invoice)
-        self.db.commit()
+        await self.db.commit()
 
-    def _handle_payment_failed(self, data_object):
+    async def _handle_payment_failed(self, data_object):
         email = data_object.get("customer_email")
-        user = self.db.query(User).filter_by(email=email).first()
+        user = await self.db.scalar(select(User).filter_by(email=email))
         if user:
             user.status = "payment_failed"
-            self.db.commit()
+            await self.db.commit()
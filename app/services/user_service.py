@@ -1,21 +1,22 @@
 # app/services/user_service.py
 from datetime import datetime
 
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.models.user import User
 from app.schemas.user import UserProfileRead, UserProfileUpdate
 
 
-def fetch_user_profile(user_id: str, db: Session) -> UserProfileRead:
-    user = db.query(User).filter(User.user_id == user_id).first()
+async def fetch_user_profile(user_id: str, db: AsyncSession) -> UserProfileRead:
+    user = await db.scalar(select(User).where(User.user_id == user_id))
     if not user:
         return None
     return UserProfileRead.model_validate(user)
 
 
-def update_user_profile(user_id, user_data: UserProfileUpdate, db: Session) -> UserProfileUpdate:
-    user = db.query(User).filter(User.user_id == user_id).first()
+async def update_user_profile(user_id, user_data: UserProfileUpdate, db: AsyncSession) -> UserProfileUpdate:
+    user = await db.scalar(select(User).where(User.user_id == user_id))
     if not user:
         return None
 
@@ -24,7 +25,7 @@ def update_user_profile(user_id, user_data: UserProfileUpdate, db: Session) -> U
         setattr(user, key, value)
 
     user.updated_at = datetime.utcnow()
-    db.commit()
-    db.refresh(user)
+    await db.commit()
+    await db.refresh(user)
 
     return UserProfileUpdate.model_validate(user)
@@ -0,0 +1,108 @@
+# app\utils\admission.py
+# admission control in front of the verification scheduler: new work is only accepted while the
+# queue ahead of it can be drained in a bounded time, past that it is refused right away with an
+# estimated wait instead of piling up until the client times out. Admitted work is counted in the
+# lane right away, before the awaits (credits, file) that come ahead of its queuing
+import math
+import os
+from typing import Dict
+
+from dotenv import load_dotenv
+from fastapi import HTTPException, status
+
+from app.utils.bulk_jobs import BulkJobRegistry, bulk_jobs
+from app.utils.scheduler import (
+    BULK,
+    INTERACTIVE,
+    VerificationScheduler,
+    verification_scheduler,
+)
+
+load_dotenv()
+
+# interactive lane: probes waiting for a worker
+ADMISSION_MAX_INTERACTIVE_QUEUE = int(os.getenv("ADMISSION_MAX_INTERACTIVE_QUEUE", "200"))
+ADMISSION_MAX_INTERACTIVE_WAIT_SECONDS = float(os.getenv("ADMISSION_MAX_INTERACTIVE_WAIT_SECONDS", "20"))
+# bulk lane: rows of the running bulk jobs not verified yet
+ADMISSION_MAX_BULK_BACKLOG = int(os.getenv("ADMISSION_MAX_BULK_BACKLOG", "100000"))
+ADMISSION_MAX_BULK_WAIT_SECONDS = float(os.getenv("ADMISSION_MAX_BULK_WAIT_SECONDS", "1800"))
+
+
+class Admission:
+    """Probes let in by ``admit``, counted in their lane until released: once queued, or given up."""
+
+    def __init__(self, controller: "AdmissionController", lane: str, quantity: int):
+        self.controller = controller
+        self.lane = lane
+        self.quantity = quantity
+        self.released = False
+
+    def release(self):
+        if not self.released:
+            self.released = True
+            self.controller.reserved[self.lane] -= self.quantity
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+
+class AdmissionController:
+    def __init__(self, scheduler: VerificationScheduler = verification_scheduler, jobs: BulkJobRegistry = bulk_jobs):
+        self.scheduler = scheduler
+        self.jobs = jobs
+        self.shed: Dict[str, int] = {INTERACTIVE: 0, BULK: 0}
+        # admitted, not queued yet (interactive) or not registered as a job yet (bulk)
+        self.reserved: Dict[str, int] = {INTERACTIVE: 0, BULK: 0}
+
+    def depth(self, lane: str) -> int:
+        queued = self.scheduler.queued(INTERACTIVE) if lane == INTERACTIVE else self.jobs.backlog()
+        return queued + self.reserved[lane]
+
+    def estimated_wait(self, lane: str) -> float:
+        """Seconds until new work in the lane starts, at the measured drain rate."""
+        return self.depth(lane) / self.scheduler.drain_rate(lane)
+
+    def saturated(self, lane: str, quantity: int = 1) -> bool:
+        if lane == INTERACTIVE:
+            max_depth, max_wait = ADMISSION_MAX_INTERACTIVE_QUEUE, ADMISSION_MAX_INTERACTIVE_WAIT_SECONDS
+        else:
+            max_depth, max_wait = ADMISSION_MAX_BULK_BACKLOG, ADMISSION_MAX_BULK_WAIT_SECONDS
+        # a bulk job bigger than the whole bound is still let in when nothing else is waiting
+        depth = self.depth(lane)
+        return (depth > 0 and depth + quantity > max_depth) or self.estimated_wait(lane) > max_wait
+
+    def admit(self, lane: str, quantity: int = 1) -> Admission:
+        """
+        Count ``quantity`` more probes in the lane until the returned admission is released, or raise a
+        503 with Retry-After when the lane cannot take them. Check and count happen without an await in
+        between, so concurrent requests of the event loop cannot all pass the same check.
+        """
+        if not self.saturated(lane, quantity):
+            self.reserved[lane] += quantity
+            return Admission(self, lane, quantity)
+        self.shed[lane] += 1
+        wait = max(1, math.ceil(self.estimated_wait(lane)))
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=f"Verification capacity is saturated, please retry in about {wait} seconds.",
+            headers={"Retry-After": str(wait)},
+        )
+
+    def stats(self) -> dict:
+        return {
+            lane: {
+                "depth": self.depth(lane),
+                "reserved": self.reserved[lane],
+                "drain_rate": round(self.scheduler.drain_rate(lane), 3),
+                "estimated_wait_seconds": round(self.estimated_wait(lane), 1),
+                "saturated": self.saturated(lane),
+                "shed": self.shed[lane],
+            }
+            for lane in (INTERACTIVE, BULK)
+        }
+
+
+admission = AdmissionController()
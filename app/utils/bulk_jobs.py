@@ -0,0 +1,88 @@
+# app\utils\bulk_jobs.py
+# registry of the bulk verification jobs running in this process so they can be cancelled
+import asyncio
+import os
+from typing import Awaitable, Dict, Optional
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+BULK_CHUNK_SIZE = int(os.getenv("BULK_CHUNK_SIZE", "100"))  # rows persisted per commit
+CANCEL_DRAIN_SECONDS = float(os.getenv("BULK_CANCEL_DRAIN_SECONDS", "5"))  # max wait for running probes
+# duplicates always reuse the result of the first occurrence, this decides if they are charged too
+CHARGE_UNIQUE_ONLY = os.getenv("BULK_CHARGE_UNIQUE_ONLY", "false").lower() in ("1", "true", "yes")
+# a file still Processing without a persisted chunk for this long belongs to a job that died
+HEARTBEAT_TIMEOUT_SECONDS = int(os.getenv("BULK_HEARTBEAT_TIMEOUT_SECONDS", "3600"))
+
+STATUS_PROCESSING = "Processing"
+STATUS_COMPLETED = "Completed"
+STATUS_CANCEL = "Cancel"
+STATUS_FAILED = "Failed"  # the job crashed, the rows persisted before are kept and charged
+
+
+class BulkJob:
+    def __init__(self, file_id: int, user_id: str, remaining: int = 0):
+        self.file_id = file_id
+        self.user_id = user_id
+        self.remaining = remaining  # rows not verified yet, the job's share of the bulk backlog
+        self.cancel_event = asyncio.Event()
+        self.finished = asyncio.Event()
+
+    @property
+    def cancelled(self) -> bool:
+        return self.cancel_event.is_set()
+
+    def cancel(self):
+        self.cancel_event.set()
+
+    async def run(self, probe: Awaitable, started: asyncio.Event):
+        """
+        Await one probe unless the job gets cancelled meanwhile. After a cancel a probe still queued is
+        dropped at once, one already running (``started`` set) gets ``CANCEL_DRAIN_SECONDS`` to finish;
+        returns None when it did not make it.
+        """
+        task = asyncio.ensure_future(probe)
+        cancel_waiter = asyncio.ensure_future(self.cancel_event.wait())
+        try:
+            await asyncio.wait({task, cancel_waiter}, return_when=asyncio.FIRST_COMPLETED)
+            if not task.done() and started.is_set():
+                await asyncio.wait({task}, timeout=CANCEL_DRAIN_SECONDS)
+            if not task.done():
+                task.cancel()
+                # wait for the cancel to reach the scheduler, the queued probe is skipped from then on
+                await asyncio.wait({task})
+                return None
+            return task.result()
+        finally:
+            cancel_waiter.cancel()
+
+    async def wait_finished(self, timeout: float = CANCEL_DRAIN_SECONDS) -> bool:
+        try:
+            await asyncio.wait_for(self.finished.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+
+class BulkJobRegistry:
+    def __init__(self):
+        self._jobs: Dict[int, BulkJob] = {}
+
+    def start(self, file_id: int, user_id: str, remaining: int = 0) -> BulkJob:
+        job = BulkJob(file_id, user_id, remaining)
+        self._jobs[file_id] = job
+        return job
+
+    def get(self, file_id: int) -> Optional[BulkJob]:
+        return self._jobs.get(file_id)
+
+    def backlog(self) -> int:
+        return sum(job.remaining for job in self._jobs.values())
+
+    def finish(self, job: BulkJob):
+        job.finished.set()
+        self._jobs.pop(job.file_id, None)
+
+
+bulk_jobs = BulkJobRegistry()
@@ -0,0 +1,108 @@
+# app\utils\export.py
+# streaming writers for result exports, rows come from a server-side cursor and leave as soon as encoded
+import csv
+import io
+import re
+import unicodedata
+from typing import AsyncIterable, AsyncIterator, List, Sequence
+from urllib.parse import quote
+
+from sqlalchemy import Boolean, Integer
+
+from app.models.email import TestEmail
+from app.schemas.email import TestEmailResponse
+from app.utils.result_codec import decoded_column
+
+try:  # parquet export is optional
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover
+    pa = pq = None
+
+EXPORT_FIELDS: List[str] = list(TestEmailResponse.model_fields)
+EXPORT_COLUMNS = [getattr(TestEmail, field) for field in EXPORT_FIELDS]
+# what the export queries select: compact rows are decoded in SQL, see ``with_domains``
+EXPORT_SELECT = [decoded_column(field) for field in EXPORT_FIELDS]
+ROWS_PER_CHUNK = 1000
+
+
+def parquet_available() -> bool:
+    return pa is not None
+
+
+def content_disposition(file_name: str, extension: str) -> str:
+    """``attachment`` header for a user supplied file name: RFC 6266 ``filename*`` with an ASCII fallback."""
+    ascii_name = unicodedata.normalize("NFKD", file_name).encode("ascii", "ignore").decode("ascii")
+    ascii_name = re.sub(r"[^A-Za-z0-9._ -]", "_", ascii_name).strip(" ._") or "export"
+    encoded_name = quote(f"{file_name}.{extension}", safe="")
+    return f"attachment; filename=\"{ascii_name}.{extension}\"; filename*=UTF-8''{encoded_name}"
+
+
+async def iter_csv(rows: AsyncIterable[Sequence]) -> AsyncIterator[str]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_FIELDS)
+    count = 0
+    async for row in rows:
+        writer.writerow(row)
+        count += 1
+        if count % ROWS_PER_CHUNK == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file collecting what the parquet writer produces, drained after each row group."""
+
+    def __init__(self):
+        self.chunks: List[bytes] = []
+        self.position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def drain(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def arrow_schema():
+    def arrow_type(column):
+        if isinstance(column.type, Boolean):
+            return pa.bool_()
+        if isinstance(column.type, Integer):
+            return pa.int64()
+        return pa.string()
+
+    columns = zip(EXPORT_FIELDS, EXPORT_COLUMNS)
+    return pa.schema([(field, arrow_type(column.property.columns[0])) for field, column in columns])
+
+
+async def iter_parquet(rows: AsyncIterable[Sequence]) -> AsyncIterator[bytes]:
+    """zstd compressed parquet, one row group per ``ROWS_PER_CHUNK`` rows."""
+    schema = arrow_schema()
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema, compression="zstd")
+
+    batch = []
+    async for row in rows:
+        batch.append(row)
+        if len(batch) == ROWS_PER_CHUNK:
+            writer.write_table(pa.Table.from_pylist([dict(zip(EXPORT_FIELDS, item)) for item in batch], schema=schema))
+            batch = []
+            yield sink.drain()
+    if batch:
+        writer.write_table(pa.Table.from_pylist([dict(zip(EXPORT_FIELDS, item)) for item in batch], schema=schema))
+    writer.close()
+    yield sink.drain()
@@ -1,5 +1,21 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+import urllib.request
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
 import firebase_admin
-from firebase_admin import auth, credentials
+import jwt
+from cryptography.x509 import load_pem_x509_certificate
+from dotenv import load_dotenv
+from firebase_admin import credentials
+
+load_dotenv()
 
 # Initialize Firebase App
 cred_path = "./app/truemail-5a597-firebase-adminsdk-fbsvc-529130fcbb.json"
@@ -8,11 +24,157 @@ cred = credentials.Certificate(cred_path)
 if not firebase_admin._apps:
     firebase_admin.initialize_app(cred)
 
+# ID tokens are verified locally against Google's public keys, the same checks as auth.verify_id_token
+# without revocation; verified tokens are kept until their exp so a repeated token costs a lookup
+FIREBASE_CERTS_URL = "https://www.googleapis.com/robot/v1/metadata/x509/securetoken@system.gserviceaccount.com"
+FIREBASE_TOKEN_CACHE_SIZE = int(os.getenv("FIREBASE_TOKEN_CACHE_SIZE", "10000"))
+# keys are refreshed in the background this many seconds before their max-age runs out
+CERTS_REFRESH_MARGIN_SECONDS = 300
+CERTS_DEFAULT_MAX_AGE_SECONDS = 3600
+# a token with an unknown kid refetches the keys (Google rotated them) at most once per this many seconds,
+# otherwise made-up kids would turn every request into a call to Google
+CERTS_MIN_REFRESH_SECONDS = int(os.getenv("FIREBASE_CERTS_MIN_REFRESH_SECONDS", "60"))
+UNKNOWN_KIDS_MAX = 1024
+CLOCK_SKEW_SECONDS = 60
+
+logger = logging.getLogger(__name__)
+
+
+class PublicKeyCache:
+    """Google's signing keys for Firebase ID tokens, cached for the max-age of their Cache-Control header."""
+
+    def __init__(self, url: str = FIREBASE_CERTS_URL):
+        self.url = url
+        self._keys: Dict[str, object] = {}
+        self._expires_at = 0.0
+        self._fetched_at = float("-inf")
+        self._unknown_kids = set()  # refused without fetching until the next fetch
+        self._lock = threading.Lock()
+        self._refreshing = False
+
+    def _download(self) -> Tuple[Dict[str, object], int]:
+        """The keys by kid and how long they may be cached."""
+        with urllib.request.urlopen(self.url, timeout=10) as response:
+            certs = json.loads(response.read())
+            max_age = re.search(r"max-age=(\d+)", response.headers.get("Cache-Control", ""))
+        keys = {kid: load_pem_x509_certificate(pem.encode("utf-8")).public_key() for kid, pem in certs.items()}
+        return keys, int(max_age.group(1)) if max_age else CERTS_DEFAULT_MAX_AGE_SECONDS
+
+    def _fetch(self):
+        keys, ttl = self._download()
+        with self._lock:
+            self._keys = keys
+            self._expires_at = time.monotonic() + ttl
+            self._fetched_at = time.monotonic()
+            self._unknown_kids.clear()
+
+    def _refresh_in_background(self):
+        try:
+            self._fetch()
+        except Exception:
+            logger.exception("Refreshing the Firebase public keys failed, the current ones are kept.")
+        finally:
+            self._refreshing = False
+
+    def get(self, kid: str):
+        remaining = self._expires_at - time.monotonic()
+        if remaining <= 0 or not self._keys:
+            # nothing usable (first call or expired keys): fetch now
+            self._fetch()
+        elif remaining < CERTS_REFRESH_MARGIN_SECONDS and not self._refreshing:
+            self._refreshing = True
+            threading.Thread(target=self._refresh_in_background, daemon=True).start()
+        key = self._keys.get(kid)
+        return key if key is not None else self._get_unknown(kid)
+
+    def _get_unknown(self, kid: str):
+        """A kid we do not know: fetch again if the last fetch is older than CERTS_MIN_REFRESH_SECONDS."""
+        with self._lock:
+            if kid in self._unknown_kids or time.monotonic() - self._fetched_at < CERTS_MIN_REFRESH_SECONDS:
+                self._remember_unknown(kid)
+                return None
+            # claimed before fetching, concurrent requests with unknown kids do not fetch as well
+            self._fetched_at = time.monotonic()
+        self._fetch()
+        key = self._keys.get(kid)
+        if key is None:
+            with self._lock:
+                self._remember_unknown(kid)
+        return key
+
+    def _remember_unknown(self, kid: str):
+        if len(self._unknown_kids) < UNKNOWN_KIDS_MAX:
+            self._unknown_kids.add(kid)
+
+
+class VerifiedTokenCache:
+    """Claims of verified tokens keyed by the token's sha256, each entry living until the token's exp (LRU bound)."""
+
+    def __init__(self, max_size: int = FIREBASE_TOKEN_CACHE_SIZE):
+        self.max_size = max_size
+        self._entries: "OrderedDict[str, dict]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(token: str) -> str:
+        return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+    def get(self, token: str) -> Optional[dict]:
+        key = self._key(token)
+        with self._lock:
+            claims = self._entries.get(key)
+            if claims is None:
+                return None
+            if claims["exp"] <= time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return claims
+
+    def put(self, token: str, claims: dict):
+        with self._lock:
+            self._entries[self._key(token)] = claims
+            self._entries.move_to_end(self._key(token))
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+
+public_keys = PublicKeyCache()
+verified_tokens = VerifiedTokenCache()
+
+
+def _decode_id_token(id_token: str) -> dict:
+    kid = jwt.get_unverified_header(id_token).get("kid")
+    # an unknown kid usually means Google rotated its keys since the last fetch, get() refetches them then
+    key = public_keys.get(kid)
+    if key is None:
+        raise ValueError("Token signed with an unknown key.")
+
+    claims = jwt.decode(
+        id_token,
+        key,
+        algorithms=["RS256"],
+        audience=cred.project_id,
+        issuer=f"https://securetoken.google.com/{cred.project_id}",
+        leeway=CLOCK_SKEW_SECONDS,
+        options={"require": ["exp", "iat", "sub"]},
+    )
+    if not claims["sub"] or len(claims["sub"]) > 128:
+        raise ValueError("Token has an invalid subject.")
+    if claims.get("auth_time", 0) > time.time() + CLOCK_SKEW_SECONDS:
+        raise ValueError("Token has an auth_time in the future.")
+    claims["uid"] = claims["sub"]
+    return claims
+
 
 def verify_firebase_token(id_token: str):
     """Verify Firebase ID token and return the decoded user info."""
+    decoded_token = verified_tokens.get(id_token)
+    if decoded_token is not None:
+        return decoded_token
     try:
-        decoded_token = auth.verify_id_token(id_token)
-        return decoded_token  # contains uid, email, etc.
+        decoded_token = _decode_id_token(id_token)
     except Exception as e:
         raise ValueError(f"Invalid Firebase token: {str(e)}")
+    verified_tokens.put(id_token, decoded_token)
+    return decoded_token  # contains uid, email, etc.
@@ -1,46 +1,134 @@
-from datetime import datetime, timedelta
+import asyncio
+import logging
+import os
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Dict
 
 import jwt
+from dotenv import load_dotenv
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+from sqlalchemy import select
 
+from app.database.db_config import SessionLocal
+from app.models.user import User
 from app.schemas.auth import UserInfo
-from app.utils.firebase import verify_firebase_token
 
-SECRET_KEY = "VqgYZ=mhQa8VTq75-)t6V|m3;o!4@nG$+KsX[;*;$$?[S_c=?!'qTU5*hMC*p*|C"
+load_dotenv()
+
+SECRET_KEY = os.getenv("JWT_SECRET") or "VqgYZ=mhQa8VTq75-)t6V|m3;o!4@nG$+KsX[;*;$$?[S_c=?!'qTU5*hMC*p*|C"
 ALGORITHM = "HS256"
-EXPIRATION_MINUTES = 60
+# session tokens minted at login: a short lived access token sent on every request, and a refresh
+# token exchanged at /auth/refresh, where it is checked against the database and can be used once
+ACCESS_TOKEN_MINUTES = int(os.getenv("ACCESS_TOKEN_MINUTES", "15"))
+REFRESH_TOKEN_DAYS = int(os.getenv("REFRESH_TOKEN_DAYS", "30"))
+# how often a worker reloads the revocations made by the other ones
+REVOCATION_SYNC_SECONDS = int(os.getenv("REVOCATION_SYNC_SECONDS", "30"))
 bearer_scheme = HTTPBearer()
 
+logger = logging.getLogger(__name__)
+
 
-def create_jwt_token(data: dict):
+def create_jwt_token(data: dict, token_type: str = "access"):
     to_encode = data.copy()
-    expire = datetime.utcnow() + timedelta(minutes=EXPIRATION_MINUTES)
-    to_encode.update({"exp": expire})
+    # iat keeps its fraction so a token minted right after a revocation is not taken for an older one
+    issued_at = time.time()
+    lifetime = ACCESS_TOKEN_MINUTES * 60 if token_type == "access" else REFRESH_TOKEN_DAYS * 86400
+    to_encode.update({"type": token_type, "iat": issued_at, "exp": int(issued_at + lifetime)})
+    if token_type == "refresh":
+        to_encode["jti"] = uuid.uuid4().hex  # recorded when the token is used, a second use is refused
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
 
+def decode_jwt_token(token: str, token_type: str = "access") -> dict:
+    payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM], options={"require": ["exp", "iat", "user_Id"]})
+    if payload.get("type") != token_type:
+        raise jwt.InvalidTokenError(f"Not an {token_type} token")
+    return payload
+
+
+def revoked_at(tokens_valid_after) -> float:
+    return tokens_valid_after.replace(tzinfo=timezone.utc).timestamp() if tokens_valid_after else 0.0
+
+
+class RevocationList:
+    """Users whose tokens issued before some moment are revoked, kept for the lifetime of an access token
+    (older revocations only matter to refresh tokens, which are checked against the database)."""
+
+    def __init__(self):
+        self._revoked: Dict[str, float] = {}
+        self._synced_at = 0.0
+        self._lock = asyncio.Lock()
+
+    def revoke(self, user_id: str, at: float):
+        self._revoked[user_id] = max(at, self._revoked.get(user_id, 0.0))
+
+    def is_revoked(self, user_id: str, issued_at: float) -> bool:
+        return issued_at < self._revoked.get(user_id, 0.0)
+
+    async def _load(self):
+        horizon = time.time() - ACCESS_TOKEN_MINUTES * 60
+        async with SessionLocal() as db:
+            rows = await db.execute(
+                select(User.user_id, User.tokens_valid_after).where(
+                    User.tokens_valid_after > datetime.fromtimestamp(horizon, timezone.utc)
+                )
+            )
+            for user_id, tokens_valid_after in rows:
+                self.revoke(user_id, revoked_at(tokens_valid_after))
+        self._revoked = {user_id: at for user_id, at in self._revoked.items() if at > horizon}
+
+    async def sync(self):
+        if time.monotonic() - self._synced_at < REVOCATION_SYNC_SECONDS:
+            return
+        async with self._lock:
+            if time.monotonic() - self._synced_at < REVOCATION_SYNC_SECONDS:
+                return
+            try:
+                await self._load()
+            except Exception:
+                # the list in memory keeps serving, the next request tries again
+                logger.exception("Loading the token revocations failed.")
+                return
+            self._synced_at = time.monotonic()
+
+
+revocations = RevocationList()
+
+
 async def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(bearer_scheme),
 ) -> UserInfo:
+    token = credentials.credentials
     try:
-        id_token = credentials.credentials
-        decoded_token = verify_firebase_token(id_token)  # Verifies with Firebase
-
-        return UserInfo(
-            user_Id=decoded_token.get("uid"),
-            email=decoded_token.get("email"),
-            first_name=decoded_token.get("name", ""),
-            last_name="",  # Firebase doesn't provide separate last name
-            photoURL=decoded_token.get("picture", ""),
+        # session token from /auth/login: verified with the local secret, nothing leaves the process.
+        # Raw Firebase ID tokens are only accepted by /auth/login, they live for an hour while the
+        # revocations are kept for the lifetime of an access token.
+        payload = decode_jwt_token(token)
+        user = UserInfo(
+            user_Id=payload["user_Id"],
+            email=payload.get("email"),
+            first_name=payload.get("first_name") or "",
+            last_name=payload.get("last_name") or "",
+            photoURL=payload.get("photoURL"),
         )
-
+        issued_at = payload["iat"]
     except Exception as err:
-        print("Firebase token verification failed:", err)
+        logger.info("Token verification failed: %s", err)
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid token",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
 
-    raise HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Invalid Firebase token",
-        headers={"WWW-Authenticate": "Bearer"},
-    )
+    await revocations.sync()
+    if revocations.is_revoked(user.user_Id, issued_at):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Token revoked",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return user
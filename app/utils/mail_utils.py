@@ -11,6 +11,12 @@ from typing import Optional
 import dns.resolver
 import whois
 
+from app.utils.singleflight import SingleFlight
+
+# concurrent lookups of the same domain, e.g. a burst of signups at one company, share one query
+mx_flights = SingleFlight()
+whois_flights = SingleFlight()
+
 
 def load_disposable_domains(file_path="disposed_email.conf"):
     try:
@@ -29,7 +35,7 @@ def validate_email_syntax(email):
     return bool(re.match(pattern, email))
 
 
-def get_mx_record(domain):
+def _lookup_mx_record(domain):
     try:
         resolver = dns.resolver.Resolver()
         resolver.timeout = 1
@@ -44,6 +50,10 @@ def get_mx_record(domain):
         return None, True  # No record found or error = implicit MX
 
 
+def get_mx_record(domain):
+    return mx_flights.do(domain.lower(), _lookup_mx_record, domain)
+
+
 def verify_smtp_server(mx_record, domain):
     ports = [25, 587, 465]
     for port in ports:
@@ -116,7 +126,7 @@ def check_email_reachability(email, sender_email, disposable_domains):
     # Step 4: WHOIS Lookup
     dm_info = {}
     try:
-        whois_data = whois.whois(domain)
+        whois_data = whois_flights.do(domain.lower(), whois.whois, domain)
         dm_info["registrar"] = getattr(whois_data, "registrar", "N/A")
         dm_info["country"] = getattr(whois_data, "country", "N/A")
         dm_info["whois_server"] = getattr(whois_data, "whois_server", "N/A")
@@ -278,3 +288,75 @@ def evaluate_email_score_and_risk(
     is_risky = score < 60  # mark as risky if score is less than 60
 
     return score, is_risky, tags
+
+
+def analyze_email(email: str, sender_email: str, disposable_domains) -> dict:
+    """Run every check for one address and return the result columns of a ``TestEmail`` row."""
+    is_syntax_valid = validate_email_syntax(email)
+
+    domain = email.split("@", 1)[1].lower() if "@" in email else ""
+    mx_record, implicit_mx = get_mx_record(domain) if domain else (None, True)
+
+    smtp_deliverable, smtp_reason, is_valid, validation_reason = perform_email_checks(
+        target_email=email, sender_email=sender_email, disposable_domains=disposable_domains
+    )
+
+    is_disposable = int(domain in disposable_domains)
+
+    match = re.search(r"@([a-zA-Z0-9.-]+)", email)
+    domain_name = match.group(1).lower() if match else "unknown domain"
+
+    local_part = re.sub(r"[^a-zA-Z._-]", "", email.split("@", 1)[0])
+    cleaned_name = re.sub(r"[\\._-]+", " ", local_part).strip()
+    full_name = " ".join(part.capitalize() for part in cleaned_name.split()) or "N/A"
+
+    alphabetical_count = sum(c.isalpha() for c in email)
+    numerical_count = sum(c.isdigit() for c in email)
+    unicode_symbol_count = len(email) - alphabetical_count - numerical_count
+
+    lowered = email.lower()
+    has_role = any(role in lowered for role in ["admin", "info", "support", "sales", "contact"])
+    is_accept_all = "accept" in lowered or "all" in lowered
+    has_no_reply = "no-reply" in lowered or "noreply" in lowered
+
+    smtp_provider = get_smtp_provider(domain)
+
+    score, is_risky, tags = evaluate_email_score_and_risk(
+        is_syntax_valid=is_syntax_valid,
+        smtp_deliverable=smtp_deliverable,
+        is_disposable=bool(is_disposable),
+        has_role=has_role,
+        is_accept_all=is_accept_all,
+        has_no_reply=has_no_reply,
+        domain=domain,
+        mx_record=mx_record,
+        smtp_provider=smtp_provider,
+    )
+
+    is_email_valid = is_syntax_valid and smtp_deliverable
+
+    return {
+        "user_tested_email": email,
+        "full_name": full_name,
+        "gender": "Unknown",
+        "status": "valid" if is_email_valid else "invalid",
+        "reason": validation_reason or smtp_reason,
+        "domain": domain_name,
+        "is_free": False,
+        "is_risky": is_risky,
+        "is_valid": is_email_valid,
+        "is_disposable": is_disposable,
+        "is_deliverable": smtp_deliverable,
+        "has_tag": False,
+        "alphabetical_characters": alphabetical_count,
+        "is_mailbox_full": False,
+        "has_role": has_role,
+        "is_accept_all": is_accept_all,
+        "has_numerical_characters": numerical_count,
+        "has_unicode_symbols": unicode_symbol_count,
+        "has_no_reply": has_no_reply,
+        "smtp_provider": smtp_provider,
+        "mx_record": mx_record or "",
+        "implicit_mx_record": str(implicit_mx).lower(),  # stored as text, same as postgres casts the flag
+        "score": score,
+    }
@@ -0,0 +1,95 @@
+# app\utils\pagination.py
+# opaque keyset cursors: the client only sees a token, the server keeps the last seen sort key in it
+import base64
+import json
+from datetime import datetime
+from typing import Optional, Sequence
+
+from fastapi import HTTPException, Query, status
+from sqlalchemy import DateTime, asc, desc, tuple_
+
+from app.database.types import UTCDateTime
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+# pages of files, each file carrying a page of its rows
+DEFAULT_FILES_PAGE_SIZE = 20
+MAX_FILES_PAGE_SIZE = 100
+
+
+def encode_cursor(*values) -> str:
+    raw = json.dumps(list(values), separators=(",", ":"), default=str)
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> list:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except (ValueError, UnicodeError):
+        values = None
+    if not isinstance(values, list):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+    return values
+
+
+def decode_id_cursor(cursor) -> int:
+    """Cursor over an integer primary key, no cursor means the first page."""
+    if not cursor:
+        return 0
+    values = decode_cursor(cursor)
+    if len(values) != 1 or not isinstance(values[0], int):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+    return values[0]
+
+
+class PageParams:
+    """Query parameters shared by the list endpoints: ``cursor``, ``limit`` and ``order``."""
+
+    def __init__(
+        self,
+        cursor: Optional[str] = Query(None, description="next_cursor of the previous page"),
+        limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+        order: str = Query("desc", pattern="^(asc|desc)$", description="desc returns the newest first"),
+    ):
+        self.cursor = cursor
+        self.limit = limit
+        self.descending = order == "desc"
+
+
+def _dump_key(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def _load_key(column, value):
+    if value is not None and isinstance(column.type, (DateTime, UTCDateTime)):
+        return datetime.fromisoformat(value)
+    return value
+
+
+async def keyset_page(db, query, columns: Sequence, cursor: Optional[str], limit: int, descending: bool = False):
+    """
+    One page of a ``select()`` of an ORM entity ordered by ``columns`` and the cursor of the next page
+    (None on the last one).
+
+    The last column must be unique (the primary key) so the order is total; with an index on the same
+    columns every page is a range scan that starts where the previous one stopped, however deep it is.
+    """
+    if cursor:
+        values = decode_cursor(cursor)
+        if len(values) != len(columns):
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+        try:
+            bound = tuple_(*(_load_key(column, value) for column, value in zip(columns, values)))
+        except (TypeError, ValueError):
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+        key = tuple_(*columns)
+        query = query.where(key < bound if descending else key > bound)
+
+    direction = desc if descending else asc
+    rows = (await db.scalars(query.order_by(*(direction(column) for column in columns)).limit(limit + 1))).all()
+    next_cursor = None
+    if len(rows) > limit:
+        last = rows[limit - 1]
+        next_cursor = encode_cursor(*(_dump_key(getattr(last, column.key)) for column in columns))
+    return rows[:limit], next_cursor
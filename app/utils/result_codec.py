@@ -0,0 +1,129 @@
+# app\utils\result_codec.py
+# compact storage of verification results (COMPACT_RESULT_STORAGE): the boolean checks packed in one
+# integer, status and reason stored as small codes, and the domain level facts kept once per domain
+# in the domains table instead of on every row
+import os
+from typing import Dict, List, Optional
+
+from dotenv import load_dotenv
+from sqlalchemy import case, func, inspect
+
+from app.models.email import Domain, TestEmail
+
+load_dotenv()
+
+COMPACT_RESULT_STORAGE = os.getenv("COMPACT_RESULT_STORAGE", "false").lower() in ("1", "true", "yes")
+
+# bit i of ``flags`` is FLAG_FIELDS[i]: append only, never reorder or remove
+FLAG_FIELDS: List[str] = [
+    "is_free",
+    "is_risky",
+    "is_valid",
+    "is_disposable",
+    "is_deliverable",
+    "has_tag",
+    "is_mailbox_full",
+    "has_role",
+    "is_accept_all",
+    "has_no_reply",
+]
+FLAG_BITS: Dict[str, int] = {field: 1 << index for index, field in enumerate(FLAG_FIELDS)}
+
+# code i + 1 is the value at index i, append only; values without a code keep their text
+STATUSES: List[str] = ["valid", "invalid", "Deliverable", "invalid_email"]
+REASONS: List[str] = [
+    "VALID",
+    "Reachability check completed.",
+    "SMTP verification passed",
+    "SMTP verification failed",
+    "SMTP unreachable or email not deliverable",
+    "Trusted provider but email not confirmed deliverable",
+    "MX lookup failed",
+    "Invalid email format",
+    "Invalid email syntax",
+    "Disposable email address detected",
+]
+STATUS_CODES = {value: index + 1 for index, value in enumerate(STATUSES)}
+REASON_CODES = {value: index + 1 for index, value in enumerate(REASONS)}
+
+# moved to the domains table
+DOMAIN_FIELDS: List[str] = ["smtp_provider", "mx_record", "implicit_mx_record"]
+
+
+def pack_flags(result: dict) -> int:
+    return sum(bit for field, bit in FLAG_BITS.items() if result.get(field))
+
+
+def unpack_flags(flags: int) -> Dict[str, bool]:
+    return {field: bool(flags & bit) for field, bit in FLAG_BITS.items()}
+
+
+def encode_result(result: dict, domain_id: Optional[int]) -> dict:
+    """``TestEmail`` column values of a result in compact form."""
+    encoded = {key: value for key, value in result.items() if key not in FLAG_BITS and key not in DOMAIN_FIELDS}
+    encoded.update(
+        domain=None,
+        domain_id=domain_id,
+        flags=pack_flags(result),
+        status_code=STATUS_CODES.get(result.get("status")),
+        reason_code=REASON_CODES.get(result.get("reason")),
+    )
+    # the text is kept only when there is no code for it (e.g. SMTP errors carrying the server's message)
+    if encoded["status_code"]:
+        encoded["status"] = None
+    if encoded["reason_code"]:
+        encoded["reason"] = None
+    return encoded
+
+
+def decode_result(row: TestEmail) -> dict:
+    """Column values of a row, compact rows decoded back to the plain columns."""
+    values = {attribute.key: getattr(row, attribute.key) for attribute in inspect(row).mapper.column_attrs}
+    if values["flags"] is None:
+        return values
+
+    values.update(unpack_flags(values["flags"]))
+    if values["status_code"]:
+        values["status"] = STATUSES[values["status_code"] - 1]
+    if values["reason_code"]:
+        values["reason"] = REASONS[values["reason_code"] - 1]
+    domain = row.domain_info
+    if domain is not None:
+        values["domain"] = domain.name
+        values.update({field: getattr(domain, field) for field in DOMAIN_FIELDS})
+    return values
+
+
+# <---------------------------------- SQL side --------------
+# the same decoding in SQL, for filters and for exports that read columns instead of rows
+
+
+def result_flag(field: str):
+    """Boolean check as a SQL expression, whichever way the row was stored."""
+    return func.coalesce(getattr(TestEmail, field), TestEmail.flags.op("&")(FLAG_BITS[field]) != 0)
+
+
+def decoded_column(field: str):
+    """SQL expression of a ``TestEmailResponse`` field; queries using it outer join ``Domain``."""
+    if field in FLAG_BITS:
+        expression = result_flag(field)
+    elif field == "status":
+        expression = case(
+            {code: value for value, code in STATUS_CODES.items()}, value=TestEmail.status_code, else_=TestEmail.status
+        )
+    elif field == "reason":
+        expression = case(
+            {code: value for value, code in REASON_CODES.items()}, value=TestEmail.reason_code, else_=TestEmail.reason
+        )
+    elif field == "domain":
+        expression = func.coalesce(TestEmail.domain, Domain.name)
+    elif field in DOMAIN_FIELDS:
+        expression = func.coalesce(getattr(TestEmail, field), getattr(Domain, field))
+    else:
+        return getattr(TestEmail, field)
+    return expression.label(field)
+
+
+def with_domains(query):
+    """Outer join of the domains a query's ``decoded_column`` expressions read from."""
+    return query.outerjoin(Domain, Domain.id == TestEmail.domain_id)
@@ -0,0 +1,137 @@
+# app\utils\scheduler.py
+# fair-share scheduler in front of the blocking verification probes (DNS / SMTP / WHOIS)
+#  - two lanes: interactive (single email checks) always goes first, bulk uses the spare capacity
+#  - a few workers are reserved for the interactive lane so a bulk burst can never take them all
+#  - inside a lane users are served by weighted fair queuing, paid accounts get a higher weight
+import asyncio
+import functools
+import heapq
+import itertools
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Optional
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+VERIFY_WORKERS = int(os.getenv("VERIFY_WORKERS", "16"))
+VERIFY_INTERACTIVE_RESERVED = int(os.getenv("VERIFY_INTERACTIVE_RESERVED", "4"))
+VERIFY_PAID_WEIGHT = float(os.getenv("VERIFY_PAID_WEIGHT", "4"))
+# assumed duration of a probe until the first ones are measured, and the weight of each new measure
+INITIAL_SERVICE_SECONDS = 1.0
+SERVICE_TIME_ALPHA = 0.1
+
+INTERACTIVE = "interactive"
+BULK = "bulk"
+
+
+def weight_for(credit) -> float:
+    """Scheduling weight of an account, based on its ``Credit`` row."""
+    return VERIFY_PAID_WEIGHT if credit is not None and credit.is_paid else 1.0
+
+
+class _FairQueue:
+    """Start-time fair queuing: every user advances its own virtual clock by 1 / weight per item."""
+
+    def __init__(self):
+        self._heap = []
+        self._user_finish: Dict[str, float] = {}
+        self._virtual_time = 0.0
+        self._sequence = itertools.count()
+
+    def __len__(self):
+        return len(self._heap)
+
+    def push(self, user_id: str, weight: float, item):
+        start = max(self._virtual_time, self._user_finish.get(user_id, 0.0))
+        finish = start + 1.0 / max(weight, 0.01)
+        self._user_finish[user_id] = finish
+        heapq.heappush(self._heap, (start, next(self._sequence), item))
+
+    def pop(self):
+        start, _, item = heapq.heappop(self._heap)
+        self._virtual_time = start
+        if not self._heap:
+            # idle lane, forget the history so nobody is penalized for past usage
+            self._user_finish.clear()
+        return item
+
+
+class VerificationScheduler:
+    def __init__(self, workers: int = VERIFY_WORKERS, interactive_reserved: int = VERIFY_INTERACTIVE_RESERVED):
+        self.workers = workers
+        self.bulk_limit = max(1, workers - interactive_reserved)
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="verify")
+        self._lanes = {INTERACTIVE: _FairQueue(), BULK: _FairQueue()}
+        self._running = {INTERACTIVE: 0, BULK: 0}
+        # moving average of how long a probe holds a worker, the drain rate follows from it
+        self.service_seconds = INITIAL_SERVICE_SECONDS
+
+    async def submit(
+        self,
+        fn: Callable,
+        *args,
+        user_id: str,
+        lane: str = INTERACTIVE,
+        weight: float = 1.0,
+        on_start: Optional[Callable[[], None]] = None,
+    ):
+        """Queue ``fn(*args)`` in a lane and wait for its result, ``on_start`` is called when it gets a worker."""
+        future = asyncio.get_running_loop().create_future()
+        self._lanes[lane].push(user_id, weight, (fn, args, future, on_start))
+        self._dispatch()
+        return await future
+
+    def queued(self, lane: str) -> int:
+        return len(self._lanes[lane])
+
+    def drain_rate(self, lane: str) -> float:
+        """Probes per second a lane gets through when it has work: all workers for interactive."""
+        capacity = self.workers if lane == INTERACTIVE else self.bulk_limit
+        return capacity / self.service_seconds
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "running": dict(self._running),
+            "queued": {lane: len(queue) for lane, queue in self._lanes.items()},
+            "service_seconds": round(self.service_seconds, 3),
+        }
+
+    def _next_lane(self):
+        if sum(self._running.values()) >= self.workers:
+            return None
+        if self._lanes[INTERACTIVE]:
+            return INTERACTIVE
+        if self._lanes[BULK] and self._running[BULK] < self.bulk_limit:
+            return BULK
+        return None
+
+    def _dispatch(self):
+        loop = asyncio.get_running_loop()
+        while (lane := self._next_lane()) is not None:
+            fn, args, future, on_start = self._lanes[lane].pop()
+            if future.done():  # the caller went away (cancelled) while it was queued
+                continue
+            if on_start is not None:
+                on_start()
+            self._running[lane] += 1
+            started = time.monotonic()
+            probe = loop.run_in_executor(self._executor, fn, *args)
+            probe.add_done_callback(functools.partial(self._finished, lane, future=future, started=started))
+
+    def _finished(self, lane: str, done: asyncio.Future, future: asyncio.Future, started: float):
+        self._running[lane] -= 1
+        elapsed = time.monotonic() - started
+        self.service_seconds += SERVICE_TIME_ALPHA * (elapsed - self.service_seconds)
+        if not future.done():
+            if done.exception() is not None:
+                future.set_exception(done.exception())
+            else:
+                future.set_result(done.result())
+        self._dispatch()
+
+
+verification_scheduler = VerificationScheduler()
@@ -0,0 +1,91 @@
+# app\utils\singleflight.py
+# request coalescing: concurrent calls for the same key share one in-flight call instead of each
+# running its own probe. Only calls overlapping in time are merged, nothing is cached afterwards.
+#  - SingleFlight for blocking functions called from the verification threads (MX, WHOIS)
+#  - AsyncSingleFlight for coroutines awaited on the event loop (whole verifications)
+import asyncio
+import threading
+from typing import Awaitable, Callable, Dict, Hashable
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Thread version: the first caller of a key runs ``fn``, the others block until it is done."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+
+    def do(self, key: Hashable, fn: Callable, *args, **kwargs):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            call.done.wait()
+        else:
+            try:
+                call.result = fn(*args, **kwargs)
+            except BaseException as e:
+                call.error = e
+            finally:
+                with self._lock:
+                    del self._calls[key]
+                call.done.set()
+
+        # every caller gets the leader's exception, raised in its own thread
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+    def in_flight(self) -> int:
+        return len(self._calls)
+
+
+class AsyncSingleFlight:
+    """Asyncio version: callers of a key await one shared task.
+
+    A caller being cancelled only stops its own wait; the shared task is cancelled once every caller
+    waiting for it is gone, so a probe nobody waits for anymore gives its place back in the queue.
+    """
+
+    def __init__(self):
+        self._tasks: Dict[Hashable, asyncio.Task] = {}
+        self._waiters: Dict[Hashable, int] = {}
+
+    async def do(self, key: Hashable, factory: Callable[[], Awaitable]):
+        task = self._tasks.get(key)
+        if task is None:
+            task = self._tasks[key] = asyncio.ensure_future(factory())
+            self._waiters[key] = 0
+            task.add_done_callback(lambda done, key=key: self._forget(key, done))
+
+        self._waiters[key] += 1
+        try:
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if not task.done() and self._waiters[key] == 1:
+                task.cancel()
+            raise
+        finally:
+            if self._tasks.get(key) is task:
+                self._waiters[key] -= 1
+
+    def _forget(self, key: Hashable, done: asyncio.Task):
+        if self._tasks.get(key) is done:
+            del self._tasks[key]
+            del self._waiters[key]
+        # nobody may be left to retrieve the error, mark it as retrieved to keep the loop quiet
+        if not done.cancelled():
+            done.exception()
+
+    def in_flight(self) -> int:
+        return len(self._tasks)
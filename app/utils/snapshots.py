@@ -0,0 +1,232 @@
+# app\utils\snapshots.py
+# columnar snapshots of completed bulk files: one zstd parquet file per bulk file and a manifest with its
+# row count and sha256, on local disk or any store pyarrow.fs can open (file://, s3://, gs://, ...)
+import asyncio
+import hashlib
+import io
+import json
+import os
+import posixpath
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from typing import AsyncIterable, AsyncIterator, Dict, List, Optional, Sequence, Tuple
+
+from dotenv import load_dotenv
+
+from app.utils.export import (
+    EXPORT_FIELDS,
+    ROWS_PER_CHUNK,
+    arrow_schema,
+    parquet_available,
+)
+from app.utils.pagination import decode_id_cursor, encode_cursor
+
+try:  # snapshots need pyarrow, like the parquet export
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.fs as pafs
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover
+    pa = ds = pafs = pq = None
+
+load_dotenv()
+
+# where snapshots go, e.g. "file:///var/lib/tmtest/snapshots" or "s3://bucket/snapshots"; empty disables them
+SNAPSHOT_URI = os.getenv("SNAPSHOT_URI", "").rstrip("/")
+# delete the live rows of a file once its snapshot is written and verified
+SNAPSHOT_PRUNE_ROWS = os.getenv("SNAPSHOT_PRUNE_ROWS", "false").lower() in ("1", "true", "yes")
+SNAPSHOT_FILES_PER_RUN = int(os.getenv("SNAPSHOT_FILES_PER_RUN", "20"))
+
+# counted while writing, so the stats of a file never need its rows again
+COUNTED_FLAGS = {
+    "deliverable_count": "is_deliverable",
+    "total_valid_emails": "is_valid",
+    "risky": "is_risky",
+    "disposable": "is_disposable",
+    "catch_all": "is_accept_all",
+}
+
+
+def snapshots_enabled() -> bool:
+    return bool(SNAPSHOT_URI) and parquet_available()
+
+
+def snapshot_uri(user_id: str, file_id: int) -> str:
+    return f"{SNAPSHOT_URI}/{user_id}/{file_id}.parquet"
+
+
+def _manifest_path(path: str) -> str:
+    return path.rsplit(".", 1)[0] + ".manifest.json"
+
+
+class _HashingSink(io.RawIOBase):
+    """Write-only file hashing what the parquet writer produces on its way to the store."""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.sha256 = hashlib.sha256()
+        self.position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.sha256.update(data)
+        self.stream.write(data)
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+
+async def write_snapshot(uri: str, rows: AsyncIterable[Sequence]) -> dict:
+    """Write rows (``EXPORT_FIELDS`` order, sorted by id) to ``uri`` and its manifest, return the manifest."""
+    fs, path = pafs.FileSystem.from_uri(uri)
+    await asyncio.to_thread(fs.create_dir, posixpath.dirname(path), recursive=True)
+    stream = await asyncio.to_thread(fs.open_output_stream, path)
+    sink = _HashingSink(stream)
+    schema = arrow_schema()
+    writer = pq.ParquetWriter(sink, schema, compression="zstd")
+    counts: Dict[str, int] = dict.fromkeys(COUNTED_FLAGS, 0)
+    total = 0
+
+    async def flush(batch: List[dict]):
+        for counter, field in COUNTED_FLAGS.items():
+            counts[counter] += sum(1 for row in batch if row[field])
+        await asyncio.to_thread(writer.write_table, pa.Table.from_pylist(batch, schema=schema))
+
+    try:
+        batch = []
+        async for row in rows:
+            batch.append(dict(zip(EXPORT_FIELDS, row)))
+            if len(batch) == ROWS_PER_CHUNK:
+                await flush(batch)
+                total += len(batch)
+                batch = []
+        if batch:
+            await flush(batch)
+            total += len(batch)
+        await asyncio.to_thread(writer.close)
+    finally:
+        await asyncio.to_thread(stream.close)
+
+    manifest = {
+        "uri": uri,
+        "rows": total,
+        "bytes": sink.position,
+        "sha256": sink.sha256.hexdigest(),
+        "compression": "zstd",
+        "counts": counts,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+    }
+    with await asyncio.to_thread(fs.open_output_stream, _manifest_path(path)) as f:
+        await asyncio.to_thread(f.write, json.dumps(manifest).encode("utf-8"))
+    return manifest
+
+
+def _verify(uri: str) -> bool:
+    fs, path = pafs.FileSystem.from_uri(uri)
+    with fs.open_input_stream(_manifest_path(path)) as f:
+        manifest = json.loads(f.read())
+    sha256 = hashlib.sha256()
+    with fs.open_input_stream(path) as f:
+        while chunk := f.read(1 << 20):
+            sha256.update(chunk)
+    with fs.open_input_file(path) as f:
+        rows = pq.ParquetFile(f).metadata.num_rows
+    return sha256.hexdigest() == manifest["sha256"] and rows == manifest["rows"]
+
+
+async def verify_snapshot(uri: str) -> bool:
+    """Re-read the snapshot and check it against its manifest (checksum and row count)."""
+    return await asyncio.to_thread(_verify, uri)
+
+
+def _delete(uri: str):
+    fs, path = pafs.FileSystem.from_uri(uri)
+    for target in (path, _manifest_path(path)):
+        try:
+            fs.delete_file(target)
+        except FileNotFoundError:
+            pass
+
+
+async def delete_snapshot(uri: str):
+    await asyncio.to_thread(_delete, uri)
+
+
+# <---------------------------------- reads --------------
+
+
+def _filter(
+    after_id: Optional[int] = None,
+    before_id: Optional[int] = None,
+    risky: Optional[bool] = None,
+    deliverable: Optional[bool] = None,
+    min_score: Optional[int] = None,
+    max_score: Optional[int] = None,
+):
+    # the rows are sorted by id, so the id bounds skip whole row groups through their statistics
+    conditions = []
+    if after_id is not None:
+        conditions.append(ds.field("id") > after_id)
+    if before_id is not None:
+        conditions.append(ds.field("id") < before_id)
+    if risky is not None:
+        conditions.append(ds.field("is_risky") == risky)
+    if deliverable is not None:
+        conditions.append(ds.field("is_deliverable") == deliverable)
+    if min_score is not None:
+        conditions.append(ds.field("score") >= min_score)
+    if max_score is not None:
+        conditions.append(ds.field("score") <= max_score)
+    expression = None
+    for condition in conditions:
+        expression = condition if expression is None else expression & condition
+    return expression
+
+
+def _dataset(uri: str):
+    fs, path = pafs.FileSystem.from_uri(uri)
+    return ds.dataset(path, filesystem=fs, format="parquet")
+
+
+def _read(uri: str, expression, limit: int, descending: bool) -> List[dict]:
+    dataset = _dataset(uri)
+    if not descending:
+        return dataset.head(limit, filter=expression).to_pylist()
+
+    # newest first: walk the row groups from the last one, they hold ascending id ranges. Their
+    # statistics skip the groups the filter excludes, and the walk stops once the page is full
+    rows = []
+    for fragment in reversed(list(dataset.get_fragments(filter=expression))):
+        for row_group in reversed(fragment.split_by_row_group(filter=expression)):
+            table = row_group.to_table(filter=expression)
+            rows.extend(table.slice(max(table.num_rows - (limit - len(rows)), 0)).to_pylist()[::-1])
+            if len(rows) >= limit:
+                return rows
+    return rows
+
+
+async def snapshot_page(
+    uri: str, cursor: Optional[str], limit: int, descending: bool = False, **filters
+) -> Tuple[List[SimpleNamespace], Optional[str]]:
+    """Keyset page on id read from a snapshot, same cursors as ``keyset_page`` over [TestEmail.id]."""
+    if cursor:
+        filters["before_id" if descending else "after_id"] = decode_id_cursor(cursor)
+
+    rows = await asyncio.to_thread(_read, uri, _filter(**filters), limit + 1, descending)
+    next_cursor = encode_cursor(rows[limit - 1]["id"]) if len(rows) > limit else None
+    # attribute access like the TestEmail rows the same endpoints return for live files
+    return [SimpleNamespace(**row) for row in rows[:limit]], next_cursor
+
+
+async def iter_snapshot_rows(uri: str, **filters) -> AsyncIterator[tuple]:
+    """Rows of a snapshot in ``EXPORT_FIELDS`` order, one record batch in memory at a time."""
+    batches = await asyncio.to_thread(
+        lambda: iter(_dataset(uri).to_batches(filter=_filter(**filters), batch_size=ROWS_PER_CHUNK))
+    )
+    while (batch := await asyncio.to_thread(next, batches, None)) is not None:
+        for row in zip(*(batch.column(field).to_pylist() for field in EXPORT_FIELDS)):
+            yield row
@@ -0,0 +1,57 @@
+# tests\conftest.py
+# the services run against a throwaway SQLite database (aiosqlite) holding only the tables they use
+import asyncio
+
+import pytest
+from sqlalchemy import BigInteger
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.pool import NullPool
+
+from app.database.db_config import Base
+from app.models import credits, email, subscriptions_stripe, user  # noqa: F401
+
+TABLES = [
+    user.User.__table__,
+    credits.Credit.__table__,
+    credits.CreditUsage.__table__,
+    credits.CreditReservation.__table__,
+    email.BulkEmailStats.__table__,
+    email.Domain.__table__,
+    email.TestEmail.__table__,
+    email.IdempotencyKey.__table__,
+]
+
+
+@compiles(BigInteger, "sqlite")
+def _sqlite_big_integer(type_, compiler, **kw):
+    # SQLite only autoincrements an INTEGER PRIMARY KEY
+    return "INTEGER"
+
+
+def _create_tables(conn):
+    # SQLite cannot autoincrement the composite primary key of test_email (id, created_at), tests give ids
+    email_id = email.TestEmail.__table__.c.id
+    email_id.autoincrement = False
+    try:
+        Base.metadata.create_all(conn, tables=TABLES)
+    finally:
+        email_id.autoincrement = True
+
+
+@pytest.fixture
+def session_factory(tmp_path):
+    # no pool: every test body runs in its own asyncio.run() loop
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'test.db'}", poolclass=NullPool)
+
+    async def create_tables():
+        async with engine.begin() as conn:
+            await conn.run_sync(_create_tables)
+        async with async_sessionmaker(bind=engine)() as db:
+            db.add(user.User(user_id="u1", email="u1@example.com"))
+            db.add(credits.Credit(user_id="u1", is_paid=False, total_credits=100, remaining_credits=100))
+            await db.commit()
+
+    asyncio.run(create_tables())
+    yield async_sessionmaker(bind=engine, autoflush=False, expire_on_commit=False)
+    asyncio.run(engine.dispose())
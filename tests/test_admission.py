@@ -0,0 +1,64 @@
+# tests\test_admission.py
+import pytest
+from fastapi import HTTPException
+
+from app.utils import admission as admission_module
+from app.utils.admission import AdmissionController
+from app.utils.bulk_jobs import BulkJobRegistry
+from app.utils.scheduler import BULK, INTERACTIVE, VerificationScheduler
+
+
+@pytest.fixture
+def controller(monkeypatch):
+    monkeypatch.setattr(admission_module, "ADMISSION_MAX_BULK_BACKLOG", 10)
+    monkeypatch.setattr(admission_module, "ADMISSION_MAX_INTERACTIVE_QUEUE", 2)
+    return AdmissionController(VerificationScheduler(workers=4, interactive_reserved=1), BulkJobRegistry())
+
+
+def test_admitted_rows_count_until_released(controller):
+    first = controller.admit(BULK, 6)
+    assert controller.depth(BULK) == 6
+
+    # a second job arriving before the first one is registered sees its rows
+    with pytest.raises(HTTPException) as refused:
+        controller.admit(BULK, 6)
+    assert refused.value.status_code == 503
+    assert int(refused.value.headers["Retry-After"]) >= 1
+    assert controller.shed[BULK] == 1
+
+    first.release()
+    first.release()  # a second release changes nothing
+    assert controller.depth(BULK) == 0
+    controller.admit(BULK, 6).release()
+
+
+def test_registered_job_takes_over_from_the_admission(controller):
+    jobs = controller.jobs
+    with controller.admit(BULK, 6):
+        job = jobs.start(1, "u1", remaining=6)
+    assert controller.depth(BULK) == 6
+    jobs.finish(job)
+    assert controller.depth(BULK) == 0
+
+
+def test_admission_is_released_on_error(controller):
+    with pytest.raises(RuntimeError):
+        with controller.admit(INTERACTIVE):
+            assert controller.depth(INTERACTIVE) == 1
+            raise RuntimeError("insufficient credits")
+    assert controller.reserved == {INTERACTIVE: 0, BULK: 0}
+
+
+def test_interactive_queue_bound(controller):
+    admitted = [controller.admit(INTERACTIVE), controller.admit(INTERACTIVE)]
+    with pytest.raises(HTTPException):
+        controller.admit(INTERACTIVE)
+    for admission in admitted:
+        admission.release()
+    assert not controller.saturated(INTERACTIVE)
+
+
+def test_job_bigger_than_the_bound_passes_when_nothing_waits(controller):
+    with controller.admit(BULK, 50):
+        with pytest.raises(HTTPException):
+            controller.admit(BULK, 1)
@@ -0,0 +1,50 @@
+# tests\test_bulk_jobs.py
+import asyncio
+import threading
+
+from app.utils import bulk_jobs as bulk_jobs_module
+from app.utils.bulk_jobs import BulkJob
+from app.utils.scheduler import BULK, VerificationScheduler
+
+
+def _run_cancelled_job(release_after_cancel: bool):
+    """Three probes of a job in a bulk lane with one worker, the job is cancelled while the first runs."""
+    scheduler, release, calls = VerificationScheduler(workers=2, interactive_reserved=1), threading.Event(), []
+
+    def check(email):
+        calls.append(email)
+        release.wait(5)
+        return email
+
+    async def run():
+        job = BulkJob(1, "u1")
+
+        def probe(email):
+            started = asyncio.Event()
+            return job.run(scheduler.submit(check, email, user_id="u1", lane=BULK, on_start=started.set), started)
+
+        results = asyncio.ensure_future(asyncio.gather(*(probe(email) for email in "abc")))
+        await asyncio.sleep(0.05)
+        job.cancel()
+        await asyncio.sleep(0.05)
+        if release_after_cancel:
+            release.set()
+        try:
+            return await asyncio.wait_for(results, 5)
+        finally:
+            release.set()
+
+    return asyncio.run(run()), calls
+
+
+def test_cancel_drops_queued_probes_and_drains_the_running_one():
+    results, calls = _run_cancelled_job(release_after_cancel=True)
+    assert results == ["a", None, None]
+    assert calls == ["a"]  # the queued probes never reached a worker
+
+
+def test_running_probe_is_given_up_after_the_drain(monkeypatch):
+    monkeypatch.setattr(bulk_jobs_module, "CANCEL_DRAIN_SECONDS", 0.01)
+    results, calls = _run_cancelled_job(release_after_cancel=False)
+    assert results == [None, None, None]
+    assert calls == ["a"]
@@ -0,0 +1,128 @@
+# tests\test_credit_service.py
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import select, update
+
+from app.models.credits import Credit, CreditReservation, CreditUsage
+from app.models.email import BulkEmailStats
+from app.services.credit_service import (
+    RESERVATION_HELD,
+    RESERVATION_RELEASED,
+    RESERVATION_SETTLED,
+    CreditService,
+)
+
+
+async def _balance(db) -> int:
+    balance = await db.scalar(select(Credit.remaining_credits).where(Credit.user_id == "u1"))
+    await db.commit()
+    return balance
+
+
+async def _reservation(db, reservation_id: int) -> CreditReservation:
+    reservation = await db.get(CreditReservation, reservation_id, populate_existing=True)
+    await db.commit()
+    return reservation
+
+
+def test_settle_charges_what_was_used_and_refunds_the_rest(session_factory):
+    async def run():
+        async with session_factory() as db:
+            credit_service = CreditService(db)
+            reservation_id = await credit_service.reserve_credits("u1", 10)
+            assert await _balance(db) == 90
+
+            await credit_service.settle_reservation(reservation_id, 4, email_or_file_id=7)
+            await credit_service.settle_reservation(reservation_id, 4, email_or_file_id=7)  # no-op
+
+            assert await _balance(db) == 96
+            reservation = await _reservation(db, reservation_id)
+            assert (reservation.status, reservation.used) == (RESERVATION_SETTLED, 4)
+            usage = (await db.scalars(select(CreditUsage))).all()
+            assert [(row.credits_used, row.email_or_file_id) for row in usage] == [(4, 7)]
+
+    asyncio.run(run())
+
+
+def test_release_gives_everything_back(session_factory):
+    async def run():
+        async with session_factory() as db:
+            credit_service = CreditService(db)
+            reservation_id = await credit_service.reserve_credits("u1", 30)
+            await credit_service.release_reservation(reservation_id)
+            assert await _balance(db) == 100
+            assert (await _reservation(db, reservation_id)).status == RESERVATION_RELEASED
+            assert not (await db.scalars(select(CreditUsage))).all()
+
+    asyncio.run(run())
+
+
+def test_reservations_never_overspend(session_factory):
+    async def reserve():
+        async with session_factory() as db:
+            try:
+                return await CreditService(db).reserve_credits("u1", 40)
+            except HTTPException as e:
+                return e.status_code
+
+    async def run():
+        outcomes = await asyncio.gather(*(reserve() for _ in range(3)))
+        assert sorted(outcome == 403 for outcome in outcomes) == [False, False, True]
+        async with session_factory() as db:
+            assert await _balance(db) == 20
+
+    asyncio.run(run())
+
+
+def test_stale_sweep_keeps_running_jobs_and_late_settle_still_charges(session_factory):
+    old = datetime.utcnow() - timedelta(hours=7)
+
+    async def run():
+        async with session_factory() as db:
+            credit_service = CreditService(db)
+            files = {}
+            for name, heartbeat in (("running", datetime.utcnow()), ("dead", old)):
+                bulk_file = BulkEmailStats(user_id="u1", status="Processing", created_at=old, updated_at=heartbeat)
+                db.add(bulk_file)
+                await db.flush()
+                files[name] = bulk_file.id
+            await db.commit()
+
+            reservations = {}
+            for name in ("running", "dead", "no file"):
+                reservations[name] = await credit_service.reserve_credits("u1", 10)
+                if name in files:
+                    await credit_service.attach_reservation(reservations[name], files[name])
+                    await db.commit()
+            await db.execute(update(CreditReservation).values(created_at=old))
+            await db.commit()
+            assert await _balance(db) == 70
+
+            released = await credit_service.release_stale_reservations()
+            assert sorted(released) == sorted([reservations["dead"], reservations["no file"]])
+            assert (await _reservation(db, reservations["running"])).status == RESERVATION_HELD
+            assert await _balance(db) == 90
+
+            # the job taken for dead was only slow: its settle still charges the rows it verified
+            await credit_service.settle_reservation(reservations["dead"], 4, email_or_file_id=files["dead"])
+            assert await _balance(db) == 86
+            assert (await _reservation(db, reservations["dead"])).status == RESERVATION_SETTLED
+
+    asyncio.run(run())
+
+
+@pytest.mark.parametrize("used", [0, 10])
+def test_settle_after_release_never_refunds_twice(session_factory, used):
+    async def run():
+        async with session_factory() as db:
+            credit_service = CreditService(db)
+            reservation_id = await credit_service.reserve_credits("u1", 10)
+            await credit_service.release_reservation(reservation_id)
+            await credit_service.settle_reservation(reservation_id, used)
+            await credit_service.settle_reservation(reservation_id, used)
+            assert await _balance(db) == 100 - used
+
+    asyncio.run(run())
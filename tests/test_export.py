@@ -0,0 +1,23 @@
+# tests\test_export.py
+from urllib.parse import quote
+
+import pytest
+from starlette.responses import Response
+
+from app.utils.export import content_disposition
+
+
+@pytest.mark.parametrize(
+    "file_name, fallback",
+    [
+        ("leads", "leads.csv"),
+        ("Ünïcode list", "Unicode list.csv"),
+        ("отчёт", "export.csv"),
+        ('a"b; filename=evil', "a_b_ filename_evil.csv"),
+    ],
+)
+def test_content_disposition_is_a_valid_header(file_name, fallback):
+    header = content_disposition(file_name, "csv")
+    # Starlette encodes headers as latin-1, a raw non-latin-1 name used to fail with a 500
+    Response(headers={"Content-Disposition": header})
+    assert header == f"attachment; filename=\"{fallback}\"; filename*=UTF-8''{quote(file_name + '.csv', safe='')}"
@@ -0,0 +1,38 @@
+# tests\test_firebase.py
+from app.utils import firebase
+from app.utils.firebase import PublicKeyCache
+
+
+class _Keys(PublicKeyCache):
+    """Serves the kids of ``rotations`` one fetch after another instead of calling Google."""
+
+    def __init__(self, *rotations):
+        super().__init__()
+        self.rotations, self.fetches = list(rotations), 0
+
+    def _download(self):
+        keys = self.rotations[min(self.fetches, len(self.rotations) - 1)]
+        self.fetches += 1
+        return {kid: f"key-{kid}" for kid in keys}, 3600
+
+
+def test_made_up_kids_do_not_fetch(monkeypatch):
+    monkeypatch.setattr(firebase, "CERTS_MIN_REFRESH_SECONDS", 60)
+    keys = _Keys(["a"])
+    assert keys.get("a") == "key-a"
+    for i in range(100):
+        assert keys.get(f"made-up-{i}") is None
+    assert keys.fetches == 1
+
+
+def test_rotated_key_is_fetched_once_the_interval_passed(monkeypatch):
+    monkeypatch.setattr(firebase, "CERTS_MIN_REFRESH_SECONDS", 0)
+    keys = _Keys(["a"], ["a", "b"])
+    assert keys.get("a") == "key-a"
+    assert keys.get("b") == "key-b"
+    assert keys.fetches == 2
+
+    # a kid still unknown after a fetch is refused without fetching until the next one
+    assert keys.get("c") is None
+    assert keys.get("c") is None
+    assert keys.fetches == 3
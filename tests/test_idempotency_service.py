@@ -0,0 +1,84 @@
+# tests\test_idempotency_service.py
+import asyncio
+import json
+
+import pytest
+from fastapi import HTTPException
+
+from app.services.idempotency_service import (
+    COMPLETED,
+    IdempotencyService,
+    request_fingerprint,
+)
+
+BODY = request_fingerprint("POST", "/emails/bulk", b"a@example.com")
+
+
+class _Handler:
+    """Counts its runs; a bulk handler registers file 42 before answering (or failing)."""
+
+    def __init__(self, file_id=None, error=None):
+        self.file_id, self.error, self.runs = file_id, error, 0
+
+    async def __call__(self, on_registered):
+        self.runs += 1
+        if self.file_id is not None:
+            await on_registered(self.file_id)
+        if self.error is not None:
+            raise self.error
+        return 200, {"message": "done", "run": self.runs}
+
+
+def _handle(session_factory, handler, key="k1", fingerprint=BODY):
+    async def run():
+        async with session_factory() as db:
+            return await IdempotencyService(db).handle("u1", key, fingerprint, handler)
+
+    return asyncio.run(run())
+
+
+def test_same_key_replays_the_stored_response(session_factory):
+    handler = _Handler(file_id=42)
+    first = _handle(session_factory, handler)
+    replay = _handle(session_factory, handler)
+
+    assert handler.runs == 1
+    assert "Idempotent-Replayed" not in first.headers
+    assert replay.headers["Idempotent-Replayed"] == "true"
+    assert (replay.status_code, json.loads(replay.body)) == (200, {"message": "done", "run": 1})
+
+
+def test_same_key_with_another_request_is_refused(session_factory):
+    _handle(session_factory, _Handler())
+    with pytest.raises(HTTPException) as refused:
+        _handle(session_factory, _Handler(), fingerprint=request_fingerprint("POST", "/emails/bulk", b"b@example.com"))
+    assert refused.value.status_code == 422
+
+
+def test_failure_before_any_file_releases_the_key(session_factory):
+    with pytest.raises(HTTPException):
+        _handle(session_factory, _Handler(error=HTTPException(status_code=403, detail="Insufficient credits")))
+
+    retry = _Handler()
+    assert _handle(session_factory, retry).status_code == 200
+    assert retry.runs == 1
+
+
+def test_failure_after_the_file_is_kept_as_the_result(session_factory):
+    failing = _Handler(file_id=42, error=RuntimeError("worker died"))
+    response = _handle(session_factory, failing)
+    assert response.status_code == 500
+    assert json.loads(response.body)["data"] == {"file_id": 42}
+
+    # a retry must not verify and charge the file a second time
+    retry = _Handler(file_id=43)
+    replay = _handle(session_factory, retry)
+    assert retry.runs == 0
+    assert replay.headers["Idempotent-Replayed"] == "true"
+    assert json.loads(replay.body)["data"] == {"file_id": 42}
+
+    async def stored():
+        async with session_factory() as db:
+            return await IdempotencyService(db)._get("u1", "k1")
+
+    assert asyncio.run(stored()).status == COMPLETED
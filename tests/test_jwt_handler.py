@@ -0,0 +1,50 @@
+# tests\test_jwt_handler.py
+import asyncio
+import time
+
+import jwt
+import pytest
+from cryptography.hazmat.primitives.asymmetric import rsa
+from fastapi import HTTPException
+from fastapi.security import HTTPAuthorizationCredentials
+
+from app.utils import jwt_handler
+from app.utils.jwt_handler import create_jwt_token, get_current_user
+
+
+def _current_user(token: str):
+    return asyncio.run(get_current_user(HTTPAuthorizationCredentials(scheme="Bearer", credentials=token)))
+
+
+@pytest.fixture(autouse=True)
+def revocations_synced(monkeypatch):
+    monkeypatch.setattr(jwt_handler, "revocations", jwt_handler.RevocationList())
+    jwt_handler.revocations._synced_at = time.monotonic()
+
+
+def test_session_token_is_accepted():
+    assert _current_user(create_jwt_token({"user_Id": "u1", "email": "u1@example.com"})).user_Id == "u1"
+
+
+def test_firebase_id_token_is_refused_outside_login():
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    now = int(time.time())
+    id_token = jwt.encode(
+        {"sub": "u1", "uid": "u1", "iat": now, "exp": now + 3600}, key, algorithm="RS256", headers={"kid": "k1"}
+    )
+    with pytest.raises(HTTPException) as refused:
+        _current_user(id_token)
+    assert refused.value.status_code == 401
+
+
+def test_refresh_token_is_not_an_access_token():
+    with pytest.raises(HTTPException):
+        _current_user(create_jwt_token({"user_Id": "u1", "email": "u1@example.com"}, token_type="refresh"))
+
+
+def test_revoked_session_token_is_refused():
+    token = create_jwt_token({"user_Id": "u1", "email": "u1@example.com"})
+    jwt_handler.revocations.revoke("u1", time.time() + 1)
+    with pytest.raises(HTTPException) as refused:
+        _current_user(token)
+    assert refused.value.detail == "Token revoked"
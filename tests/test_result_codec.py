@@ -0,0 +1,110 @@
+# tests\test_result_codec.py
+import asyncio
+from datetime import datetime
+from itertools import combinations
+
+import pytest
+from sqlalchemy import select
+
+from app.models.email import Domain
+from app.models.email import TestEmail as EmailRow  # not named Test*, pytest would try to collect it
+from app.utils.export import EXPORT_FIELDS
+from app.utils.result_codec import (
+    DOMAIN_FIELDS,
+    FLAG_FIELDS,
+    decode_result,
+    decoded_column,
+    encode_result,
+    pack_flags,
+    result_flag,
+    unpack_flags,
+    with_domains,
+)
+
+CREATED_AT = datetime(2026, 10, 1)
+
+
+def _result(**overrides) -> dict:
+    """A result as analyze_email returns it."""
+    result = {
+        "user_tested_email": "jane.doe@example.com",
+        "full_name": "Jane Doe",
+        "gender": None,
+        "status": "valid",
+        "reason": "SMTP verification passed",
+        "domain": "example.com",
+        "alphabetical_characters": 17,
+        "has_numerical_characters": 0,
+        "has_unicode_symbols": 3,
+        "smtp_provider": "Google",
+        "mx_record": "mx.example.com.",
+        "implicit_mx_record": None,
+        "score": 90,
+        **{field: False for field in FLAG_FIELDS},
+    }
+    result.update(overrides)
+    return result
+
+
+@pytest.mark.parametrize("size", [0, 1, 2, len(FLAG_FIELDS)])
+def test_flags_round_trip(size):
+    for fields in combinations(FLAG_FIELDS, size):
+        result = {field: field in fields for field in FLAG_FIELDS}
+        assert unpack_flags(pack_flags(result)) == result
+
+
+# a result with codes for its status and reason, and one whose reason text has no code (SMTP errors)
+RESULTS = [
+    _result(is_valid=True, is_deliverable=True, is_free=True),
+    _result(status="invalid", reason="Invalid: SMTP Error 550 - no such user", is_risky=True, has_role=True),
+]
+
+
+def _store(session_factory, results) -> list:
+    """Every result stored twice: as a plain row (odd id) and as a compact row (even id)."""
+
+    async def run():
+        async with session_factory() as db:
+            domain = Domain(name="example.com", **{field: results[0][field] for field in DOMAIN_FIELDS})
+            db.add(domain)
+            await db.flush()
+            for index, result in enumerate(results):
+                for row_id, values in ((2 * index + 1, result), (2 * index + 2, encode_result(result, domain.id))):
+                    db.add(EmailRow(**values, id=row_id, user_id="u1", soft_delete=False, created_at=CREATED_AT))
+            await db.commit()
+
+    asyncio.run(run())
+
+
+def test_encode_decode_round_trip(session_factory):
+    _store(session_factory, RESULTS)
+
+    async def run():
+        async with session_factory() as db:
+            return (await db.scalars(select(EmailRow).order_by(EmailRow.id))).unique().all()
+
+    rows = asyncio.run(run())
+    assert rows[1].flags is not None and rows[1].domain is None and rows[1].status is None
+    assert rows[3].reason == RESULTS[1]["reason"]  # no code for it, the text is kept
+    for index, result in enumerate(RESULTS):
+        plain, compact = decode_result(rows[2 * index]), decode_result(rows[2 * index + 1])
+        for field, value in result.items():
+            assert plain[field] == compact[field] == value, field
+
+
+def test_sql_decoding_matches_for_plain_and_compact_rows(session_factory):
+    _store(session_factory, RESULTS)
+
+    async def run():
+        async with session_factory() as db:
+            flags = (await db.execute(select(*(result_flag(f) for f in FLAG_FIELDS)).order_by(EmailRow.id))).all()
+            query = with_domains(select(*(decoded_column(f) for f in EXPORT_FIELDS))).order_by(EmailRow.id)
+            return flags, (await db.execute(query)).all()
+
+    flags, exported = asyncio.run(run())
+    for index, result in enumerate(RESULTS):
+        expected = tuple(result[field] for field in FLAG_FIELDS)
+        assert tuple(map(bool, flags[2 * index])) == tuple(map(bool, flags[2 * index + 1])) == expected
+        plain, compact = exported[2 * index]._asdict(), exported[2 * index + 1]._asdict()
+        plain.pop("id"), compact.pop("id")
+        assert plain == compact
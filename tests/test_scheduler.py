@@ -0,0 +1,36 @@
+# tests\test_scheduler.py
+import asyncio
+import threading
+
+from app.utils.scheduler import BULK, INTERACTIVE, VerificationScheduler, _FairQueue
+
+
+def test_bulk_never_takes_the_reserved_workers():
+    scheduler, release = VerificationScheduler(workers=2, interactive_reserved=1), threading.Event()
+
+    async def run():
+        bulk = [asyncio.ensure_future(scheduler.submit(release.wait, 5, user_id="u1", lane=BULK)) for _ in range(3)]
+        await asyncio.sleep(0)
+        assert scheduler.stats()["running"] == {INTERACTIVE: 0, BULK: 1}
+        assert scheduler.queued(BULK) == 2
+
+        # the bulk backlog is still there, a single verification gets the reserved worker right away
+        assert await asyncio.wait_for(scheduler.submit(lambda: "ok", user_id="u2"), 5) == "ok"
+        release.set()
+        await asyncio.gather(*bulk)
+
+    asyncio.run(run())
+    assert scheduler.stats()["running"] == {INTERACTIVE: 0, BULK: 0}
+
+
+def test_fair_queue_interleaves_users_by_weight():
+    queue = _FairQueue()
+    for i in range(4):
+        queue.push("free", 1.0, f"free{i}")
+    for i in range(4):
+        queue.push("paid", 2.0, f"paid{i}")
+
+    order = [queue.pop() for _ in range(8)]
+    # a user with a long backlog does not hold back the next one, a paid user gets twice the share
+    assert order[:3] == ["free0", "paid0", "paid1"]
+    assert order.index("paid3") < order.index("free3")
@@ -0,0 +1,99 @@
+# tests\test_singleflight.py
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from app.utils.singleflight import AsyncSingleFlight, SingleFlight
+
+
+def test_threads_share_one_call():
+    flight, calls, release = SingleFlight(), [], threading.Event()
+
+    def lookup(domain):
+        calls.append(domain)
+        release.wait(5)
+        return f"mx.{domain}"
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        leader = pool.submit(flight.do, "example.com", lookup, "example.com")
+        while flight.in_flight() == 0:
+            time.sleep(0.001)
+        followers = [pool.submit(flight.do, "example.com", lookup, "example.com") for _ in range(3)]
+        release.set()
+        results = [leader.result(5)] + [follower.result(5) for follower in followers]
+
+    assert results == ["mx.example.com"] * 4
+    assert calls == ["example.com"]
+    assert flight.in_flight() == 0
+
+
+def test_threads_all_get_the_error_and_the_next_call_runs_again():
+    flight, release = SingleFlight(), threading.Event()
+
+    def lookup():
+        release.wait(5)
+        raise TimeoutError("dns")
+
+    with ThreadPoolExecutor(max_workers=3) as pool:
+        leader = pool.submit(flight.do, "key", lookup)
+        while flight.in_flight() == 0:
+            time.sleep(0.001)
+        follower = pool.submit(flight.do, "key", lookup)
+        release.set()
+        for future in (leader, follower):
+            with pytest.raises(TimeoutError):
+                future.result(5)
+
+    assert flight.do("key", lambda: "fresh") == "fresh"
+
+
+def test_coroutines_share_one_task_per_key():
+    flight, calls = AsyncSingleFlight(), []
+
+    async def verify(email):
+        calls.append(email)
+        await asyncio.sleep(0.01)
+        return email.upper()
+
+    async def run():
+        return await asyncio.gather(
+            *(flight.do(email, lambda email=email: verify(email)) for email in ["a@x.io", "a@x.io", "b@x.io"])
+        )
+
+    assert asyncio.run(run()) == ["A@X.IO", "A@X.IO", "B@X.IO"]
+    assert sorted(calls) == ["a@x.io", "b@x.io"]
+    assert flight.in_flight() == 0
+
+
+def test_shared_task_is_cancelled_only_with_its_last_waiter():
+    flight, started = AsyncSingleFlight(), []
+
+    async def verify():
+        started.append(True)
+        await asyncio.sleep(0.05)
+        return "ok"
+
+    async def run():
+        first = asyncio.ensure_future(flight.do("a@x.io", verify))
+        second = asyncio.ensure_future(flight.do("a@x.io", verify))
+        await asyncio.sleep(0)
+        shared = flight._tasks["a@x.io"]
+
+        first.cancel()
+        assert await second == "ok"
+        assert first.cancelled() and not shared.cancelled()
+
+        third = asyncio.ensure_future(flight.do("b@x.io", verify))
+        await asyncio.sleep(0)
+        shared = flight._tasks["b@x.io"]
+        third.cancel()
+        await asyncio.sleep(0)
+        return shared
+
+    shared = asyncio.run(run())
+    assert shared.cancelled()
+    assert len(started) == 2
+    assert flight.in_flight() == 0
@@ -0,0 +1,57 @@
+# tests\test_snapshots.py
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+pa = pytest.importorskip("pyarrow")
+pq = pytest.importorskip("pyarrow.parquet")
+
+from app.utils.pagination import encode_cursor  # noqa: E402
+from app.utils.snapshots import snapshot_page  # noqa: E402
+
+ROWS = 100
+
+
+@pytest.fixture(scope="module")
+def snapshot_uri(tmp_path_factory):
+    path = tmp_path_factory.mktemp("snapshots") / "1.parquet"
+    ids = list(range(1, ROWS + 1))
+    table = pa.table(
+        {
+            "id": ids,
+            "is_risky": [i % 3 == 0 for i in ids],
+            "is_deliverable": [i % 3 != 0 for i in ids],
+            "score": [i % 100 for i in ids],
+        }
+    )
+    # several row groups, in ascending id order like the snapshots written by SnapshotService
+    pq.write_table(table, path, row_group_size=7)
+    return path.as_uri()
+
+
+def _pages(uri: str, limit: int, descending: bool, **filters):
+    ids, cursor = [], None
+    while True:
+        rows, cursor = asyncio.run(snapshot_page(uri, cursor, limit, descending=descending, **filters))
+        ids.extend(row.id for row in rows)
+        if cursor is None:
+            return ids
+
+
+@pytest.mark.parametrize("limit", [1, 5, 7, 16, ROWS + 1])
+def test_descending_pages_walk_every_row_once(snapshot_uri, limit):
+    assert _pages(snapshot_uri, limit, descending=True) == list(range(ROWS, 0, -1))
+    assert _pages(snapshot_uri, limit, descending=False) == list(range(1, ROWS + 1))
+
+
+def test_descending_pages_with_filter(snapshot_uri):
+    expected = [i for i in range(ROWS, 0, -1) if i % 3 == 0]
+    assert _pages(snapshot_uri, 4, descending=True, risky=True) == expected
+
+
+@pytest.mark.parametrize("cursor", ["not a cursor", encode_cursor("7"), encode_cursor(1, 2)])
+def test_invalid_cursor_is_rejected(snapshot_uri, cursor):
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(snapshot_page(snapshot_uri, cursor, 5))
+    assert error.value.status_code == 400